@@ -1,3 +1,5 @@
 from . import c
 from . import dicting
 from . import preferencing
+from . import asyncing
+from . import layering
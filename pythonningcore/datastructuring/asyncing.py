@@ -0,0 +1,162 @@
+"""
+Asyncio interface on top of DiskDict (and so BasePreferencesFile).
+
+All the blocking file I/O and json parsing is pushed to a bounded executor so the
+event loop is never blocked.
+"""
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import copy
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import pythonningcore.py23.helpers
+
+from . import c
+from . import dicting
+
+if pythonningcore.py23.helpers.isModuleAvailable("typing"):
+    from typing import Any, AsyncIterator
+    from concurrent.futures import Executor
+
+__all__ = ("AsyncDiskDict",)
+
+logger = logging.getLogger("{}.asyncing".format(c.abr))
+
+
+class AsyncDiskDict:
+    """
+    Wrap a DiskDict instance to expose an awaitable API.
+
+    Concurrent reads are merged: if a read of the file is already in flight, new
+    callers await that same read instead of loading the file again. Once a write
+    from this instance finished, reads always start a new load, so they see it.
+
+    Writes (``set()`` and ``transaction()``) are serialized between each other.
+
+    Example::
+
+        store = AsyncDiskDict(DiskDict("/path/to/file.json"))
+        value = await store.get("key")
+        await store.set("key", 5)
+        async with store.transaction() as content:
+            content["counter"] += 1
+
+    Args:
+        disk_dict: DiskDict instance (or subclass like BasePreferencesFile) to wrap.
+        executor:
+            executor to run the blocking calls on. If None, a private
+            ThreadPoolExecutor of ``max_workers`` threads is created and owned
+            by this instance.
+        max_workers: size of the private executor, unused if ``executor`` is given.
+    """
+
+    def __init__(self, disk_dict, executor=None, max_workers=2):
+        # type: (dicting.DiskDict, Executor | None, int) -> None
+        self.source = disk_dict  # type: dicting.DiskDict
+
+        self._owns_executor = executor is None  # type: bool
+        self._executor = executor or ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix="{}.asyncing".format(c.abr),
+        )  # type: Executor
+
+        self._pending_read = None  # type: asyncio.Future | None
+        self._write_lock = None  # type: asyncio.Lock | None
+        return
+
+    def __repr__(self):
+        return "<{}({})>".format(self.__class__.__name__, self.source.path)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        self.close()
+
+    def _getWriteLock(self):
+        # type: () -> asyncio.Lock
+        # created lazily so it is bound to the running loop
+        if self._write_lock is None:
+            self._write_lock = asyncio.Lock()
+        return self._write_lock
+
+    def _clearPendingRead(self, future):
+        # type: (asyncio.Future) -> None
+        if self._pending_read is future:
+            self._pending_read = None
+
+    async def _write(self, func, *args):
+        try:
+            return await self._run(func, *args)
+        finally:
+            # a read in flight might have loaded the file before the write
+            self._pending_read = None
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    async def _load(self):
+        # type: () -> dict
+        """
+        Returns:
+            file content shared between all the concurrent callers, DO NOT mutate.
+        """
+        future = self._pending_read
+        if future is None:
+            future = asyncio.ensure_future(self._run(self.source._read))
+            future.add_done_callback(self._clearPendingRead)
+            self._pending_read = future
+        # shield so a cancelled caller doesn't cancel the load for the others
+        return await asyncio.shield(future)
+
+    async def read(self):
+        # type: () -> dict
+        """
+        Returns:
+            copy of the whole file content.
+        """
+        content = await self._load()
+        return copy.deepcopy(content)
+
+    async def get(self, key, default=None):
+        # type: (str, Any | None) -> Any
+        content = await self._load()
+        if key not in content:
+            return default
+        return copy.deepcopy(content[key])
+
+    async def set(self, key, value):
+        # type: (str, Any) -> None
+        async with self._getWriteLock():
+            await self._write(self.source.set, key, value)
+        return
+
+    @contextlib.asynccontextmanager
+    async def transaction(self):
+        # type: () -> AsyncIterator[dict]
+        """
+        Yield the file content as a dict that can be freely modified. It is written
+        back in a single write on exit, unless an exception was raised.
+
+        Other writes from this instance wait for the transaction to finish.
+        """
+        async with self._getWriteLock():
+            content = await self._run(self.source._read)
+            yield content
+            await self._write(self.source._write, content)
+            logger.debug(
+                "[{}][transaction] committed {}"
+                "".format(self.__class__.__name__, self.source.path)
+            )
+
+    def close(self):
+        """
+        Release the private executor, if any.
+        """
+        if self._owns_executor:
+            self._executor.shutdown(wait=False)
+        return
@@ -0,0 +1,311 @@
+"""
+Run ``BasePreferencesFile`` operations on many files at once using a worker pool.
+
+Can be used as a command line tool::
+
+    python -m pythonningcore.datastructuring.batching my.mod:Prefs "/dir" --upgrade
+
+Where the first argument is the import path of the BasePreferencesFile subclass and
+the second a directory (all its json files, recursively) or a glob pattern.
+"""
+from __future__ import annotations
+
+import argparse
+import concurrent.futures
+import glob
+import importlib
+import logging
+import os
+import sys
+import time
+
+import pythonningcore.loggering
+import pythonningcore.py23.helpers
+
+from . import c
+
+if pythonningcore.py23.helpers.isModuleAvailable("typing"):
+    from typing import Iterable, Iterator, Sequence, Type
+    from .preferencing import BasePreferencesFile
+
+__all__ = (
+    "BatchResult",
+    "BatchSummary",
+    "collectPreferencesPaths",
+    "processPreferencesFiles",
+)
+
+logger = logging.getLogger("{}.batching".format(c.abr))
+
+OPERATIONS = ("upgrade", "validate")
+"""
+Supported operations, always applied in this order.
+"""
+
+
+class BatchResult:
+    """
+    Result of the operations applied to a single preferences file.
+
+    Args:
+        path: path of the preferences file processed.
+        errors: error messages collected, empty if everything went fine.
+        duration: time in seconds spent processing the file.
+    """
+
+    def __init__(self, path, errors, duration):
+        # type: (str, list[str], float) -> None
+        self.path = path
+        self.errors = errors
+        self.duration = duration
+
+    def __str__(self):
+        status = "OK" if self.ok else "FAILED"
+        message = "[{}] {} ({:.3f}s)".format(status, self.path, self.duration)
+        for error in self.errors:
+            message += "\n    {}".format(error.replace("\n", "\n    "))
+        return message
+
+    @property
+    def ok(self):
+        # type: () -> bool
+        return not self.errors
+
+
+class BatchSummary:
+    """
+    Accumulate BatchResult to report the progress and throughput of a batch.
+    """
+
+    def __init__(self):
+        self.start_time = time.time()  # type: float
+        self.processed = 0  # type: int
+        self.failed = 0  # type: int
+
+    def __str__(self):
+        return "{} file(s) processed, {} failed in {:.2f}s ({:.1f} files/s)" "".format(
+            self.processed, self.failed, self.elapsed, self.throughput
+        )
+
+    @property
+    def elapsed(self):
+        # type: () -> float
+        return time.time() - self.start_time
+
+    @property
+    def throughput(self):
+        # type: () -> float
+        """
+        Number of files processed per second.
+        """
+        elapsed = self.elapsed
+        return self.processed / elapsed if elapsed else 0.0
+
+    def add(self, result):
+        # type: (BatchResult) -> None
+        self.processed += 1
+        if not result.ok:
+            self.failed += 1
+
+
+def collectPreferencesPaths(path_or_pattern):
+    # type: (str) -> Iterator[str]
+    """
+    Args:
+        path_or_pattern:
+            directory to search json files in (recursively) or a glob pattern
+            (``**`` supported).
+
+    Returns:
+        generator of preferences file paths.
+    """
+    if os.path.isdir(path_or_pattern):
+        path_or_pattern = os.path.join(path_or_pattern, "**", "*.json")
+    return glob.iglob(path_or_pattern, recursive=True)
+
+
+def _processFile(preferences_file_class, path, operations):
+    # type: (Type[BasePreferencesFile], str, Sequence[str]) -> BatchResult
+    """
+    Must be a module-level function to be used by a process pool.
+    """
+    start_time = time.time()
+    errors = []
+    try:
+        preferences_file = preferences_file_class(path)
+        if "upgrade" in operations:
+            preferences_file.upgrade(log=False)
+        if "validate" in operations:
+            for key_name, error in preferences_file.validate(raise_errors=False):
+                errors.append(
+                    "[{}] {}: {}".format(
+                        key_name or "file", error.__class__.__name__, error
+                    )
+                )
+    except Exception as excp:
+        errors.append("{}: {}".format(excp.__class__.__name__, excp))
+    return BatchResult(path, errors, time.time() - start_time)
+
+
+def processPreferencesFiles(
+    preferences_file_class,  # type: Type[BasePreferencesFile]
+    paths,  # type: Iterable[str]
+    operations=OPERATIONS,  # type: Sequence[str]
+    max_workers=None,  # type: int | None
+    use_processes=False,  # type: bool
+):
+    # type: (...) -> Iterator[BatchResult]
+    """
+    Apply the given operations on all the preferences files, in parallel.
+
+    Results are yielded as soon as each file is processed, so not in the order of
+    ``paths``. No more than twice the number of workers files are queued at once,
+    so ``paths`` can be a lazy iterable of any size.
+
+    Args:
+        preferences_file_class:
+            BasePreferencesFile subclass used to open each file. Must be importable
+            (defined at module level) if ``use_processes=True``.
+        paths: preferences file paths to process.
+        operations: names of the operations to apply, see ``OPERATIONS``.
+        max_workers:
+            maximum number of files processed at the same time. None to pick a
+            value based on the number of CPUs.
+        use_processes:
+            True to use a process pool instead of a thread pool, useful when
+            validation is CPU bound.
+
+    Returns:
+        generator of BatchResult, one per path.
+    """
+    for operation in operations:
+        if operation not in OPERATIONS:
+            raise ValueError(
+                "Unsupported operation <{}>, expected one of {}"
+                "".format(operation, OPERATIONS)
+            )
+
+    if max_workers is None:
+        max_workers = min(32, (os.cpu_count() or 1) + 4)
+
+    if use_processes:
+        executor = concurrent.futures.ProcessPoolExecutor(max_workers=max_workers)
+    else:
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+
+    max_pending = max_workers * 2
+    paths = iter(paths)
+    pending = set()
+
+    with executor:
+        while True:
+            for path in paths:
+                pending.add(
+                    executor.submit(
+                        _processFile, preferences_file_class, str(path), operations
+                    )
+                )
+                if len(pending) >= max_pending:
+                    break
+
+            if not pending:
+                break
+
+            done, pending = concurrent.futures.wait(
+                pending, return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            for future in done:
+                yield future.result()
+
+    return
+
+
+def _importClass(import_path):
+    # type: (str) -> Type[BasePreferencesFile]
+    """
+    Args:
+        import_path: "module.name:ClassName" or "module.name.ClassName"
+    """
+    if ":" in import_path:
+        module_name, class_name = import_path.split(":", 1)
+    else:
+        module_name, class_name = import_path.rsplit(".", 1)
+    module = importlib.import_module(module_name)
+    return getattr(module, class_name)
+
+
+def main(argv=None):
+    # type: (list[str] | None) -> int
+    """
+    Command line entry point.
+
+    Returns:
+        exit code, non-zero if any file failed.
+    """
+    parser = argparse.ArgumentParser(
+        prog="python -m {}.batching".format(__package__),
+        description="Validate and/or upgrade many preferences files in parallel.",
+    )
+    parser.add_argument(
+        "preferences_class",
+        help='BasePreferencesFile subclass to use, as "module.name:ClassName".',
+    )
+    parser.add_argument(
+        "paths",
+        help="Directory to search json files in, or glob pattern.",
+    )
+    parser.add_argument(
+        "--upgrade",
+        action="store_true",
+        help="Add the missing keys to each file before validating it.",
+    )
+    parser.add_argument(
+        "--no-validate",
+        action="store_true",
+        help="Do not validate the files.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Maximum number of files processed at the same time.",
+    )
+    parser.add_argument(
+        "--processes",
+        action="store_true",
+        help="Use a process pool instead of a thread pool.",
+    )
+    parser.add_argument(
+        "--quiet",
+        action="store_true",
+        help="Only print the failed files and the summary.",
+    )
+    args = parser.parse_args(argv)
+
+    operations = []
+    if args.upgrade:
+        operations.append("upgrade")
+    if not args.no_validate:
+        operations.append("validate")
+
+    preferences_file_class = _importClass(args.preferences_class)
+    summary = BatchSummary()
+
+    for result in processPreferencesFiles(
+        preferences_file_class,
+        collectPreferencesPaths(args.paths),
+        operations=operations,
+        max_workers=args.workers,
+        use_processes=args.processes,
+    ):
+        summary.add(result)
+        if not args.quiet or not result.ok:
+            print(result)
+
+    print(summary)
+    return 1 if summary.failed else 0
+
+
+if __name__ == "__main__":
+    pythonningcore.loggering.setupLoggingFor(loggers=[c.abr], level=logging.INFO)
+    sys.exit(main())
@@ -2,8 +2,18 @@
 """
 from __future__ import annotations
 
+import contextlib
+import copy
 import json
 import logging
+import os
+import random
+import stat
+import threading
+import time
+import uuid
+import zlib
+from concurrent.futures import ThreadPoolExecutor
 
 import pythonningcore.py23.helpers
 
@@ -12,12 +22,80 @@ from . import c
 if pythonningcore.py23.helpers.isModuleAvailable("pathlib"):
     from pathlib import Path
 if pythonningcore.py23.helpers.isModuleAvailable("typing"):
-    from typing import Any
+    from typing import Any, Callable, Iterable
 
-__all__ = ("DiskDict",)
+__all__ = (
+    "DiskDict",
+    "getFileSignature",
+    "ShardedDiskDict",
+    "VersionConflictError",
+    "VERSION_KEY",
+    "writeFileAtomic",
+)
 
 logger = logging.getLogger(f"{c.abr}.dicting")
 
+VERSION_KEY = "__version__"
+"""
+Key storing the version stamp of a DiskDict file, incremented on each write.
+"""
+
+
+class VersionConflictError(RuntimeError):
+    """
+    Raised when a DiskDict file has been modified between a read and a write.
+    """
+
+    pass
+
+
+def getFileSignature(path):
+    # type: (str) -> tuple | None
+    """
+    Returns:
+        (inode, size, modification time) of the file, that changes whenever the
+        file is modified or replaced. None if the file doesn't exist.
+    """
+    try:
+        stat_result = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat_result.st_ino, stat_result.st_size, stat_result.st_mtime_ns
+
+
+def writeFileAtomic(path, text):
+    # type: (str, str) -> None
+    """
+    Write the given text to a temporary file next to path, then replace path with
+    it, so readers never see a partially written file.
+
+    The permissions of an existing file are kept, a new file gets the default ones
+    (umask applied). If path is a symbolic link, the file it points to is replaced,
+    not the link. Concurrent calls, from threads or processes, never share their
+    temporary file.
+    """
+    path = os.path.realpath(path)
+    directory, name = os.path.split(path)
+    tmp_path = os.path.join(directory, ".{}.{}.tmp".format(name, uuid.uuid4().hex))
+    try:
+        mode = stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        mode = None
+
+    # 0o666 lets the umask decide the permissions of new files, like open() does
+    descriptor = os.open(tmp_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o666)
+    try:
+        with os.fdopen(descriptor, "w") as file:
+            file.write(text)
+        if mode is not None:
+            os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return
+
 
 class DiskDict:
     """
@@ -27,18 +105,49 @@ class DiskDict:
     Trying to set a key while the instance is set to ``read_only=True`` will not raise
     error but will not apply any change.
 
+    Writes are atomic: the content is written to a temporary file that then replace
+    the original one.
+
+    Versioning
+    ==========
+
+    A version stamp can be stored in the file under the ``VERSION_KEY`` key. Once
+    present it is incremented on every write. ``update()`` and ``compareAndSet()``
+    use it to detect that another process wrote the file between their read and
+    their write, in which case they retry with a backoff.
+
+    A lock file is only held for the duration of the version check and the file
+    replacement, never during the caller's computation.
+
+    With ``versioned=True``, every write is checked against the version stamp,
+    including ``__setitem__`` which then becomes a retried ``update()``.
+
     Args:
         file_path:
             absolute path to the FILE storing the dict. MIGHT not exist yet.
             Expected to be json for now.
         read_only:
             True to prevent writing anything to the file on disk.
+        versioned:
+            True to check every write against the version stamp stored in the file.
+    """
+
+    metadata_keys = (VERSION_KEY,)
+    """
+    Keys stored in the file that are not data but are used by the class itself.
+    """
+
+    lock_timeout = 10.0
+    """
+    Duration in seconds after which an existing lock file is considered stale.
     """
 
-    def __init__(self, file_path, read_only=False):
-        # type: (str | Path, bool) -> None
+    def __init__(self, file_path, read_only=False, versioned=False):
+        # type: (str | Path, bool, bool) -> None
         self.path = str(file_path)  # type: str
         self.read_only = read_only  # type: bool
+        self.versioned = versioned  # type: bool
+        self._local = threading.local()
         logger.debug(
             "[{}][__init__] Finished with path={}"
             "".format(self.__class__.__name__, self.path)
@@ -54,10 +163,18 @@ class DiskDict:
         Returns:
             value of the given key
         """
+        snapshot = self._snapshot
+        if snapshot is not None:
+            # only copy the value asked for, not the whole snapshot
+            return copy.deepcopy(snapshot[item])
         return self._read()[item]
 
     def __setitem__(self, key, value):
         # type: (str, Any) -> None
+        if self.versioned:
+            self.update(key, lambda _: value)
+            return
+
         new = self._read()
         new[key] = value
         self._write(new)
@@ -70,21 +187,196 @@ class DiskDict:
         # type: () -> str
         return json.dumps(self._read(), indent=4)
 
+    @property
+    def _snapshot(self):
+        # type: () -> dict | None
+        """
+        Content loaded by ``snapshot()`` in the current thread, None outside of it.
+        """
+        return getattr(self._local, "snapshot", None)
+
+    @_snapshot.setter
+    def _snapshot(self, content):
+        # type: (dict | None) -> None
+        self._local.snapshot = content
+
     def _read(self):
         # type: () -> dict
+        """
+        Returns:
+            file content, or a copy of the snapshot if the current thread has one.
+        """
+        if self._snapshot is not None:
+            return dict(self._snapshot)
+        return self._load()
+
+    def _load(self):
+        # type: () -> dict
+        """
+        Returns:
+            file content parsed from disk, ignoring any active snapshot.
+        """
         with open(self.path, "r") as file:
             content = json.load(file)
         return content
 
     def _write(self, content):
         # type: (dict) -> None
+        """
+        Args:
+            content:
+                new file content, its version stamp, if any, is incremented in place.
+
+        Raises:
+            VersionConflictError: if versioned and the file changed since it was read.
+        """
         if self.read_only:
             return
 
-        with open(self.path, "w") as file:
-            json.dump(content, file, indent=4)
+        if self.versioned:
+            self._writeIfVersion(content)
+            return
+
+        if VERSION_KEY in content:
+            content[VERSION_KEY] += 1
+        self._replace(content)
         return
 
+    def _replace(self, content):
+        # type: (dict) -> None
+        """
+        Atomically replace the file on disk with the given content.
+        """
+        writeFileAtomic(self.path, json.dumps(content, indent=4))
+
+        if self._snapshot is not None:
+            self._snapshot = dict(content)
+        return
+
+    def _acquireLock(self, timeout):
+        # type: (float) -> str
+        """
+        Create the lock file for this instance's file, waiting for it to be released
+        if it already exists.
+
+        Returns:
+            path of the lock file created.
+
+        Raises:
+            VersionConflictError: if the lock can't be acquired before timeout.
+        """
+        lock_path = self.path + ".lock"
+        start_time = time.time()
+        delay = 0.001
+
+        while True:
+            try:
+                descriptor = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                pass
+            else:
+                os.close(descriptor)
+                return lock_path
+
+            try:
+                if time.time() - os.path.getmtime(lock_path) > self.lock_timeout:
+                    logger.warning(
+                        "[{}][_acquireLock] removing stale lock {}"
+                        "".format(self.__class__.__name__, lock_path)
+                    )
+                    os.remove(lock_path)
+                    continue
+            except FileNotFoundError:
+                continue
+
+            if time.time() - start_time > timeout:
+                raise VersionConflictError(
+                    "Can't acquire lock {} after {}s".format(lock_path, timeout)
+                )
+            time.sleep(delay)
+            delay = min(delay * 2, 0.05)
+
+    def _writeIfVersion(self, content):
+        # type: (dict) -> None
+        """
+        Write the content only if the file version on disk is still the one stored
+        in the content.
+
+        Raises:
+            VersionConflictError: if the version on disk is different.
+        """
+        if self.read_only:
+            return
+
+        expected = content.get(VERSION_KEY, 0)
+        lock_path = self._acquireLock(timeout=self.lock_timeout)
+        try:
+            try:
+                current = self._load().get(VERSION_KEY, 0)
+            except FileNotFoundError:
+                current = 0
+            if current != expected:
+                raise VersionConflictError(
+                    "{} was modified: expected version {}, found {}"
+                    "".format(self.path, expected, current)
+                )
+            content[VERSION_KEY] = expected + 1
+            self._replace(content)
+        finally:
+            os.remove(lock_path)
+        return
+
+    def _modify(self, func, retries, backoff):
+        # type: (Callable[[dict], bool], int, float) -> bool
+        """
+        Read-modify-write loop, retried while the file is modified concurrently.
+
+        Args:
+            func: modify the given content in place, return False to abort the write.
+            retries: maximum number of retries after a version conflict.
+            backoff: base delay in seconds, doubled on each retry (with jitter).
+
+        Returns:
+            False if func aborted the write, else True.
+        """
+        attempt = 0
+        while True:
+            content = self._load()
+            if func(content) is False:
+                return False
+            try:
+                self._writeIfVersion(content)
+            except VersionConflictError:
+                if attempt >= retries:
+                    raise
+                time.sleep(random.uniform(0, backoff * (2**attempt)))
+                attempt += 1
+                continue
+            return True
+
+    @contextlib.contextmanager
+    def snapshot(self):
+        """
+        Context where the file is only parsed once: every read returns the content
+        loaded when entering (updated with the writes made by this instance).
+
+        Useful when performing many reads in a row. Changes made to the file by
+        others while inside the context are not seen. Nested calls reuse the
+        outer snapshot.
+
+        The snapshot only applies to the current thread, reads from other threads
+        still load the file.
+        """
+        if self._snapshot is not None:
+            yield
+            return
+
+        self._snapshot = self._load()
+        try:
+            yield
+        finally:
+            self._snapshot = None
+
     def debug(self, log=False):
         # type: (bool) -> str
         """
@@ -111,3 +403,240 @@ class DiskDict:
     def set(self, key, value):
         # type: (str, Any) -> None
         self[key] = value
+
+    def update(self, key, func, default=None, retries=20, backoff=0.005):
+        # type: (str, Callable[[Any], Any], Any, int, float) -> Any
+        """
+        Atomically replace the value of ``key`` by ``func(value)``.
+
+        ``func`` might be called multiple times if the file is modified concurrently
+        so it must not have side effects.
+
+        Example::
+
+            disk_dict.update("counter", lambda value: value + 1, default=0)
+
+        Args:
+            key: key to modify, MIGHT not exist yet.
+            func: receive the current value and return the new one.
+            default: value passed to func if the key doesn't exist yet.
+            retries: maximum number of retries after a version conflict.
+            backoff: base delay in seconds, doubled on each retry (with jitter).
+
+        Returns:
+            new value written.
+
+        Raises:
+            VersionConflictError: if still conflicting after all the retries.
+        """
+        result = []
+
+        def _modify(content):
+            content[key] = func(content.get(key, default))
+            result[:] = [content[key]]
+
+        self._modify(_modify, retries=retries, backoff=backoff)
+        logger.debug(
+            "[{}][update] modified {}={}"
+            "".format(self.__class__.__name__, key, result[0])
+        )
+        return result[0]
+
+    def compareAndSet(self, key, expected, value, retries=20, backoff=0.005):
+        # type: (str, Any, Any, int, float) -> bool
+        """
+        Set ``key`` to ``value`` only if its current value is equal to ``expected``.
+
+        Args:
+            key: key to modify, a missing key is considered as having a None value.
+            expected: value the key must currently have.
+            value: new value to set.
+            retries: maximum number of retries after a version conflict.
+            backoff: base delay in seconds, doubled on each retry (with jitter).
+
+        Returns:
+            True if the value was set, False if the current value was not expected.
+
+        Raises:
+            VersionConflictError: if still conflicting after all the retries.
+        """
+
+        def _modify(content):
+            if content.get(key) != expected:
+                return False
+            content[key] = value
+
+        return self._modify(_modify, retries=retries, backoff=backoff)
+
+
+class ShardedDiskDict:
+    """
+    Looks like a dict but is not one. Data is spread across ``shard_count`` json
+    files stored in a directory, each key being always stored in the same file
+    using a stable hash of its name.
+
+    Each shard has its own cache and its own lock, so setting a key only rewrites
+    the shard it belongs to, and threads modifying keys from different shards don't
+    wait on each other.
+
+    The cache of a shard is invalidated when its file signature (inode, size,
+    modification time) changes on disk.
+
+    Args:
+        dir_path:
+            absolute path to the DIRECTORY storing the shards. MIGHT not exist yet.
+        shard_count:
+            number of files to spread the keys across. Must never change for an
+            existing directory, else keys would be looked up in the wrong file.
+        read_only:
+            True to prevent writing anything to the files on disk.
+        max_workers:
+            maximum number of threads used by the bulk ``load`` and ``save``
+            methods. None lets ThreadPoolExecutor choose.
+    """
+
+    shard_name = "shard-{:04d}.json"
+
+    def __init__(self, dir_path, shard_count=16, read_only=False, max_workers=None):
+        # type: (str | Path, int, bool, int | None) -> None
+        self.path = str(dir_path)  # type: str
+        self.shard_count = shard_count  # type: int
+        self.read_only = read_only  # type: bool
+        self.max_workers = max_workers  # type: int | None
+
+        self.shards = [
+            DiskDict(os.path.join(self.path, self.shard_name.format(index)), read_only)
+            for index in range(shard_count)
+        ]  # type: list[DiskDict]
+        self._locks = [threading.RLock() for _ in range(shard_count)]
+        self._caches = [None] * shard_count  # type: list[tuple[tuple, dict] | None]
+
+        logger.debug(
+            "[{}][__init__] Finished with path={}, shard_count={}"
+            "".format(self.__class__.__name__, self.path, self.shard_count)
+        )
+        return
+
+    def __getitem__(self, item):
+        # type: (str) -> Any
+        """
+        Args:
+            item: key that MUST exists in the dict
+
+        Returns:
+            value of the given key
+        """
+        return copy.deepcopy(self._readShard(self.shardIndex(item))[item])
+
+    def __setitem__(self, key, value):
+        # type: (str, Any) -> None
+        index = self.shardIndex(key)
+        with self._locks[index]:
+            new = dict(self._readShard(index))
+            new[key] = value
+            self._writeShard(index, new)
+        logger.debug(
+            "[{}][set] modified {}={}".format(self.__class__.__name__, key, value)
+        )
+        return
+
+    def __str__(self):
+        # type: () -> str
+        return json.dumps(self.load(), indent=4)
+
+    def _readShard(self, index):
+        # type: (int) -> dict
+        """
+        Returns:
+            cached content of the given shard, DO NOT mutate.
+        """
+        shard = self.shards[index]
+        with self._locks[index]:
+            signature = getFileSignature(shard.path)
+            if signature is None:
+                return {}
+
+            cache = self._caches[index]
+            if cache is not None and cache[0] == signature:
+                return cache[1]
+
+            content = shard._read()
+            self._caches[index] = (signature, content)
+            return content
+
+    def _writeShard(self, index, content):
+        # type: (int, dict) -> None
+        if self.read_only:
+            return
+
+        shard = self.shards[index]
+        with self._locks[index]:
+            if not os.path.exists(self.path):
+                os.makedirs(self.path, exist_ok=True)
+            shard._write(content)
+            self._caches[index] = (getFileSignature(shard.path), content)
+        return
+
+    def _map(self, func, iterable):
+        # type: (Callable, Iterable) -> list
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return list(executor.map(func, iterable))
+
+    def shardIndex(self, key):
+        # type: (str) -> int
+        """
+        Returns:
+            index of the shard the given key is stored in. Stable across sessions.
+        """
+        return zlib.crc32(key.encode("utf-8")) % self.shard_count
+
+    def get(self, key, default=None):
+        # type: (str, Any | None) -> Any
+        try:
+            out = self[key]
+        except KeyError:
+            out = default
+        return out
+
+    def set(self, key, value):
+        # type: (str, Any) -> None
+        self[key] = value
+
+    def load(self):
+        # type: () -> dict
+        """
+        Read all the shards in parallel.
+
+        Returns:
+            new dict with the content of all the shards merged.
+        """
+        out = {}
+        for content in self._map(self._readShard, range(self.shard_count)):
+            out.update(copy.deepcopy(content))
+        return out
+
+    def save(self, content):
+        # type: (dict) -> None
+        """
+        Set all the given key/value pairs, shards are written in parallel and only
+        the shards that actually contain one of the given keys are written.
+
+        Args:
+            content: mapping of keys to set, existing keys not in it are kept.
+        """
+        per_shard = {}  # type: dict[int, dict]
+        for key, value in content.items():
+            per_shard.setdefault(self.shardIndex(key), {})[key] = value
+
+        def _saveShard(index):
+            with self._locks[index]:
+                new = dict(self._readShard(index))
+                new.update(per_shard[index])
+                self._writeShard(index, new)
+
+        self._map(_saveShard, per_shard)
+        logger.debug(
+            "[{}][save] modified {} keys across {} shards"
+            "".format(self.__class__.__name__, len(content), len(per_shard))
+        )
+        return
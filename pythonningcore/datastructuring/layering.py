@@ -0,0 +1,263 @@
+"""
+Stack multiple sources of preferences on top of each other, the highest priority
+source overriding the others::
+
+    BaseKey.default → site → user → environment
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+
+import pythonningcore.py23.helpers
+
+from . import c
+from . import dicting
+
+if pythonningcore.py23.helpers.isModuleAvailable("typing"):
+    from typing import Any, Sequence, Type
+    from .preferencing import BasePreferences, PreferencesSchema
+
+__all__ = ("LayeredPreferences",)
+
+logger = logging.getLogger("{}.layering".format(c.abr))
+
+
+class LayeredPreferences:
+    """
+    Read-mostly view of preferences resolved across multiple layers.
+
+    The layers are, from lowest to highest priority:
+
+    - the default value of each BaseKey
+    - each DiskDict given, in order (a missing file is an empty layer)
+    - the environment variables named ``{env_prefix}{KEY_NAME}`` (uppercase),
+      which values are json-decoded (kept as string if not valid json).
+
+    The content of each layer and the merged result are cached, so reading a key
+    is a single dict lookup regardless of the number of layers. A layer is only
+    re-read when its file changed, which is checked when calling ``refresh()``,
+    every ``refresh_interval`` seconds if specified, and when writing through
+    this instance.
+
+    Args:
+        preference_class: BasePreferences subclass describing the supported keys.
+        layers:
+            DiskDict instances, ordered from lowest to highest priority. At least
+            one is required, it being the layer written by default.
+        env_prefix:
+            prefix of the environment variables to use as top layer, None to
+            disable that layer.
+        refresh_interval:
+            minimum duration in seconds between two automatic ``refresh()`` done
+            when reading. None to only refresh explicitly.
+    """
+
+    def __init__(
+        self,
+        preference_class,  # type: Type[BasePreferences]
+        layers,  # type: Sequence[dicting.DiskDict]
+        env_prefix=None,  # type: str | None
+        refresh_interval=None,  # type: float | None
+    ):
+        # type: (...) -> None
+        if not layers:
+            raise ValueError("LayeredPreferences needs at least one DiskDict layer")
+
+        self.preference_class = preference_class
+        self.layers = list(layers)  # type: list[dicting.DiskDict]
+        self.env_prefix = env_prefix  # type: str | None
+        self.refresh_interval = refresh_interval  # type: float | None
+
+        self._lock = threading.RLock()
+        self._layer_contents = [None] * len(self.layers)  # type: list[dict | None]
+        self._layer_signatures = [None] * len(self.layers)  # type: list[tuple | None]
+        self._env_content = None  # type: dict | None
+        self._merged = None  # type: dict | None
+        self._last_refresh = time.monotonic()  # type: float
+        return
+
+    def __getitem__(self, item):
+        # type: (str) -> Any
+        return self.merged[item]
+
+    def __contains__(self, item):
+        # type: (str) -> bool
+        return item in self.merged
+
+    def __str__(self):
+        return json.dumps(self.merged, indent=4, default=str)
+
+    @property
+    def schema(self):
+        # type: () -> PreferencesSchema
+        schema = self.preference_class._schema
+        if schema is None:
+            # legacy subclass, keys are only known once instanced
+            schema = self.preference_class(None).schema
+        return schema
+
+    @property
+    def merged(self):
+        # type: () -> dict
+        """
+        Resolved preferences of all the layers, DO NOT mutate.
+        """
+        if (
+            self.refresh_interval is not None
+            and time.monotonic() - self._last_refresh > self.refresh_interval
+        ):
+            self.refresh()
+
+        merged = self._merged
+        if merged is None:
+            with self._lock:
+                merged = self._merge()
+        return merged
+
+    def _loadLayer(self, index):
+        # type: (int) -> bool
+        """
+        Returns:
+            True if the layer content changed since last load.
+        """
+        layer = self.layers[index]
+        signature = dicting.getFileSignature(layer.path)
+        if (
+            self._layer_contents[index] is not None
+            and signature == self._layer_signatures[index]
+        ):
+            return False
+
+        content = {} if signature is None else layer._read()
+        for key in layer.metadata_keys:
+            content.pop(key, None)
+
+        self._layer_contents[index] = content
+        self._layer_signatures[index] = signature
+        return True
+
+    def _loadEnvironment(self):
+        # type: () -> bool
+        """
+        Returns:
+            True if the environment layer changed since last load.
+        """
+        if self.env_prefix is None:
+            return False
+
+        content = {}
+        for key_name in self.schema.names:
+            raw_value = os.environ.get(self.env_prefix + key_name.upper())
+            if raw_value is None:
+                continue
+            try:
+                content[key_name] = json.loads(raw_value)
+            except ValueError:
+                content[key_name] = raw_value
+
+        if content == self._env_content:
+            return False
+        self._env_content = content
+        return True
+
+    def _merge(self):
+        # type: () -> dict
+        for index in range(len(self.layers)):
+            if self._layer_contents[index] is None:
+                self._loadLayer(index)
+        if self._env_content is None:
+            self._loadEnvironment()
+
+        merged = dict(self.schema.defaults)
+        for content in self._layer_contents:
+            merged.update(content)
+        if self._env_content:
+            merged.update(self._env_content)
+
+        self._merged = merged
+        return merged
+
+    def refresh(self):
+        # type: () -> list[int]
+        """
+        Re-read the layers whose file changed on disk and update the merged view
+        if needed.
+
+        Returns:
+            indexes of the layers that changed, -1 being the environment layer.
+        """
+        with self._lock:
+            changed = [
+                index for index in range(len(self.layers)) if self._loadLayer(index)
+            ]
+            if self._loadEnvironment():
+                changed.append(-1)
+            if changed:
+                self._merged = None
+            self._last_refresh = time.monotonic()
+
+        if changed:
+            logger.debug(
+                "[{}][refresh] layers changed: {}"
+                "".format(self.__class__.__name__, changed)
+            )
+        return changed
+
+    def invalidate(self, index=None):
+        # type: (int | None) -> None
+        """
+        Discard the cache of the given layer, or of all layers if None.
+        """
+        with self._lock:
+            indexes = range(len(self.layers)) if index is None else [index]
+            for layer_index in indexes:
+                self._layer_contents[layer_index] = None
+                self._layer_signatures[layer_index] = None
+            if index is None:
+                self._env_content = None
+            self._merged = None
+        return
+
+    def get(self, key, default=None):
+        # type: (str, Any | None) -> Any
+        return self.merged.get(key, default)
+
+    def set(self, key, value, layer=-1):
+        # type: (str, Any, int) -> None
+        """
+        Write the given key in a single layer.
+
+        The environment layer still override the value if it defines the key.
+
+        Args:
+            key: supported key name.
+            value: new value of the key.
+            layer: index of the layer in ``layers`` to write, default to the top one.
+        """
+        assert (
+            key in self.schema.index
+        ), "Unsuported key name: got <{}> expected one of <{}>" "".format(
+            key, self.schema.names
+        )
+        index = layer % len(self.layers)
+        disk_dict = self.layers[index]
+
+        with self._lock:
+            if os.path.exists(disk_dict.path):
+                content = disk_dict._read()
+            else:
+                content = {}
+            content[key] = value
+            disk_dict._write(content)
+
+            # only the written layer is updated, without re-reading it
+            for metadata_key in disk_dict.metadata_keys:
+                content.pop(metadata_key, None)
+            self._layer_contents[index] = content
+            self._layer_signatures[index] = dicting.getFileSignature(disk_dict.path)
+            self._merged = None
+        return
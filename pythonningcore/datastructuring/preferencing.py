@@ -7,7 +7,7 @@ It is build around DiskDict class API.
 
 The host must implements:
 1. a subclass of BaseKey for each key supported
-2. a subclass of Preferences that must instance the class created in 1.
+2. a subclass of Preferences that must declare the classes created in 1.
 
 Rough graph::
 
@@ -28,12 +28,13 @@ Rough graph::
 """
 from __future__ import annotations
 
+import copy
 import json
 import logging
 import os
 import abc
+import threading
 from abc import abstractmethod, abstractproperty
-from functools import cache
 
 from pythonningcore import py23
 
@@ -44,17 +45,50 @@ ABC = abc.ABCMeta("ABC", (object,), {"__slots__": ()})
 if py23.helpers.isModuleAvailable("pathlib"):
     from pathlib import Path
 if py23.helpers.isModuleAvailable("typing"):
-    from typing import Any, Type
+    from typing import Any, Callable, Type
 
 __all__ = (
     "BaseKey",
     "BaseKeyCategories",
     "BasePreferences",
     "BasePreferencesFile",
+    "Migration",
+    "PreferencesSchema",
+    "PreferencesValidationError",
+    "SCHEMA_VERSION_KEY",
+    "convertKey",
+    "removeKey",
+    "renameKey",
 )
 
 logger = logging.getLogger("{}.preferencing".format(c.abr))
 
+SCHEMA_VERSION_KEY = "__schema_version__"
+"""
+Key storing the version of the migrations applied to a preferences file.
+"""
+
+
+class PreferencesValidationError(ValueError):
+    """
+    Raised when a preferences file has one or more issues.
+
+    Args:
+        path: path of the preferences file validated.
+        errors: list of (key name or None if about the whole file, error) found.
+    """
+
+    def __init__(self, path, errors):
+        # type: (str, list[tuple[str | None, Exception]]) -> None
+        self.path = path
+        self.errors = errors
+        message = "{} error(s) found in {}:".format(len(errors), path)
+        for key_name, error in errors:
+            message += "\n- [{}] {}: {}".format(
+                key_name or "file", error.__class__.__name__, error
+            )
+        super(PreferencesValidationError, self).__init__(message)
+
 
 PreferencesContainer = dicting.DiskDict
 """
@@ -81,6 +115,16 @@ class BaseKeyCategories(py23.Enum):
         return [attr for attr in cls]
 
 
+def _buildTypeError(key_name, types, value):
+    # type: (str, tuple[Type], Any) -> TypeError
+    return TypeError(
+        "Key <{}> has its value with an unexpected type:\n"
+        "   Expected {}\n"
+        "    But got {}"
+        "".format(key_name, types, type(value))
+    )
+
+
 class BaseKey(ABC):
     """
     This is use a subclass to define each key that can be found in the preference file.
@@ -143,14 +187,10 @@ class BaseKey(ABC):
         Raises:
             TypeError: if the current value is not an instance of the expected type(s).
         """
-        if isinstance(self.value, self.types):
+        value = self.value
+        if isinstance(value, self.types):
             return
-        raise TypeError(
-            "Key <{}> has its value with an unexpected type:\n"
-            "   Expected {}\n"
-            "    But got {}"
-            "".format(self.name, self.types, type(self.value))
-        )
+        raise _buildTypeError(self.name, self.types, value)
 
     @abstractmethod
     def validateValue(self):
@@ -161,6 +201,181 @@ class BaseKey(ABC):
         pass
 
 
+class PreferencesSchema:
+    """
+    Compiled description of all the keys supported by a BasePreferences subclass.
+
+    Built once per subclass and shared by all its instances, it allows O(1) key
+    lookup and validation of a whole preferences dict without creating any
+    BaseKey instance.
+
+    Args:
+        key_classes: BaseKey subclasses supported, in their declaration order.
+    """
+
+    def __init__(self, key_classes):
+        # type: (list[Type[BaseKey]]) -> None
+        self.index = {
+            key_class.name: key_class for key_class in key_classes
+        }  # type: dict[str, Type[BaseKey]]
+        self.names = tuple(self.index.keys())  # type: tuple[str]
+        self.types = {
+            name: tuple(key_class.types) for name, key_class in self.index.items()
+        }  # type: dict[str, tuple[Type]]
+        self.defaults = {
+            name: key_class.default for name, key_class in self.index.items()
+        }  # type: dict[str, Any]
+        self.categories = {
+            name: key_class.category for name, key_class in self.index.items()
+        }  # type: dict[str, BaseKeyCategories]
+
+    def __contains__(self, item):
+        # type: (str) -> bool
+        return item in self.index
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __repr__(self):
+        return "<{}{}>".format(self.__class__.__name__, self.names)
+
+    def validate(self, content, ignore=()):
+        # type: (dict, tuple[str]) -> list[tuple[str | None, Exception]]
+        """
+        Check that the given preferences have all the keys expected and that all
+        the values have the expected type.
+
+        Value validation (``BaseKey.validateValue``) is not performed.
+
+        Args:
+            content: preferences as key/value pairs.
+            ignore: key names in content that must not be checked.
+
+        Returns:
+            list of (key name or None if about the whole content, error) found.
+        """
+        errors = []  # type: list[tuple[str | None, Exception]]
+
+        current = set(content.keys()).difference(ignore)
+        if current != self.index.keys():
+            errors.append(
+                (
+                    None,
+                    AssertionError(
+                        "Preferences are missing a key or have an unsupported key."
+                        "\n  Expected {}\n   But got {}."
+                        "".format(sorted(self.names), sorted(current))
+                    ),
+                )
+            )
+
+        for name, types in self.types.items():
+            if name not in content:
+                continue
+            value = content[name]
+            if not isinstance(value, types):
+                errors.append((name, _buildTypeError(name, types, value)))
+
+        return errors
+
+
+class Migration:
+    """
+    A step to upgrade the content of a preferences file from a version to the next.
+
+    Args:
+        version:
+            schema version of the file once this migration is applied, greater
+            than 0 and unique for a BasePreferencesFile subclass.
+        function:
+            receive the preferences as a dict and modify it in place.
+        description: optional short description used for logging.
+    """
+
+    def __init__(self, version, function, description=""):
+        # type: (int, Callable[[dict], None], str) -> None
+        self.version = version
+        self.function = function
+        self.description = description
+
+    def __repr__(self):
+        return "<{}({}) {}>".format(
+            self.__class__.__name__, self.version, self.description
+        )
+
+    def apply(self, content):
+        # type: (dict) -> None
+        self.function(content)
+
+
+def renameKey(old_name, new_name):
+    # type: (str, str) -> Callable[[dict], None]
+    """
+    Returns:
+        migration function renaming a key, keeping its value.
+    """
+
+    def _migrate(content):
+        if old_name in content:
+            content[new_name] = content.pop(old_name)
+
+    return _migrate
+
+
+def removeKey(name):
+    # type: (str) -> Callable[[dict], None]
+    """
+    Returns:
+        migration function removing a key.
+    """
+
+    def _migrate(content):
+        content.pop(name, None)
+
+    return _migrate
+
+
+def convertKey(name, converter):
+    # type: (str, Callable[[Any], Any]) -> Callable[[dict], None]
+    """
+    Returns:
+        migration function replacing a key value by ``converter(value)``.
+    """
+
+    def _migrate(content):
+        if name in content:
+            content[name] = converter(content[name])
+
+    return _migrate
+
+
+class _LazyKey:
+    """
+    Descriptor creating the BaseKey instance on first access, then storing it on the
+    BasePreferences instance so next accesses are regular attribute lookups.
+
+    Args:
+        key_class: BaseKey subclass to instance.
+    """
+
+    def __init__(self, key_class):
+        # type: (Type[BaseKey]) -> None
+        self.key_class = key_class
+
+    def __set_name__(self, owner, name):
+        self.attr_name = name
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self.key_class
+        pref_key = self.key_class(instance._preference_file)
+        instance.__dict__[self.attr_name] = pref_key
+        return pref_key
+
+
 class BasePreferences(ABC):
     """
     Simple namespace for everything related to peference's keys.
@@ -171,18 +386,66 @@ class BasePreferences(ABC):
     subclassing
     ===========
 
-    Only need to implement ``__init__``. You will create a new instance attribute for
-    each BaseKey subclass you created.
+    Declare each BaseKey subclass you created as a class attribute of the same
+    name::
+
+        class Preferences(BasePreferences):
+            key_alpha = key_alpha
+            key_beta = key_beta
+
+    The BaseKey instances are only created when first accessed and are released
+    with the BasePreferences instance.
+
+    Alternatively (legacy), implement ``__init__`` and create a new instance
+    attribute for each BaseKey subclass you created.
     """
 
-    @abstractmethod
+    _schema = None  # type: PreferencesSchema | None
+
+    def __init_subclass__(cls, **kwargs):
+        super(BasePreferences, cls).__init_subclass__(**kwargs)
+
+        key_classes = {}  # type: dict[str, Type[BaseKey]]
+        for base in reversed(cls.__mro__):
+            for attr_name, attr_value in base.__dict__.items():
+                if isinstance(attr_value, _LazyKey):
+                    key_classes[attr_name] = attr_value.key_class
+                elif isinstance(attr_value, type) and issubclass(attr_value, BaseKey):
+                    key_classes[attr_name] = attr_value
+
+        for attr_name, key_class in key_classes.items():
+            if not isinstance(cls.__dict__.get(attr_name), _LazyKey):
+                descriptor = _LazyKey(key_class)
+                descriptor.__set_name__(cls, attr_name)
+                setattr(cls, attr_name, descriptor)
+
+        # legacy subclasses declaring keys in __init__ are compiled on first instance
+        cls._schema = PreferencesSchema(key_classes.values()) if key_classes else None
+
     def __init__(self, preference_file):
         # type: (BasePreferencesFile) -> None
-        pass
+        self._preference_file = preference_file
 
     def __repr__(self):
         return json.dumps(self.items(), default=str, indent=4)
 
+    @property
+    def schema(self):
+        # type: () -> PreferencesSchema
+        """
+        Schema of this class, shared by all its instances.
+        """
+        cls = self.__class__
+        if cls._schema is None:
+            cls._schema = PreferencesSchema(
+                [
+                    value.__class__
+                    for value in self.__dict__.values()
+                    if isinstance(value, BaseKey)
+                ]
+            )
+        return cls._schema
+
     def get(self, key_name):
         # type: (str) -> BaseKey
         """
@@ -198,24 +461,24 @@ class BasePreferences(ABC):
         Returns:
             BaseKey instance
         """
-        if key_name not in self.keys():
+        if key_name not in self.schema.index:
             raise KeyError("Given key <{}> is not implemented.".format(key_name))
-        return self.__getattribute__(key_name)
+        return getattr(self, key_name)
 
-    @cache
     def values(self):
         # type: () -> list[BaseKey]
-        return list(self.__dict__.values())
+        """
+        Returns the BaseKey instances of all the keys, creating them if needed.
+        """
+        return [getattr(self, key_name) for key_name in self.schema.names]
 
-    @cache
     def keys(self):
         # type: () -> list[str]
         """
         Returns the list of all the key name the pref file must contain.
         """
-        return list(self.__dict__.keys())
+        return list(self.schema.names)
 
-    @cache
     def items(self):
         # type: () -> list[tuple[str, BaseKey]]
         return list(zip(self.keys(), self.values()))
@@ -240,6 +503,29 @@ class BasePreferencesFile(ABC, PreferencesContainer):
     You just need to implement ``_preference_class`` as a class variable or as a
     property. It must return your subclass of BasePreferences
 
+    subscriptions
+    =============
+
+    Callbacks can be registered with ``subscribe()`` to be notified when a key
+    value changes, either from a write of this instance or from an external change
+    detected with ``checkForChanges()`` (or its polling thread ``startWatching()``).
+    The old and new content of the file are compared so only the subscribers of
+    the keys that actually changed are called.
+
+    migrations
+    ==========
+
+    Renamed, retyped or removed keys are handled by declaring ``migrations`` as a
+    class variable::
+
+        migrations = (
+            Migration(1, renameKey("old_name", "new_name")),
+            Migration(2, convertKey("new_name", str)),
+        )
+
+    The version of the last migration applied is stored in the file under
+    ``SCHEMA_VERSION_KEY``. ``upgrade()`` applies all the pending migrations at once.
+
     Args:
         file_path:
             absolute path to the preference FILE. MIGHT not exist yet. Content must
@@ -248,10 +534,25 @@ class BasePreferencesFile(ABC, PreferencesContainer):
             True to prevent writing anything to the file on disk.
     """
 
+    metadata_keys = PreferencesContainer.metadata_keys + (SCHEMA_VERSION_KEY,)
+
+    migrations = ()  # type: tuple[Migration]
+    """
+    Steps to upgrade old files, to override in subclass. Order doesn't matter.
+    """
+
     def __init__(self, file_path, read_only=False):
         # type: (str | Path, bool) -> None
         super(BasePreferencesFile, self).__init__(file_path, read_only)
         self.preferences = self._preference_class(self)
+
+        # callbacks by key name, category, or None for all the keys
+        self._subscribers = {}  # type: dict[str | BaseKeyCategories | None, list]
+        self._subscribers_lock = threading.RLock()
+        self._known_content = None  # type: dict | None
+        self._known_signature = None  # type: tuple | None
+        self._watcher = None  # type: threading.Thread | None
+        self._watcher_stop = threading.Event()
         return
 
     @abstractproperty
@@ -269,102 +570,399 @@ class BasePreferencesFile(ABC, PreferencesContainer):
         Returns:
             PreferenceKey instance of the correspond key
         """
-        if isinstance(item, BaseKey):
+        if isinstance(item, BaseKey) or (
+            isinstance(item, type) and issubclass(item, BaseKey)
+        ):
             item = item.name
         assert (
-            item in self.preferences.keys()
+            item in self.preferences.schema.index
         ), "Unsuported key name: got <{}> expected one of <{}>" "".format(
-            item, self.preferences.keys()
+            item, self.preferences.schema.names
         )
         return super(BasePreferencesFile, self).__getitem__(item)
 
     def __setitem__(self, key, value):
         # type: (str | Type[BaseKey], Any) -> None
-        if issubclass(key, BaseKey):
+        if isinstance(key, BaseKey) or (
+            isinstance(key, type) and issubclass(key, BaseKey)
+        ):
             key = key.name
         assert (
-            key in self.preferences.keys()
+            key in self.preferences.schema.index
         ), "Unsuported key name: got <{}> expected one of <{}>" "".format(
-            key, self.preferences.keys()
+            key, self.preferences.schema.names
         )
         super(BasePreferencesFile, self).__setitem__(key, value)
         return
 
+    def _replace(self, content):
+        # type: (dict) -> None
+        if not self._subscribers:
+            super(BasePreferencesFile, self)._replace(content)
+            return
+
+        with self._subscribers_lock:
+            if self._known_content is None:
+                self._known_content = self._loadKnownContent()
+            super(BasePreferencesFile, self)._replace(content)
+            self._updateKnownContent(dict(content))
+        return
+
+    def _loadKnownContent(self):
+        # type: () -> dict
+        self._known_signature = dicting.getFileSignature(self.path)
+        if self._known_signature is None:
+            return {}
+        return self._load()
+
+    def _updateKnownContent(self, new_content):
+        # type: (dict) -> None
+        """
+        Notify the subscribers of the keys that differ between the last known content
+        and the given one, which becomes the new known content.
+        """
+        old_content = self._known_content or {}
+        self._known_content = new_content
+        self._known_signature = dicting.getFileSignature(self.path)
+
+        missing = object()
+        schema = self.preferences.schema
+        for key_name in set(old_content).union(new_content):
+            if key_name in self.metadata_keys:
+                continue
+            old_value = old_content.get(key_name, missing)
+            new_value = new_content.get(key_name, missing)
+            if old_value == new_value:
+                continue
+
+            old_value = None if old_value is missing else old_value
+            new_value = None if new_value is missing else new_value
+            callbacks = self._subscribers.get(key_name, []) + self._subscribers.get(
+                None, []
+            )
+            category = schema.categories.get(key_name)
+            if category is not None and category is not NotImplemented:
+                callbacks += self._subscribers.get(category, [])
+
+            for callback in callbacks:
+                try:
+                    callback(key_name, old_value, new_value)
+                except Exception:
+                    logger.exception(
+                        "[{}][_updateKnownContent] subscriber {} failed for key {}"
+                        "".format(self.__class__.__name__, callback, key_name)
+                    )
+        return
+
+    def subscribe(
+        self,
+        key_or_category,  # type: str | Type[BaseKey] | BaseKeyCategories | None
+        callback,  # type: Callable[[str, Any, Any], None]
+    ):
+        # type: (...) -> Callable
+        """
+        Call ``callback(key_name, old_value, new_value)`` each time a key value
+        change. A value of None means the key didn't exist.
+
+        Args:
+            key_or_category:
+                key name/class to watch, or category to watch all its keys, or None
+                to watch all the keys.
+            callback: function to call on change.
+
+        Returns:
+            the callback, so this can be used as a decorator factory.
+        """
+        if isinstance(key_or_category, BaseKey) or (
+            isinstance(key_or_category, type) and issubclass(key_or_category, BaseKey)
+        ):
+            key_or_category = key_or_category.name
+
+        with self._subscribers_lock:
+            # the known content isn't updated on writes while nobody is subscribed
+            if not self._subscribers or self._known_content is None:
+                self._known_content = self._loadKnownContent()
+            self._subscribers.setdefault(key_or_category, []).append(callback)
+        return callback
+
+    def unsubscribe(self, key_or_category, callback):
+        # type: (str | Type[BaseKey] | BaseKeyCategories | None, Callable) -> None
+        if isinstance(key_or_category, BaseKey) or (
+            isinstance(key_or_category, type) and issubclass(key_or_category, BaseKey)
+        ):
+            key_or_category = key_or_category.name
+
+        with self._subscribers_lock:
+            callbacks = self._subscribers.get(key_or_category, [])
+            if callback in callbacks:
+                callbacks.remove(callback)
+            if not callbacks:
+                self._subscribers.pop(key_or_category, None)
+            if not self._subscribers:
+                # stale as soon as a write happens, reloaded by the next subscribe
+                self._known_content = None
+                self._known_signature = None
+        return
+
+    def checkForChanges(self):
+        # type: () -> bool
+        """
+        Notify the subscribers if the file has been modified externally since last
+        check. Cheap when nothing changed as the file is only stat.
+
+        Returns:
+            True if the file changed.
+        """
+        with self._subscribers_lock:
+            if self._known_content is None:
+                # first check only establish the reference content
+                self._known_content = self._loadKnownContent()
+                return False
+
+            signature = dicting.getFileSignature(self.path)
+            if signature == self._known_signature:
+                return False
+
+            new_content = {} if signature is None else self._load()
+            self._updateKnownContent(new_content)
+        return True
+
+    def startWatching(self, interval=1.0):
+        # type: (float) -> None
+        """
+        Start a daemon thread calling ``checkForChanges`` every ``interval`` seconds.
+        """
+        if self._watcher is not None:
+            return
+
+        def _watch():
+            while not self._watcher_stop.wait(interval):
+                try:
+                    self.checkForChanges()
+                except Exception:
+                    logger.exception(
+                        "[{}][startWatching] error while checking {}"
+                        "".format(self.__class__.__name__, self.path)
+                    )
+
+        self._watcher_stop.clear()
+        self._watcher = threading.Thread(
+            target=_watch,
+            name="{}.watcher".format(self.__class__.__name__),
+            daemon=True,
+        )
+        self._watcher.start()
+        return
+
+    def stopWatching(self):
+        if self._watcher is None:
+            return
+        self._watcher_stop.set()
+        self._watcher.join()
+        self._watcher = None
+        return
+
     def createDefault(self):
         """
         Create the pref file with default values IF it doesn't exist yet.
+
+        The file is written once, atomically.
         """
         if os.path.exists(self.path) or self.read_only:
             return
 
-        # create empty file
-        with open(self.path, "w+") as file:
-            json.dump({}, file)
-
-        # Now set all defaults values
-        self.upgrade(log=False)
+        self._write(self.getDefaultContent())
         logger.info(
             "[{}][createDefault] Finished. New pref created at {}"
             "".format(self.__class__.__name__, self.path)
         )
         return
 
-    def upgrade(self, log=True):
+    @classmethod
+    def createDefaults(cls, paths):
+        # type: (list[str | Path]) -> list[str]
+        """
+        Create with default values all the given pref files that don't exist yet.
+
+        The default content is serialized once and the same payload is atomically
+        written to each file.
+
+        Args:
+            paths: preference files paths.
+
+        Returns:
+            paths of the files created.
         """
-        Add missing keys if any.
+        paths = [str(path) for path in paths]
+        if not paths:
+            return []
+
+        payload = json.dumps(cls(paths[0]).getDefaultContent(), indent=4)
+        created = []
+        for path in paths:
+            if os.path.exists(path):
+                continue
+            dicting.writeFileAtomic(path, payload)
+            created.append(path)
+
+        logger.info(
+            "[{}][createDefaults] Finished. Created {} new pref files."
+            "".format(cls.__name__, len(created))
+        )
+        return created
+
+    def getDefaultContent(self):
+        # type: () -> dict
         """
+        Returns:
+            content of a new pref file, with all the keys set to their default.
+        """
+        content = copy.deepcopy(self.preferences.schema.defaults)
+        schema_version = self.getSchemaVersion()
+        if schema_version:
+            content[SCHEMA_VERSION_KEY] = schema_version
+        return content
 
-        if self.read_only:
-            return
+    @classmethod
+    def getSchemaVersion(cls):
+        # type: () -> int
+        """
+        Returns:
+            version a file has once all the migrations applied, 0 if none declared.
+        """
+        return max([migration.version for migration in cls.migrations] or [0])
 
-        disk_content = self._read()
+    def migrate(self, content, log=True):
+        # type: (dict, bool) -> list[Migration]
+        """
+        Apply in memory all the migrations not applied yet to the given content.
+
+        Args:
+            content: preferences file content to modify in place.
+            log: True to log each migration applied.
 
-        for (
-            key_name,
-            pref_key,
-        ) in self.preferences.items():  # type: str, BaseKey
+        Returns:
+            migrations applied, in order.
+
+        Raises:
+            ValueError: if the migrations versions are not unique or if the content
+                was written by a newer schema version.
+        """
+        migrations = sorted(self.migrations, key=lambda migration: migration.version)
+        versions = [migration.version for migration in migrations]
+        if len(set(versions)) != len(versions) or (versions and versions[0] < 1):
+            raise ValueError(
+                "{}.migrations versions must be unique and > 0, got {}"
+                "".format(self.__class__.__name__, versions)
+            )
 
-            # key exists on disk, all good, skip to next one
-            if not disk_content.get(key_name, "$$%%") == "$$%%":
+        current_version = content.get(SCHEMA_VERSION_KEY, 0)
+        target_version = self.getSchemaVersion()
+        if current_version > target_version:
+            raise ValueError(
+                "{} has schema version {} which is newer than the supported {}"
+                "".format(self.path, current_version, target_version)
+            )
+
+        applied = []
+        for migration in migrations:
+            if migration.version <= current_version:
                 continue
+            migration.apply(content)
+            content[SCHEMA_VERSION_KEY] = migration.version
+            applied.append(migration)
+            if log:
+                logger.info(
+                    "[{}][migrate] applied {}".format(
+                        self.__class__.__name__, migration
+                    )
+                )
+
+        return applied
+
+    def upgrade(self, log=True):
+        """
+        Apply pending migrations and add missing keys if any, in a single write.
+
+        Nothing is written if the file is already up-to-date.
+        """
+
+        if self.read_only:
+            return
 
-            disk_content[key_name] = pref_key.default
+        disk_content = self._read()
+        applied = self.migrate(disk_content, log=log)
+
+        schema = self.preferences.schema
+        missing = [
+            key_name for key_name in schema.names if key_name not in disk_content
+        ]
+        for key_name in missing:
+            disk_content[key_name] = copy.deepcopy(schema.defaults[key_name])
             if log:
                 logger.info(
                     "[{}][upgrade] added missing key {}"
                     "".format(self.__class__.__name__, key_name)
                 )
 
-        self._write(disk_content)
+        if applied or missing:
+            self._write(disk_content)
         return
 
-    def validate(self):
+    def validate(self, raise_errors=True):
+        # type: (bool) -> list[tuple[str | None, Exception]]
         """
-        Raise an error if the file/instance have any issue.
+        Check the file and all its keys, collecting every error found instead of
+        stopping at the first one.
+
+        The file is only read once, all the keys being validated against that
+        same snapshot.
+
+        Args:
+            raise_errors:
+                True to raise a PreferencesValidationError if any error is found,
+                else they are only returned.
+
+        Returns:
+            list of (key name or None if about the whole file, error) found.
+            Empty if the file is valid.
 
         Raises:
-            FileNotFoundError:
-            Exception:
+            FileNotFoundError: if the file doesn't exist.
+            PreferencesValidationError: if any issue is found and raise_errors=True.
         """
         if not os.path.exists(self.path):
             raise FileNotFoundError(
                 "The pref file doesn't exists on disk. Expected {}".format(self.path)
             )
 
-        prefs_content = self._read()
-        expected = sorted(self.preferences.keys())
-        current = sorted(list(prefs_content.keys()))
-        assert current == expected, (
-            "Preferences are missing a key or have an unsupported key.\n"
-            "  Expected {}\n"
-            "   But got {}."
-            "".format(expected, current)
-        )
-
-        # we are sure all the keys are supported
-        for pref_key in self.preferences.values():  # type: BaseKey
-
-            pref_key.validateType()
-            pref_key.validateValue()
+        with self.snapshot():
+            prefs_content = self._read()
+            schema = self.preferences.schema
+            errors = schema.validate(prefs_content, ignore=self.metadata_keys)
+
+            schema_version = prefs_content.get(SCHEMA_VERSION_KEY, 0)
+            if schema_version != self.getSchemaVersion():
+                errors.append(
+                    (
+                        None,
+                        ValueError(
+                            "Schema version is {} while {} is expected."
+                            "".format(schema_version, self.getSchemaVersion())
+                        ),
+                    )
+                )
 
-        return
+            # keys missing or with wrong type are already reported
+            invalid = set(key_name for key_name, _ in errors)
+            for key_name in schema.names:
+                if key_name in invalid or key_name not in prefs_content:
+                    continue
+                try:
+                    self.preferences.get(key_name).validateValue()
+                except Exception as excp:
+                    errors.append((key_name, excp))
+
+        if errors and raise_errors:
+            raise PreferencesValidationError(self.path, errors)
+        return errors
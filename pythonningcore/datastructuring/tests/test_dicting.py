@@ -0,0 +1,272 @@
+import asyncio
+import json
+import logging
+import os
+import shutil
+import stat
+import tempfile
+import threading
+import unittest
+from pathlib import Path  # TODO convert to py2
+from unittest import mock
+
+from pythonningcore.datastructuring import asyncing
+from pythonningcore.datastructuring import dicting
+
+
+logger = logging.getLogger(__name__)
+
+
+class _CountingDiskDict(dicting.DiskDict):
+    """
+    DiskDict counting the number of time the file is read.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(_CountingDiskDict, self).__init__(*args, **kwargs)
+        self.read_count = 0
+
+    def _read(self):
+        self.read_count += 1
+        return super(_CountingDiskDict, self)._read()
+
+
+class _BlockingDiskDict(dicting.DiskDict):
+    """
+    DiskDict whose first read waits for ``release`` once the file is loaded.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(_BlockingDiskDict, self).__init__(*args, **kwargs)
+        self.loaded = threading.Event()
+        self.release = threading.Event()
+
+    def _read(self):
+        content = super(_BlockingDiskDict, self)._read()
+        if not self.loaded.is_set():
+            self.loaded.set()
+            self.release.wait(5)
+        return content
+
+
+class DiskDictVersionTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = Path(tempfile.mkdtemp())
+        self.path = self.tmp_dir / "versioned.json"
+        self.path.write_text(json.dumps({"counter": 0}))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_update(self):
+        disk_dict = dicting.DiskDict(self.path)
+        self.assertEqual(disk_dict.update("counter", lambda value: value + 1), 1)
+        self.assertEqual(disk_dict.update("list", lambda value: value + [1], []), [1])
+        self.assertEqual(disk_dict[dicting.VERSION_KEY], 2)
+
+        # plain writes keep incrementing the stamp once it exists
+        disk_dict["other"] = True
+        self.assertEqual(disk_dict[dicting.VERSION_KEY], 3)
+        self.assertEqual(list(self.tmp_dir.iterdir()), [self.path])
+
+    def test_compare_and_set(self):
+        disk_dict = dicting.DiskDict(self.path)
+        self.assertFalse(disk_dict.compareAndSet("counter", 5, 6))
+        self.assertEqual(disk_dict["counter"], 0)
+        self.assertTrue(disk_dict.compareAndSet("counter", 0, 6))
+        self.assertEqual(disk_dict["counter"], 6)
+
+    def test_conflict(self):
+        disk_dict = dicting.DiskDict(self.path, versioned=True)
+        content = disk_dict._read()
+        disk_dict["counter"] = 1
+        content["counter"] = 2
+        with self.assertRaises(dicting.VersionConflictError):
+            disk_dict._write(content)
+        self.assertEqual(disk_dict["counter"], 1)
+
+    def test_concurrent_update(self):
+        def increment():
+            # each thread uses its own instance, like separated processes would
+            disk_dict = dicting.DiskDict(self.path)
+            for _ in range(10):
+                disk_dict.update("counter", lambda value: value + 1, retries=1000)
+
+        threads = [threading.Thread(target=increment) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(dicting.DiskDict(self.path)["counter"], 80)
+
+    @unittest.skipIf(os.name == "nt", "POSIX permissions and symlinks")
+    def test_write_keeps_file(self):
+        os.chmod(self.path, 0o644)
+        link_path = self.tmp_dir / "link.json"
+        link_path.symlink_to(self.path)
+
+        disk_dict = dicting.DiskDict(link_path)
+        disk_dict["counter"] = 2
+        self.assertTrue(link_path.is_symlink())
+        self.assertEqual(stat.S_IMODE(os.stat(self.path).st_mode), 0o644)
+        self.assertEqual(json.loads(self.path.read_text())["counter"], 2)
+
+        # new files get the default permissions, umask applied
+        umask = os.umask(0o022)
+        try:
+            new_path = self.tmp_dir / "new.json"
+            dicting.writeFileAtomic(str(new_path), "{}")
+        finally:
+            os.umask(umask)
+        self.assertEqual(stat.S_IMODE(os.stat(new_path).st_mode), 0o644)
+        self.assertEqual(
+            sorted(path.name for path in self.tmp_dir.iterdir()),
+            ["link.json", "new.json", "versioned.json"],
+        )
+
+
+class DiskDictSnapshotTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = Path(tempfile.mkdtemp())
+        self.path = self.tmp_dir / "snapshot.json"
+        self.path.write_text(json.dumps({"alpha": 1}))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_per_thread(self):
+        disk_dict = dicting.DiskDict(self.path)
+        seen = []
+
+        with disk_dict.snapshot():
+            dicting.DiskDict(self.path)["alpha"] = 2
+            self.assertEqual(disk_dict["alpha"], 1)
+
+            thread = threading.Thread(target=lambda: seen.append(disk_dict["alpha"]))
+            thread.start()
+            thread.join()
+
+        self.assertEqual(seen, [2])
+        self.assertEqual(disk_dict["alpha"], 2)
+
+    def test_reads(self):
+        content = {"key{}".format(index): [index] for index in range(100)}
+        self.path.write_text(json.dumps(content))
+        disk_dict = dicting.DiskDict(self.path)
+
+        with disk_dict.snapshot():
+            with mock.patch.object(
+                disk_dict, "_read", side_effect=AssertionError("whole copy")
+            ):
+                values = [disk_dict[key] for key in content]
+            # values are copies, the snapshot can't be modified through them
+            values[0].append(1)
+            self.assertEqual(disk_dict["key0"], [0])
+
+        self.assertEqual(values[1:], list(content.values())[1:])
+
+
+class AsyncDiskDictTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.tmp_dir = Path(tempfile.mkdtemp())
+        self.path = self.tmp_dir / "async.json"
+        self.path.write_text(json.dumps({"alpha": 1, "beta": [1, 2]}))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    async def test_get_set(self):
+        async with asyncing.AsyncDiskDict(dicting.DiskDict(self.path)) as store:
+            self.assertEqual(await store.get("alpha"), 1)
+            self.assertEqual(await store.get("missing", 5), 5)
+            await store.set("alpha", 2)
+            self.assertEqual(await store.get("alpha"), 2)
+
+        self.assertEqual(dicting.DiskDict(self.path)["alpha"], 2)
+
+    async def test_merged_reads(self):
+        source = _CountingDiskDict(self.path)
+        async with asyncing.AsyncDiskDict(source) as store:
+            results = await asyncio.gather(*[store.get("alpha") for _ in range(20)])
+
+        self.assertEqual(results, [1] * 20)
+        self.assertLess(source.read_count, 20)
+
+    async def test_read_after_write(self):
+        source = _BlockingDiskDict(self.path)
+        loop = asyncio.get_running_loop()
+        async with asyncing.AsyncDiskDict(source) as store:
+            stale = asyncio.ensure_future(store.get("alpha"))
+            await loop.run_in_executor(None, source.loaded.wait)
+            await store.set("alpha", 2)
+
+            # must not join the read started before the write
+            fresh = asyncio.ensure_future(store.get("alpha"))
+            await asyncio.sleep(0)
+            source.release.set()
+            self.assertEqual(await stale, 1)
+            self.assertEqual(await fresh, 2)
+
+    async def test_transaction(self):
+        async with asyncing.AsyncDiskDict(dicting.DiskDict(self.path)) as store:
+            async with store.transaction() as content:
+                content["alpha"] += 10
+                content["beta"].append(3)
+
+            self.assertEqual(await store.get("alpha"), 11)
+            self.assertEqual(await store.get("beta"), [1, 2, 3])
+
+            with self.assertRaises(ValueError):
+                async with store.transaction() as content:
+                    content["alpha"] = 0
+                    raise ValueError("abort")
+
+            self.assertEqual(await store.get("alpha"), 11)
+
+
+class ShardedDiskDictTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = Path(tempfile.mkdtemp()) / "shards"
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir.parent)
+
+    def test_set_get(self):
+        store = dicting.ShardedDiskDict(self.tmp_dir, shard_count=4)
+        self.assertIsNone(store.get("alpha"))
+        store["alpha"] = 1
+        store.set("beta", {"nested": True})
+
+        reopened = dicting.ShardedDiskDict(self.tmp_dir, shard_count=4)
+        self.assertEqual(reopened["alpha"], 1)
+        self.assertEqual(reopened["beta"], {"nested": True})
+        with self.assertRaises(KeyError):
+            reopened["gamma"]
+
+    def test_single_shard_written(self):
+        store = dicting.ShardedDiskDict(self.tmp_dir, shard_count=8)
+        store["alpha"] = 1
+        written = list(self.tmp_dir.iterdir())
+        self.assertEqual(len(written), 1)
+        self.assertEqual(
+            written[0].name, store.shard_name.format(store.shardIndex("alpha"))
+        )
+
+    def test_bulk(self):
+        content = {"key{}".format(index): index for index in range(200)}
+        store = dicting.ShardedDiskDict(self.tmp_dir, shard_count=8, max_workers=4)
+        store.save(content)
+        self.assertEqual(len(list(self.tmp_dir.iterdir())), 8)
+
+        reopened = dicting.ShardedDiskDict(self.tmp_dir, shard_count=8)
+        self.assertEqual(reopened.load(), content)
+
+    def test_read_only(self):
+        store = dicting.ShardedDiskDict(self.tmp_dir, shard_count=4, read_only=True)
+        store["alpha"] = 1
+        self.assertFalse(self.tmp_dir.exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
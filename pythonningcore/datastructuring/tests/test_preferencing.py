@@ -1,8 +1,14 @@
+import gc
+import json
 import logging
 import os
+import weakref
 from pathlib import Path  # TODO convert to py2
 import unittest
 
+from pythonningcore.datastructuring import batching
+from pythonningcore.datastructuring import dicting
+from pythonningcore.datastructuring import layering
 from pythonningcore.datastructuring import preferencing
 
 
@@ -11,10 +17,16 @@ logger = logging.getLogger(__name__)
 DATA_DIR = Path(__file__).parent / "data"
 PREF1 = DATA_DIR / "pref-test-1.json"
 PREF_TARGET_A = DATA_DIR / "target-A.json"
+BATCH_DIR = DATA_DIR / "batch"
+
+
+class KeyCategories(preferencing.BaseKeyCategories):
+    general = "General"
 
 
 class key_alpha(preferencing.BaseKey):
     name = "key_alpha"
+    category = KeyCategories.general
     types = (bool,)
     default = True
 
@@ -36,13 +48,31 @@ class key_beta(preferencing.BaseKey):
 
 
 class Preferences(preferencing.BasePreferences):
+    key_alpha = key_alpha
+    key_beta = key_beta
+
+
+class PreferencesFile(preferencing.BasePreferencesFile):
+    _preference_class = Preferences
+
+
+class MigratedPreferencesFile(preferencing.BasePreferencesFile):
+    _preference_class = Preferences
+    migrations = (
+        preferencing.Migration(2, preferencing.convertKey("key_alpha", bool)),
+        preferencing.Migration(1, preferencing.renameKey("alpha", "key_alpha")),
+        preferencing.Migration(3, preferencing.removeKey("gamma")),
+    )
+
+
+class LegacyPreferences(preferencing.BasePreferences):
     def __init__(self, preference_file):
         self.key_alpha = key_alpha(preference_file)
         self.key_beta = key_beta(preference_file)
 
 
-class PreferencesFile(preferencing.BasePreferencesFile):
-    _preference_class = Preferences
+class LegacyPreferencesFile(preferencing.BasePreferencesFile):
+    _preference_class = LegacyPreferences
 
 
 class PreferencesFileTest(unittest.TestCase):
@@ -73,6 +103,292 @@ class PreferencesFileTest(unittest.TestCase):
         self.assertTrue(PREF_TARGET_A.exists())
         pref.validate()
 
+    def test_create_defaults(self):
+        paths = [DATA_DIR / "default-{}.json".format(index) for index in range(5)]
+        paths[0].write_text(json.dumps({"key_alpha": False}))
+        try:
+            created = PreferencesFile.createDefaults(paths)
+            self.assertEqual(created, [str(path) for path in paths[1:]])
+            self.assertEqual(
+                json.loads(paths[3].read_text()), {"key_alpha": True, "key_beta": ""}
+            )
+            self.assertFalse(PreferencesFile(paths[0])["key_alpha"])
+        finally:
+            for path in paths:
+                path.unlink(missing_ok=True)
+
+    def test_upgrade_no_write(self):
+        pref = PreferencesFile(PREF_TARGET_A)
+        pref.createDefault()
+        signature = os.stat(PREF_TARGET_A).st_ino
+        pref.upgrade()
+        self.assertEqual(os.stat(PREF_TARGET_A).st_ino, signature)
+
+    def test_set_value(self):
+        pref = PreferencesFile(PREF_TARGET_A)
+        pref.createDefault()
+        pref.preferences.key_alpha.value = False
+        self.assertFalse(pref["key_alpha"])
+        pref[key_alpha] = True
+        self.assertTrue(pref.preferences.key_alpha.value)
+
+    def test_validate_errors(self):
+        PREF_TARGET_A.write_text(
+            json.dumps({"key_alpha": "notabool", "key_beta": "missing.py", "bad": 0})
+        )
+        pref = PreferencesFile(PREF_TARGET_A)
+
+        errors = pref.validate(raise_errors=False)
+        self.assertEqual(
+            [key_name for key_name, _ in errors], [None, "key_alpha", "key_beta"]
+        )
+        self.assertIsInstance(errors[1][1], TypeError)
+
+        with self.assertRaises(preferencing.PreferencesValidationError) as excp:
+            pref.validate()
+        self.assertEqual(len(excp.exception.errors), 3)
+
+    def test_validate_single_read(self):
+        pref = PreferencesFile(PREF1)
+        loads = []
+        original_load = pref._load
+
+        def _load():
+            loads.append(None)
+            return original_load()
+
+        pref._load = _load
+        self.assertEqual(pref.validate(), [])
+        self.assertEqual(len(loads), 1)
+
+
+class MigrationsTest(unittest.TestCase):
+    def tearDown(self):
+        PREF_TARGET_A.unlink(missing_ok=True)
+
+    def test_upgrade(self):
+        PREF_TARGET_A.write_text(json.dumps({"alpha": 0, "gamma": 5}))
+        pref = MigratedPreferencesFile(PREF_TARGET_A)
+        self.assertEqual(len(pref.validate(raise_errors=False)), 2)
+
+        pref.upgrade()
+        self.assertEqual(
+            json.loads(PREF_TARGET_A.read_text()),
+            {
+                "key_alpha": False,
+                "key_beta": "",
+                preferencing.SCHEMA_VERSION_KEY: 3,
+            },
+        )
+        self.assertEqual(pref.validate(), [])
+
+    def test_partial(self):
+        content = {"key_alpha": 1, "gamma": 5, preferencing.SCHEMA_VERSION_KEY: 1}
+        pref = MigratedPreferencesFile(PREF_TARGET_A)
+        applied = pref.migrate(content)
+        self.assertEqual([migration.version for migration in applied], [2, 3])
+        self.assertEqual(content["key_alpha"], True)
+
+        content[preferencing.SCHEMA_VERSION_KEY] = 4
+        with self.assertRaises(ValueError):
+            pref.migrate(content)
+
+    def test_create_default(self):
+        pref = MigratedPreferencesFile(PREF_TARGET_A)
+        pref.createDefault()
+        self.assertEqual(pref.validate(), [])
+
+
+class SubscriptionsTest(unittest.TestCase):
+    def setUp(self):
+        self.pref = PreferencesFile(PREF_TARGET_A)
+        self.pref.createDefault()
+        self.changes = []
+
+    def tearDown(self):
+        self.pref.stopWatching()
+        PREF_TARGET_A.unlink(missing_ok=True)
+
+    def _callback(self, key_name, old_value, new_value):
+        self.changes.append((key_name, old_value, new_value))
+
+    def test_write(self):
+        self.pref.subscribe(key_beta, self._callback)
+        self.pref["key_alpha"] = False
+        self.assertEqual(self.changes, [])
+
+        self.pref["key_beta"] = "test.py"
+        self.pref["key_beta"] = "test.py"
+        self.assertEqual(self.changes, [("key_beta", "", "test.py")])
+
+        self.pref.unsubscribe(key_beta, self._callback)
+        self.pref["key_beta"] = None
+        self.assertEqual(len(self.changes), 1)
+
+    def test_resubscribe(self):
+        self.pref.subscribe(key_alpha, self._callback)
+        self.pref.unsubscribe(key_alpha, self._callback)
+        # changes while nobody listens are never notified
+        self.pref["key_alpha"] = False
+
+        self.pref.subscribe(key_alpha, self._callback)
+        self.pref["key_beta"] = "test.py"
+        self.assertEqual(self.changes, [])
+        self.pref["key_alpha"] = True
+        self.assertEqual(self.changes, [("key_alpha", False, True)])
+
+    def test_category(self):
+        self.pref.subscribe(KeyCategories.general, self._callback)
+        self.pref["key_beta"] = "test.py"
+        self.pref["key_alpha"] = False
+        self.assertEqual(self.changes, [("key_alpha", True, False)])
+
+    def test_external(self):
+        self.pref.subscribe(None, self._callback)
+        self.assertFalse(self.pref.checkForChanges())
+
+        PreferencesFile(PREF_TARGET_A)["key_alpha"] = False
+        self.assertTrue(self.pref.checkForChanges())
+        self.assertEqual(self.changes, [("key_alpha", True, False)])
+        self.assertFalse(self.pref.checkForChanges())
+
+
+class PreferencesSchemaTest(unittest.TestCase):
+    def test_shared(self):
+        pref_1 = PreferencesFile(PREF1)
+        pref_2 = PreferencesFile(PREF1)
+        schema = pref_1.preferences.schema
+        self.assertIs(schema, pref_2.preferences.schema)
+        self.assertEqual(schema.names, ("key_alpha", "key_beta"))
+        self.assertIs(schema.index["key_beta"], key_beta)
+        self.assertEqual(schema.defaults, {"key_alpha": True, "key_beta": ""})
+        self.assertIn("key_alpha", schema)
+
+    def test_validate(self):
+        schema = PreferencesFile(PREF1).preferences.schema
+        self.assertEqual(schema.validate({"key_alpha": True, "key_beta": None}), [])
+        errors = schema.validate(
+            {"key_alpha": 1, "__version__": 2}, ignore=("__version__",)
+        )
+        self.assertEqual([key_name for key_name, _ in errors], [None, "key_alpha"])
+
+
+class BasePreferencesTest(unittest.TestCase):
+    def test_lazy_keys(self):
+        preferences = PreferencesFile(PREF1).preferences
+        self.assertNotIn("key_alpha", preferences.__dict__)
+        self.assertEqual(preferences.keys(), ["key_alpha", "key_beta"])
+        self.assertNotIn("key_alpha", preferences.__dict__)
+
+        pref_key = preferences.key_alpha
+        self.assertIsInstance(pref_key, key_alpha)
+        self.assertIs(preferences.get("key_alpha"), pref_key)
+        self.assertTrue(pref_key.value)
+        self.assertIs(Preferences.key_alpha, key_alpha)
+
+    def test_released(self):
+        preferences = PreferencesFile(PREF1).preferences
+        preferences.values()
+        reference = weakref.ref(preferences)
+        del preferences
+        gc.collect()
+        self.assertIsNone(reference())
+
+    def test_legacy(self):
+        pref = LegacyPreferencesFile(PREF1)
+        self.assertEqual(pref.preferences.keys(), ["key_alpha", "key_beta"])
+        self.assertEqual(pref.validate(), [])
+        self.assertIsInstance(pref.preferences.get("key_beta"), key_beta)
+
+
+class LayeredPreferencesTest(unittest.TestCase):
+    def setUp(self):
+        self.site_path = DATA_DIR / "site.json"
+        self.user_path = DATA_DIR / "user.json"
+        self.site_path.write_text(json.dumps({"key_beta": "site.py"}))
+
+    def tearDown(self):
+        self.site_path.unlink(missing_ok=True)
+        self.user_path.unlink(missing_ok=True)
+        os.environ.pop("PYTNCORETEST_KEY_ALPHA", None)
+
+    def _getLayered(self):
+        return layering.LayeredPreferences(
+            Preferences,
+            [dicting.DiskDict(self.site_path), dicting.DiskDict(self.user_path)],
+            env_prefix="PYTNCORETEST_",
+        )
+
+    def test_resolve(self):
+        layered = self._getLayered()
+        self.assertEqual(layered["key_alpha"], True)
+        self.assertEqual(layered["key_beta"], "site.py")
+
+        layered.set("key_beta", "user.py")
+        self.assertEqual(layered["key_beta"], "user.py")
+        self.assertEqual(dicting.DiskDict(self.user_path)["key_beta"], "user.py")
+        self.assertEqual(dicting.DiskDict(self.site_path)["key_beta"], "site.py")
+
+        os.environ["PYTNCORETEST_KEY_ALPHA"] = "false"
+        self.assertEqual(layered["key_alpha"], True)
+        self.assertEqual(layered.refresh(), [-1])
+        self.assertEqual(layered["key_alpha"], False)
+
+    def test_no_layers(self):
+        with self.assertRaises(ValueError):
+            layering.LayeredPreferences(Preferences, [])
+
+    def test_refresh(self):
+        layered = self._getLayered()
+        self.assertEqual(layered["key_beta"], "site.py")
+        self.assertEqual(layered.refresh(), [])
+        self.user_path.write_text(json.dumps({"key_beta": "external.py"}))
+        self.assertEqual(layered["key_beta"], "site.py")
+        self.assertEqual(layered.refresh(), [1])
+        self.assertEqual(layered["key_beta"], "external.py")
+
+
+class BatchingTest(unittest.TestCase):
+    def setUp(self):
+        BATCH_DIR.mkdir(exist_ok=True)
+        for index in range(10):
+            (BATCH_DIR / "pref{}.json".format(index)).write_text("{}")
+        (BATCH_DIR / "invalid.json").write_text(json.dumps({"key_alpha": 1}))
+
+    def tearDown(self):
+        for path in BATCH_DIR.iterdir():
+            path.unlink()
+        BATCH_DIR.rmdir()
+
+    def test_process(self):
+        paths = list(batching.collectPreferencesPaths(str(BATCH_DIR)))
+        self.assertEqual(len(paths), 11)
+
+        results = list(
+            batching.processPreferencesFiles(
+                PreferencesFile, paths, operations=("validate",), max_workers=2
+            )
+        )
+        self.assertEqual(len(results), 11)
+        self.assertEqual(len([result for result in results if result.ok]), 0)
+
+        results = batching.processPreferencesFiles(
+            PreferencesFile, paths, max_workers=4
+        )
+        failed = [result for result in results if not result.ok]
+        self.assertEqual(
+            [Path(result.path).name for result in failed], ["invalid.json"]
+        )
+        self.assertEqual(len(failed[0].errors), 1)
+
+    def test_main(self):
+        pattern = str(BATCH_DIR / "pref*.json")
+        class_path = "{}:PreferencesFile".format(__name__)
+        self.assertEqual(batching.main([class_path, pattern, "--quiet"]), 1)
+        self.assertEqual(
+            batching.main([class_path, pattern, "--upgrade", "--quiet"]), 0
+        )
+
 
 class BaseKeyCategoriesTest(unittest.TestCase):
     class KeyCategoriesA(preferencing.BaseKeyCategories):
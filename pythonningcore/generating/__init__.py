@@ -1,4 +1,9 @@
 from . import identifying
+from . import pooling
 
 from .identifying import IdentifierTypes
 from .identifying import generateIdentifier
+from .identifying import generateIdentifiers
+from .identifying import iterIdentifiers
+from .identifying import decodeUlid
+from .identifying import encodeUlid
@@ -3,15 +3,57 @@
 """
 from __future__ import annotations
 import base64
+import itertools
 import os
+import threading
+import time
 from pythonningcore import py23
 
+from . import pooling
+
 if py23.helpers.isModuleAvailable("typing"):
-    from typing import Callable
+    from typing import Callable, Iterator
 
 __all__ = (
     "IdentifierTypes",
+    "decodeUlid",
+    "encodeUlid",
     "generateIdentifier",
+    "generateIdentifiers",
+    "iterIdentifiers",
+    "ULID_LENGTH",
+)
+
+BULK_BUFFER_SIZE = 1024 * 1024
+"""
+Maximum number of random bytes drawn at once when generating identifiers in bulk.
+"""
+
+ULID_LENGTH = 26
+"""
+Number of characters of a ULID: 48 bits of milliseconds then 80 random bits.
+"""
+
+_ULID_RANDOM_BITS = 80
+_ULID_MAX_RANDOM = (1 << _ULID_RANDOM_BITS) - 1
+_ULID_BYTES = 20
+"""
+A ULID is 130 bits (26 characters of 5 bits), decoded as 160 bits so base32 needs
+no padding, with 6 leading characters (always zero) added.
+"""
+_CROCKFORD_ALPHABET = b"0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+_CROCKFORD_PAIRS = [
+    chr(high) + chr(low) for high in _CROCKFORD_ALPHABET for low in _CROCKFORD_ALPHABET
+]
+"""
+The 2 characters of each 10 bits value, ULIDs being encoded 10 bits at a time.
+"""
+_ULID_SHIFTS = tuple(range(120, -1, -10))
+_RFC_ALPHABET = b"ABCDEFGHIJKLMNOPQRSTUVWXYZ234567"
+_ULID_CHARACTERS = _CROCKFORD_ALPHABET + _CROCKFORD_ALPHABET.lower() + b"ILOilo"
+_FROM_CROCKFORD = bytes.maketrans(
+    _ULID_CHARACTERS,
+    _RFC_ALPHABET + _RFC_ALPHABET.lower() + b"BBABBA",
 )
 
 
@@ -76,6 +118,16 @@ class IdentifierTypes(py23.Enum):
     ex: ka60u1Ku4-iK, YvfL_ndeSfXe, M_rr
     """
 
+    ulid = 3
+    """
+    Will generate a 26 characters ULID, sorting in creation order: a millisecond
+    timestamp followed by random bits, made of upper letters and numbers
+    (Crockford's base32). Identifiers created in the same millisecond by this
+    process are still increasing. Use it as database keys so inserts are sequential.
+
+    ex: 01JAH4X3M5ZQ8YV6T9B0N2R7KD, 01JAH4X3M5ZQ8YV6T9B0N2R7KE
+    """
+
 
 @processSizeMultipleOf(6, multiple_of=3)
 def generateRandomId(size=None):
@@ -83,14 +135,14 @@ def generateRandomId(size=None):
     """
     SRC: https://stackoverflow.com/a/6763520/13806195
     """
-    key = base64.b64encode(os.urandom(size))
+    key = base64.b64encode(pooling.getRandomBytes(size))
     return byteToStr(key)
 
 
 @processSizeMultipleOf(6, multiple_of=3)
 def generateUrlSafeId(size=None):
     # type: (int | None) -> str
-    key = base64.urlsafe_b64encode(os.urandom(size))
+    key = base64.urlsafe_b64encode(pooling.getRandomBytes(size))
     return byteToStr(key)
 
 
@@ -100,10 +152,119 @@ def generateCapsId(size=None):
     """
     SRC: https://stackoverflow.com/a/6763520/13806195
     """
-    key = base64.b32encode(os.urandom(size))
+    key = base64.b32encode(pooling.getRandomBytes(size))
     return byteToStr(key)
 
 
+class _UlidClock:
+    """
+    Give the timestamp and randomness of the next ULIDs, so they are increasing.
+
+    In the same millisecond (or if the clock goes back) the randomness of the
+    previous ULID is incremented instead of drawn again. The state is reset in the
+    child of a fork, as a copy of it would give the same identifiers as the parent.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._last_ms = -1
+        self._last_random = 0
+
+    def _reset(self):
+        self.__init__()
+
+    def reserve(self, count=1):
+        # type: (int) -> tuple[int, int]
+        """
+        Returns:
+            timestamp in milliseconds and randomness of the first of ``count``
+            ULIDs, the next ones having the following randomness values.
+        """
+        now = time.time_ns() // 1000000
+        with self._lock:
+            if now > self._last_ms:
+                self._last_ms = now
+                randomness = int.from_bytes(pooling.getRandomBytes(10), "big")
+            else:
+                randomness = self._last_random + 1
+
+            if randomness + count - 1 > _ULID_MAX_RANDOM:
+                # overflow: borrow the next millisecond, leaving room to increment
+                self._last_ms += 1
+                randomness = int.from_bytes(pooling.getRandomBytes(10), "big") >> 1
+
+            self._last_random = randomness + count - 1
+            return self._last_ms, randomness
+
+
+_ulid_clock = _UlidClock()
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_ulid_clock._reset)
+
+
+def _encodeUlidValue(value):
+    # type: (int) -> str
+    pairs = _CROCKFORD_PAIRS
+    return "".join([pairs[value >> shift & 1023] for shift in _ULID_SHIFTS])
+
+
+def encodeUlid(timestamp_ms, randomness):
+    # type: (int, int) -> str
+    """
+    Args:
+        timestamp_ms: milliseconds since the epoch, fitting in 48 bits.
+        randomness: random part, fitting in 80 bits.
+
+    Returns:
+        ULID in Crockford's base32.
+    """
+    if not 0 <= timestamp_ms < 1 << 48:
+        raise ValueError("ULID timestamp <{}> doesn't fit 48 bits".format(timestamp_ms))
+    if not 0 <= randomness <= _ULID_MAX_RANDOM:
+        raise ValueError("ULID randomness <{}> doesn't fit 80 bits".format(randomness))
+    return _encodeUlidValue(timestamp_ms << _ULID_RANDOM_BITS | randomness)
+
+
+def decodeUlid(identifier):
+    # type: (str) -> tuple[int, int]
+    """
+    Case-insensitive, with I and L read as 1 and O as 0.
+
+    Args:
+        identifier: ULID in Crockford's base32.
+
+    Returns:
+        timestamp in milliseconds since the epoch and randomness of the ULID.
+
+    Raises:
+        ValueError: if identifier is not a valid ULID.
+    """
+    if len(identifier) != ULID_LENGTH:
+        raise ValueError(
+            "Invalid ULID <{}>: expected {} characters".format(identifier, ULID_LENGTH)
+        )
+    try:
+        data = identifier.encode("ascii")
+        if data.translate(None, _ULID_CHARACTERS):
+            raise ValueError(identifier)
+        padding = _RFC_ALPHABET[:1] * (_ULID_BYTES * 8 // 5 - ULID_LENGTH)
+        raw = base64.b32decode(padding + data.translate(_FROM_CROCKFORD), casefold=True)
+    except (UnicodeEncodeError, ValueError):
+        raise ValueError("Invalid ULID <{}>: unexpected characters".format(identifier))
+
+    value = int.from_bytes(raw, "big")
+    if value >> 128:
+        raise ValueError("Invalid ULID <{}>: overflows 128 bits".format(identifier))
+    return value >> _ULID_RANDOM_BITS, value & _ULID_MAX_RANDOM
+
+
+def generateUlid(size=None):
+    # type: (int | None) -> str
+    assert size is None, "[generateUlid] ULIDs have a fixed size, got <{}>".format(size)
+    timestamp_ms, randomness = _ulid_clock.reserve()
+    return encodeUlid(timestamp_ms, randomness)
+
+
 def generateIdentifier(id_type, size=None):
     # type: (IdentifierTypes, int) -> str
 
@@ -113,12 +274,136 @@ def generateIdentifier(id_type, size=None):
         identifier = generateRandomId(size)
     elif id_type == IdentifierTypes.urlsafe:
         identifier = generateUrlSafeId(size)
+    elif id_type == IdentifierTypes.ulid:
+        identifier = generateUlid(size)
     else:
         raise ValueError("Unsupported IdentifierType {}".format(id_type))
 
     return identifier
 
 
+_BULK_ENCODINGS = {
+    # id_type: (encoder, default size, bytes per encoded block, characters per block)
+    IdentifierTypes.caps: (base64.b32encode, 5, 5, 8),
+    IdentifierTypes.random: (base64.b64encode, 6, 3, 4),
+    IdentifierTypes.urlsafe: (base64.urlsafe_b64encode, 6, 3, 4),
+}
+
+
+def iterIdentifiers(id_type, count=None, size=None, buffer_size=BULK_BUFFER_SIZE):
+    # type: (IdentifierTypes, int | None, int | None, int) -> Iterator[str]
+    """
+    Lazily generate identifiers, the same as ``generateIdentifier`` would.
+
+    Random bytes are drawn by large buffers (see ``pooling``), encoded at once and
+    sliced into identifiers. As the size is a multiple of the encoding block size,
+    there is no padding and each slice is exactly the encoding of its own bytes.
+
+    ULIDs are reserved by batches sharing the same timestamp with consecutive
+    randomness, so they are still increasing. A batch is only used during the
+    millisecond it was reserved in, so timestamps are never stale.
+
+    Args:
+        id_type: type of identifiers to generate.
+        count: number of identifiers to generate, None for an infinite generator.
+        size: same as ``generateIdentifier``.
+        buffer_size: maximum number of random bytes drawn at once.
+
+    Returns:
+        generator of identifiers.
+    """
+    if id_type == IdentifierTypes.ulid:
+        assert (
+            size is None
+        ), "[iterIdentifiers] ULIDs have a fixed size, got <{}>".format(size)
+        return _iterUlids(count, buffer_size)
+
+    try:
+        encoder, default, block_bytes, block_chars = _BULK_ENCODINGS[id_type]
+    except KeyError:
+        raise ValueError("Unsupported IdentifierType {}".format(id_type))
+
+    if size is None:
+        size = default
+    assert (
+        size % block_bytes == 0
+    ), "[iterIdentifiers] Given size <{}> must be a multiple of {}" "".format(
+        size, block_bytes
+    )
+    if size == 0:
+        # nothing to encode, empty identifiers like generateIdentifier gives
+        return itertools.repeat("") if count is None else itertools.repeat("", count)
+
+    return _iterEncoded(encoder, size, block_bytes, block_chars, count, buffer_size)
+
+
+def _iterEncoded(encoder, size, block_bytes, block_chars, count, buffer_size):
+    # type: (Callable[[bytes], bytes], int, int, int, int | None, int) -> Iterator[str]
+    length = size // block_bytes * block_chars
+    per_buffer = max(1, buffer_size // size)
+    remaining = count
+
+    while remaining is None or remaining > 0:
+        batch = per_buffer if remaining is None else min(per_buffer, remaining)
+        encoded = encoder(pooling.getRandomBytes(batch * size)).decode("ascii")
+        for start in range(0, batch * length, length):
+            yield encoded[start : start + length]
+        if remaining is not None:
+            remaining -= batch
+
+
+def _iterUlids(count, buffer_size):
+    # type: (int | None, int) -> Iterator[str]
+    """
+    ULIDs are reserved by batches, but a batch is only used during the millisecond
+    it was reserved in, the rest of it being dropped. So ULIDs consumed slowly
+    still have the time they were consumed at.
+
+    Consecutive ULIDs only differ by their last characters, so only the last 4
+    (20 bits) are encoded for each one.
+    """
+    pairs = _CROCKFORD_PAIRS
+    per_buffer = max(1, buffer_size // _ULID_BYTES)
+    remaining = count
+
+    while remaining is None or remaining > 0:
+        size = per_buffer if remaining is None else min(per_buffer, remaining)
+        timestamp_ms, randomness = _ulid_clock.reserve(size)
+        first = timestamp_ms << _ULID_RANDOM_BITS | randomness
+
+        used = 0
+        head_value = None
+        for value in range(first, first + size):
+            # the first one is always given so the loop progresses
+            if used and time.time_ns() // 1000000 > timestamp_ms:
+                break
+            if value >> 20 != head_value:
+                head_value = value >> 20
+                head = _encodeUlidValue(value)[:-4]
+            yield head + pairs[value >> 10 & 1023] + pairs[value & 1023]
+            used += 1
+
+        if remaining is not None:
+            remaining -= used
+
+
+def generateIdentifiers(id_type, count, size=None):
+    # type: (IdentifierTypes, int, int | None) -> list[str]
+    """
+    Generate many identifiers at once, much faster than calling
+    ``generateIdentifier`` in a loop. See ``iterIdentifiers``.
+
+    Args:
+        id_type: type of identifiers to generate.
+        count: number of identifiers to generate.
+        size: same as ``generateIdentifier``.
+
+    Returns:
+        ``count`` identifiers.
+    """
+    return list(iterIdentifiers(id_type, count=count, size=size))
+
+
 if __name__ == "__main__":
 
     for i in range(25):
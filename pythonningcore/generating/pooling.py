@@ -0,0 +1,95 @@
+"""
+Buffered pool of random bytes, to avoid a system call for each small read of
+``os.urandom``.
+"""
+from __future__ import annotations
+
+import os
+import threading
+import weakref
+
+__all__ = (
+    "DEFAULT_BUFFER_SIZE",
+    "EntropyPool",
+    "getRandomBytes",
+)
+
+DEFAULT_BUFFER_SIZE = 64 * 1024
+"""
+Number of random bytes drawn from the system at once.
+"""
+
+_pools = weakref.WeakSet()  # type: weakref.WeakSet[EntropyPool]
+
+
+class EntropyPool:
+    """
+    Thread-safe pool of random bytes from ``os.urandom``, refilled by large chunks.
+
+    Each byte is only given once. The pool is emptied in the child of a
+    ``os.fork`` so parent and child never share random bytes.
+
+    Args:
+        buffer_size:
+            number of bytes drawn from the system at once. Reads bigger than this
+            directly call ``os.urandom``.
+    """
+
+    def __init__(self, buffer_size=DEFAULT_BUFFER_SIZE):
+        # type: (int) -> None
+        self.buffer_size = buffer_size
+        self._lock = threading.Lock()
+        self._buffer = b""
+        self._offset = 0
+        self._pid = os.getpid()
+        _pools.add(self)
+
+    def _reset(self):
+        """
+        Forget the buffered bytes, to call in a forked child.
+        """
+        # the lock might have been held by another thread of the parent
+        self._lock = threading.Lock()
+        self._buffer = b""
+        self._offset = 0
+        self._pid = os.getpid()
+
+    def read(self, size):
+        # type: (int) -> bytes
+        """
+        Returns:
+            ``size`` random bytes suitable for cryptographic use.
+        """
+        if size > self.buffer_size:
+            return os.urandom(size)
+
+        if not _HAS_REGISTER_AT_FORK and os.getpid() != self._pid:
+            self._reset()
+
+        with self._lock:
+            offset = self._offset
+            if offset + size > len(self._buffer):
+                self._buffer = os.urandom(self.buffer_size)
+                offset = 0
+            self._offset = offset + size
+            return self._buffer[offset : offset + size]
+
+
+def _resetPools():
+    for pool in list(_pools):
+        pool._reset()
+
+
+_HAS_REGISTER_AT_FORK = hasattr(os, "register_at_fork")
+if _HAS_REGISTER_AT_FORK:
+    os.register_at_fork(after_in_child=_resetPools)
+
+DEFAULT_POOL = EntropyPool()
+
+
+def getRandomBytes(size):
+    # type: (int) -> bytes
+    """
+    Drop-in replacement of ``os.urandom`` using the default pool.
+    """
+    return DEFAULT_POOL.read(size)
@@ -0,0 +1,217 @@
+import logging
+import re
+import time
+import unittest
+from unittest import mock
+
+from pythonningcore.generating import identifying
+from pythonningcore.generating import IdentifierTypes
+
+
+logger = logging.getLogger(__name__)
+
+ALPHABETS = {
+    IdentifierTypes.caps: re.compile(r"\A[A-Z2-7]+\Z"),
+    IdentifierTypes.random: re.compile(r"\A[A-Za-z0-9+/]+\Z"),
+    IdentifierTypes.urlsafe: re.compile(r"\A[A-Za-z0-9_-]+\Z"),
+}
+
+
+class BulkIdentifiersTest(unittest.TestCase):
+    def test_length_and_alphabet(self):
+        for id_type, size, length in (
+            (IdentifierTypes.caps, None, 8),
+            (IdentifierTypes.caps, 10, 16),
+            (IdentifierTypes.random, None, 8),
+            (IdentifierTypes.random, 9, 12),
+            (IdentifierTypes.urlsafe, None, 8),
+            (IdentifierTypes.urlsafe, 12, 16),
+        ):
+            identifiers = identifying.generateIdentifiers(id_type, 500, size=size)
+            self.assertEqual(len(identifiers), 500)
+            self.assertEqual(len(set(identifiers)), 500)
+            for identifier in identifiers:
+                self.assertEqual(len(identifier), length)
+                self.assertRegex(identifier, ALPHABETS[id_type])
+
+            # same format as generated one by one
+            single = identifying.generateIdentifier(id_type, size=size)
+            self.assertEqual(len(single), length)
+            self.assertRegex(single, ALPHABETS[id_type])
+
+    def test_buffers(self):
+        # many small buffers, the last one partially used
+        identifiers = identifying.generateIdentifiers(IdentifierTypes.urlsafe, 10)
+        iterated = list(
+            identifying.iterIdentifiers(
+                IdentifierTypes.urlsafe, count=10, buffer_size=18
+            )
+        )
+        self.assertEqual(len(iterated), 10)
+        self.assertEqual(len(set(iterated + identifiers)), 20)
+
+    def test_infinite(self):
+        iterator = identifying.iterIdentifiers(IdentifierTypes.caps, buffer_size=10)
+        identifiers = [next(iterator) for _ in range(7)]
+        iterator.close()
+        self.assertEqual(len(set(identifiers)), 7)
+
+    def test_count_zero(self):
+        self.assertEqual(identifying.generateIdentifiers(IdentifierTypes.caps, 0), [])
+        self.assertEqual(
+            list(identifying.iterIdentifiers(IdentifierTypes.random, count=0)), []
+        )
+
+    def test_size_zero(self):
+        for id_type in ALPHABETS:
+            self.assertEqual(identifying.generateIdentifier(id_type, size=0), "")
+            self.assertEqual(
+                identifying.generateIdentifiers(id_type, 3, size=0), ["", "", ""]
+            )
+        iterator = identifying.iterIdentifiers(IdentifierTypes.caps, size=0)
+        self.assertEqual([next(iterator) for _ in range(2)], ["", ""])
+
+    def test_wrong_size(self):
+        with self.assertRaises(AssertionError):
+            identifying.generateIdentifiers(IdentifierTypes.caps, 5, size=4)
+        with self.assertRaises(AssertionError):
+            identifying.iterIdentifiers(IdentifierTypes.urlsafe, size=7)
+
+    def test_unsupported_type(self):
+        with self.assertRaises(ValueError):
+            identifying.iterIdentifiers("caps", count=1)
+
+
+class UlidTest(unittest.TestCase):
+    def test_round_trip(self):
+        self.assertEqual(identifying.encodeUlid(0, 0), "0" * 26)
+        self.assertEqual(
+            identifying.encodeUlid((1 << 48) - 1, (1 << 80) - 1),
+            "7ZZZZZZZZZZZZZZZZZZZZZZZZZ",
+        )
+        for timestamp_ms, randomness in (
+            (0, 1),
+            (1, 0),
+            (1469918176385, 0x3DBCE9C1C2D3A8F65B1D),
+            ((1 << 48) - 1, 0),
+        ):
+            identifier = identifying.encodeUlid(timestamp_ms, randomness)
+            self.assertEqual(len(identifier), identifying.ULID_LENGTH)
+            self.assertEqual(
+                identifying.decodeUlid(identifier), (timestamp_ms, randomness)
+            )
+
+        with self.assertRaises(ValueError):
+            identifying.encodeUlid(1 << 48, 0)
+        with self.assertRaises(ValueError):
+            identifying.encodeUlid(0, 1 << 80)
+
+    def test_decode_lenient(self):
+        identifier = identifying.generateIdentifier(IdentifierTypes.ulid)
+        expected = identifying.decodeUlid(identifier)
+        self.assertEqual(identifying.decodeUlid(identifier.lower()), expected)
+
+        self.assertEqual(
+            identifying.decodeUlid("0" * 24 + "IL"),
+            identifying.decodeUlid("0" * 24 + "11"),
+        )
+        self.assertEqual(
+            identifying.decodeUlid("0" * 24 + "ol"),
+            identifying.decodeUlid("0" * 24 + "01"),
+        )
+
+    def test_decode_invalid(self):
+        for identifier in (
+            # overflows 128 bits
+            "8" + "0" * 25,
+            "Z" * 26,
+            # not in the alphabet
+            "0" * 25 + "U",
+            "0" * 25 + "=",
+            "0" * 25 + "\u00e9",
+            # wrong length
+            "0" * 25,
+            "0" * 27,
+        ):
+            with self.assertRaises(ValueError):
+                identifying.decodeUlid(identifier)
+
+    def test_same_millisecond(self):
+        clock = identifying._UlidClock()
+        with mock.patch.object(identifying, "_ulid_clock", clock), mock.patch.object(
+            identifying.time, "time_ns", return_value=1469918176385 * 1000000
+        ):
+            identifiers = [
+                identifying.generateIdentifier(IdentifierTypes.ulid) for _ in range(100)
+            ]
+            identifiers += identifying.generateIdentifiers(IdentifierTypes.ulid, 1000)
+            identifiers.append(identifying.generateIdentifier(IdentifierTypes.ulid))
+
+        self.assertEqual(identifiers, sorted(set(identifiers)))
+        decoded = [identifying.decodeUlid(identifier) for identifier in identifiers]
+        self.assertEqual({timestamp_ms for timestamp_ms, _ in decoded}, {1469918176385})
+        # the randomness is incremented
+        self.assertEqual(decoded[-1][1] - decoded[0][1], len(identifiers) - 1)
+
+    def test_overflow(self):
+        clock = identifying._UlidClock()
+        with mock.patch.object(
+            identifying.time, "time_ns", return_value=1469918176385 * 1000000
+        ):
+            clock.reserve()
+            clock._last_random = identifying._ULID_MAX_RANDOM - 2
+            reserved = [clock.reserve(), clock.reserve(), clock.reserve(10)]
+
+        self.assertEqual(
+            reserved[:2],
+            [
+                (1469918176385, identifying._ULID_MAX_RANDOM - 1),
+                (1469918176385, identifying._ULID_MAX_RANDOM),
+            ],
+        )
+        # the next millisecond is borrowed, with room to increment
+        timestamp_ms, randomness = reserved[2]
+        self.assertEqual(timestamp_ms, 1469918176386)
+        self.assertLessEqual(randomness + 9, identifying._ULID_MAX_RANDOM >> 1)
+
+    def test_bulk(self):
+        identifiers = identifying.generateIdentifiers(IdentifierTypes.ulid, 20000)
+        self.assertEqual(len(identifiers), 20000)
+        self.assertEqual(identifiers, sorted(set(identifiers)))
+        for identifier in identifiers[::97]:
+            self.assertEqual(
+                identifying.encodeUlid(*identifying.decodeUlid(identifier)), identifier
+            )
+
+        # small batches, with ULIDs generated one by one in between
+        iterator = identifying.iterIdentifiers(
+            IdentifierTypes.ulid, count=10, buffer_size=60
+        )
+        batched = []
+        single = []
+        for identifier in iterator:
+            batched.append(identifier)
+            single.append(identifying.generateIdentifier(IdentifierTypes.ulid))
+        # a batch is reserved at once, so only each sequence is increasing
+        self.assertEqual(batched, sorted(batched))
+        self.assertEqual(single, sorted(single))
+        self.assertEqual(len(set(batched + single)), 20)
+
+    def test_slow_consumer(self):
+        iterator = identifying.iterIdentifiers(IdentifierTypes.ulid)
+        for _ in range(3):
+            identifier = next(iterator)
+            now_ms = time.time_ns() // 1000000
+            self.assertLessEqual(now_ms - identifying.decodeUlid(identifier)[0], 1)
+            time.sleep(0.01)
+        iterator.close()
+
+    def test_wrong_size(self):
+        with self.assertRaises(AssertionError):
+            identifying.generateIdentifier(IdentifierTypes.ulid, size=26)
+        with self.assertRaises(AssertionError):
+            identifying.iterIdentifiers(IdentifierTypes.ulid, size=26)
+
+
+if __name__ == "__main__":
+    unittest.main()
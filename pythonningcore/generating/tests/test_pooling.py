@@ -0,0 +1,103 @@
+import itertools
+import logging
+import os
+import threading
+import unittest
+from unittest import mock
+
+from pythonningcore.generating import pooling
+
+
+logger = logging.getLogger(__name__)
+
+
+class _CountingSource:
+    """
+    Replace ``os.urandom`` with unique 4 bytes words, so bytes given twice are seen.
+    """
+
+    def __init__(self):
+        self.calls = []
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+    def __call__(self, size):
+        self.calls.append(size)
+        with self._lock:
+            words = [next(self._counter) for _ in range(size // 4)]
+        return b"".join(word.to_bytes(4, "big") for word in words)
+
+
+class EntropyPoolTest(unittest.TestCase):
+    def test_refill(self):
+        source = _CountingSource()
+        with mock.patch.object(pooling.os, "urandom", source):
+            pool = pooling.EntropyPool(buffer_size=64)
+            chunks = [pool.read(4) for _ in range(40)]
+
+        self.assertEqual(len(set(chunks)), 40)
+        # 16 reads per refill
+        self.assertEqual(source.calls, [64, 64, 64])
+
+    def test_threads(self):
+        source = _CountingSource()
+        chunks = []
+
+        def _read():
+            chunks.extend(pool.read(4) for _ in range(1000))
+
+        with mock.patch.object(pooling.os, "urandom", source):
+            pool = pooling.EntropyPool(buffer_size=256)
+            threads = [threading.Thread(target=_read) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        # each byte is only given once
+        self.assertEqual(len(chunks), 8000)
+        self.assertEqual(len(set(chunks)), 8000)
+
+    def test_large_read(self):
+        source = _CountingSource()
+        with mock.patch.object(pooling.os, "urandom", source):
+            pool = pooling.EntropyPool(buffer_size=64)
+            first = pool.read(4)
+            self.assertEqual(len(pool.read(128)), 128)
+            second = pool.read(4)
+
+        # the large read didn't use nor drop the buffer
+        self.assertEqual(source.calls, [64, 128])
+        self.assertEqual(
+            int.from_bytes(second, "big"), int.from_bytes(first, "big") + 1
+        )
+
+    def test_getRandomBytes(self):
+        self.assertEqual(len(pooling.getRandomBytes(10)), 10)
+        self.assertNotEqual(pooling.getRandomBytes(16), pooling.getRandomBytes(16))
+
+    @unittest.skipUnless(hasattr(os, "fork"), "requires os.fork")
+    def test_fork(self):
+        pool = pooling.EntropyPool()
+        pool.read(4)
+        read_fd, write_fd = os.pipe()
+
+        pid = os.fork()
+        if pid == 0:
+            try:
+                os.write(write_fd, pool.read(16))
+            finally:
+                os._exit(0)
+
+        os.close(write_fd)
+        os.waitpid(pid, 0)
+        with os.fdopen(read_fd, "rb") as file:
+            child_bytes = file.read()
+
+        # without the reset the child would get the bytes the parent gets next
+        self.assertEqual(len(child_bytes), 16)
+        self.assertNotEqual(child_bytes, pool.read(16))
+
+
+if __name__ == "__main__":
+    unittest.main()
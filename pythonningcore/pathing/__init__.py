@@ -2,20 +2,28 @@
 TODO: this should be moved to its own module later
 """
 
-import errno
 import logging
 import os
 import platform
-import shutil
-import stat
 import subprocess
 
 import pythonningcore.py23.helpers
 
 from . import c
+from . import asyncing
+from . import clearing
+from . import copying
+from . import hashing
+from . import linking
+from . import publishing
+from . import reporting
+from . import syncing
+from . import walking
 
 if pythonningcore.py23.helpers.isModuleAvailable("pathlib"):
     from pathlib import Path
+if pythonningcore.py23.helpers.isModuleAvailable("typing"):
+    from typing import Callable
 
 __all__ = (
     "clearDir",
@@ -26,63 +34,88 @@ __all__ = (
 logger = logging.getLogger("{}".format(c.abr))
 
 
-def clearDir(path, force=True):
-    # type: (str | Path, bool) -> None
+def clearDir(
+    path,  # type: str | Path
+    force=True,  # type: bool
+    max_workers=None,  # type: int | None
+    fast=False,  # type: bool
+    callback=None,  # type: Callable[[reporting.OperationResult], None] | None
+    interval=reporting.DEFAULT_INTERVAL,  # type: float
+    result=None,  # type: reporting.OperationResult | None
+):
+    # type: (...) -> reporting.OperationResult
     """
     Completely delete the given directory and its content.
 
+    Files are deleted in parallel, see ``clearing.removeTree``.
+
+    In ``fast`` mode, the directory is renamed into a trash directory next to it
+    and deleted by a background thread: the path is free as soon as this returns.
+    Leftovers of an interrupted background deletion can be removed with
+    ``clearing.sweepTrash`` on the parent directory.
+
     SRC: https://stackoverflow.com/q/39566812/13806195
 
     Args:
         force: if True delete also the read only file that would fail otherwise.
         path: string or any object that once converted to string represents
             a directory path. The path MIGHT not exist.
+        max_workers: number of threads deleting files. None for a CPU based default.
+        fast:
+            if True only move the directory away and delete it in the background.
+            Fallback to a regular deletion if the directory can't be renamed.
+        callback:
+            called with the OperationResult as the deletion progress, at most
+            every ``interval`` seconds, and once finished.
+        interval: minimum duration in seconds between two callback calls.
+        result:
+            OperationResult to update instead of creating one, callback and
+            interval being ignored.
+
+    Returns:
+        files and directories removed, errors and time spent in each phase.
     """
     path = str(path)
+    if result is None:
+        result = reporting.OperationResult(
+            "clearDir", callback=callback, interval=interval
+        )
     if not os.path.exists(path):
-        return
-
-    def handleRemoveReadonly(func, _path, exc):
-        """
-        SRC: https://stackoverflow.com/a/1214935/13806195
-        """
-        excvalue = exc[1]
-        if func in (os.rmdir, os.remove, os.unlink) and excvalue.errno == errno.EACCES:
-            os.chmod(_path, stat.S_IRWXU | stat.S_IRWXG | stat.S_IRWXO)  # 0777
-            func(_path)
+        return result.finish()
+
+    if fast:
+        try:
+            with result.timePhase("rename"):
+                trash_path = clearing.moveToTrash(path)
+        except OSError as excp:
+            logger.warning(
+                "[clearDir] can't move {} to trash, deleting it now: {}"
+                "".format(path, excp)
+            )
         else:
-            raise
+            clearing.removeInBackground(trash_path, force=force)
+            logger.info(
+                "[clearDir] Finished for {} (deleting in background)".format(path)
+            )
+            return result.finish()
 
-    if force:
-        shutil.rmtree(path, ignore_errors=False, onerror=handleRemoveReadonly)
-    else:
-        shutil.rmtree(path, ignore_errors=False)
+    try:
+        clearing.removeTree(path, force=force, max_workers=max_workers, result=result)
+    finally:
+        result.finish()
 
-    logger.info("[clearDir] Finished for {}".format(path))
-    return
+    logger.info("[clearDir] Finished. {}".format(result))
+    return result
 
 
-def copyDir(source, target, mirror=False, debug=False):
-    # type: (str|Path, str|Path, bool, bool) -> None
-    """
+def _usesRobocopy(mode):
+    # type: (copying.CopyModes) -> bool
+    return platform.system() == "Windows" and mode == copying.CopyModes.copy
 
-    Args:
-        source:
-        target:
-        mirror:
-            (destructive) if True overwrite ALL the target dir content with source's one.
-        debug:
-            if True diplay additional information about the result of the copy operation
-
-    Returns:
 
-    """
-    if platform.system() != "Windows":
-        raise NotImplementedError(
-            "Current OS {} used is not supported.".format(platform.system())
-        )
-
-    args = [
+def _getRobocopyArgs(source, target, mirror, debug):
+    # type: (str | Path, str | Path, bool, bool) -> list[str]
+    return [
         "robocopy",
         str(source),
         str(target),
@@ -96,55 +129,183 @@ def copyDir(source, target, mirror=False, debug=False):
         "/njh",  # no job header.
         "" if debug else "/njs",  # no job summary.
     ]
+
+
+def _checkRobocopyReturnCode(result, source, return_code):
+    # type: (reporting.OperationResult, str | Path, int) -> None
+    # robocopy exit codes from 8 are failures
+    if return_code >= 8:
+        result.addError(
+            str(source),
+            OSError("robocopy failed with exit code {}".format(return_code)),
+        )
+
+
+def copyDir(
+    source,  # type: str|Path
+    target,  # type: str|Path
+    mirror=False,  # type: bool
+    debug=False,  # type: bool
+    max_workers=None,  # type: int | None
+    incremental=False,  # type: bool
+    mode=copying.CopyModes.copy,  # type: copying.CopyModes
+    link_dest=None,  # type: str | Path | None
+    callback=None,  # type: Callable[[reporting.OperationResult], None] | None
+    interval=reporting.DEFAULT_INTERVAL,  # type: float
+    result=None,  # type: reporting.OperationResult | None
+):
+    # type: (...) -> reporting.OperationResult
+    """
+    Copy the content of the source directory to the target directory. Files
+    already in target with the same size and modification time are skipped.
+
+    On Windows robocopy is used, else (or when a specific copy ``mode`` is asked)
+    a pure python engine copying the files in parallel (see ``copying.copyTree``).
+
+    Args:
+        source:
+        target:
+        mirror:
+            (destructive) if True overwrite ALL the target dir content with source's one.
+        debug:
+            if True diplay additional information about the result of the copy operation
+            (the robocopy job summary, or the paths synced when incremental).
+        max_workers:
+            number of files copied in parallel by the python engine (not used with
+            robocopy). None for a CPU based default.
+        incremental:
+            if True, use a manifest cached in the target to only copy the files
+            modified since the last incremental copy (see ``syncing.syncDir``).
+            Supported on all platforms. With mirror, the first copy deletes all
+            the target content not in source, next ones the files removed from
+            source since (the target being trusted to not be modified in between).
+            Symbolic links are copied as links, as by the python engine.
+        mode:
+            how the files are copied, ``CopyModes.reflink`` to clone them on
+            copy-on-write filesystems or ``CopyModes.hardlink`` to hard link files
+            with identical content. MUST be ``CopyModes.copy`` when incremental.
+        link_dest:
+            directory whose identical files are hard linked instead of copied, for
+            the ``CopyModes.hardlink`` mode. Not supported when incremental.
+        callback:
+            called with the OperationResult as the copy progress, at most every
+            ``interval`` seconds, and once finished. Only called at the end with
+            robocopy.
+        interval: minimum duration in seconds between two callback calls.
+        result:
+            OperationResult to update instead of creating one, callback and
+            interval being ignored.
+
+    Returns:
+        files and bytes copied, errors and time spent in each phase. Only the
+        duration and errors are known with robocopy.
+
+    Raises:
+        ValueError: if incremental is used with a copy mode or link_dest.
+    """
+    if incremental and (mode != copying.CopyModes.copy or link_dest is not None):
+        raise ValueError(
+            "[copyDir] incremental copies only support CopyModes.copy without "
+            "link_dest, got mode <{}> and link_dest <{}>".format(mode, link_dest)
+        )
+    if result is None:
+        result = reporting.OperationResult(
+            "copyDir", callback=callback, interval=interval
+        )
+
+    if incremental:
+        logger.info("[copyDir] syncing <{}> to <{}> ...".format(source, target))
+        try:
+            report = syncing.syncDir(
+                source, target, mirror=mirror, max_workers=max_workers, result=result
+            )
+        finally:
+            result.finish()
+        logger.info("[copyDir] Finished. {}".format(report))
+        if debug:
+            logger.info(
+                "[copyDir] copied: {}, deleted: {}, touched: {}"
+                "".format(report.copied, report.deleted, report.touched)
+            )
+        return result
+
+    if not _usesRobocopy(mode):
+        logger.info("[copyDir] copying <{}> to <{}> ...".format(source, target))
+        try:
+            copying.copyTree(
+                source,
+                target,
+                mirror=mirror,
+                max_workers=max_workers,
+                mode=mode,
+                link_dest=link_dest,
+                result=result,
+            )
+        finally:
+            result.finish()
+        logger.info("[copyDir] Finished. {}".format(result))
+        return result
+
+    args = _getRobocopyArgs(source, target, mirror, debug)
     logger.info("[copyDir] copying <{}> to <{}> ...".format(source, target))
-    subprocess.call(args)
-    logger.info("[copyDir] Finished.")
-    return
+    with result.timePhase("copy"):
+        return_code = subprocess.call(args)
+    _checkRobocopyReturnCode(result, source, return_code)
+    result.finish()
+    logger.info("[copyDir] Finished. {}".format(result))
+    return result
 
 
-def createSymLink(source_path, target_path, hard=False):
-    # type: (str | Path, str | Path, bool) -> str
+def createSymLink(
+    source_path,  # type: str | Path
+    target_path,  # type: str | Path
+    hard=False,  # type: bool
+    callback=None,  # type: Callable[[reporting.OperationResult], None] | None
+):
+    # type: (...) -> str
     """
     Create and make the target_path a virtual copy (link) of source_path.
 
     A hard link makes it appear as though the file or folder actually exists at
     the location of the symbolic link while soft just redirects.
 
+    On Windows ``mklink`` is used, else ``os.symlink``/``os.link``, see
+    ``linking.createLink``. To create many links at once use ``linking.createLinks``.
+
     Args:
         source_path: file or directory path, MUST exist
         target_path: file or directory path, MUST not exist
         hard: True to create a hard link instead of a soft link.
+        callback: called with the OperationResult once finished.
 
     Returns:
         path to the created symlink (target_path)
 
     Raises:
         AssertionError: if the symlink was not created
-        NotImplementedError: if the current OS is not supported
     """
-    if platform.system() != "Windows":
-        raise NotImplementedError(
-            "Current OS {} used is not supported.".format(platform.system())
-        )
-
     source_path = str(source_path)
     target_path = str(target_path)
 
-    if os.path.isdir(source_path):
-        command_option = "/J" if hard else "/D"
-    else:
-        command_option = "/H" if hard else ""
-
     assert not os.path.exists(
         target_path
     ), "[createSymLink] target symlink already exists: {}".format(target_path)
 
-    command = ["mklink", command_option, target_path, source_path]
-    subprocess.call(command)
-
-    assert os.path.exists(target_path), "Symlink not created for {} --> {}".format(
-        source_path, target_path
-    )
+    result = reporting.OperationResult("createSymLink", callback=callback)
+    try:
+        with result.timePhase("link"):
+            linking.createLink(source_path, target_path, hard=hard)
+    except OSError as excp:
+        result.addError(target_path, excp)
+        raise AssertionError(
+            "Symlink not created for {} --> {}: {}".format(
+                source_path, target_path, excp
+            )
+        )
+    else:
+        result.add(files=1)
+    finally:
+        result.finish()
 
-    logger.info("[createSymLink] Finished. Created at {}".format(target_path))
+    logger.info("[createSymLink] Finished. {}".format(result))
     return target_path
@@ -0,0 +1,260 @@
+"""
+Asyncio interface on top of the pathing operations.
+
+The blocking filesystem work is pushed to a bounded executor, and robocopy is run
+with ``asyncio.create_subprocess_exec``, so the event loop is never blocked.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import pythonningcore.pathing
+import pythonningcore.py23.helpers
+
+from . import c
+from . import linking
+from . import reporting
+
+if pythonningcore.py23.helpers.isModuleAvailable("pathlib"):
+    from pathlib import Path
+if pythonningcore.py23.helpers.isModuleAvailable("typing"):
+    from typing import Any, AsyncIterator, Iterable
+    from concurrent.futures import Executor
+
+__all__ = (
+    "AsyncOperation",
+    "AsyncPathing",
+)
+
+logger = logging.getLogger("{}.asyncing".format(c.abr))
+
+
+class AsyncOperation:
+    """
+    A pathing operation running in the background.
+
+    Await it to get its final OperationResult, or iterate it to receive the
+    OperationResult each time it progresses, the last one being finished::
+
+        operation = paths.copyDir(source, target)
+        async for progress in operation:
+            print(progress)
+        result = await operation
+
+    Cancelling the task awaiting it (or calling ``cancel()``) stops the operation:
+    engine threads stop at their next update and robocopy is terminated.
+
+    Args:
+        result: OperationResult updated by the operation.
+        coroutine: coroutine running the operation.
+    """
+
+    def __init__(self, result, coroutine):
+        # type: (reporting.OperationResult, Any) -> None
+        self.result = result  # type: reporting.OperationResult
+        self._loop = asyncio.get_running_loop()
+        self._updates = asyncio.Queue()  # type: asyncio.Queue
+        result.callback = self._onProgress
+        self._task = asyncio.ensure_future(coroutine)
+        self._task.add_done_callback(self._onDone)
+
+    def __repr__(self):
+        return "<{}({})>".format(self.__class__.__name__, self.result.operation)
+
+    def __await__(self):
+        return self._task.__await__()
+
+    async def __aiter__(self):
+        # type: () -> AsyncIterator[reporting.OperationResult]
+        while True:
+            update = asyncio.ensure_future(self._updates.get())
+            await asyncio.wait(
+                {update, self._task}, return_when=asyncio.FIRST_COMPLETED
+            )
+            if not update.done():
+                update.cancel()
+                break
+            yield update.result()
+            if update.result().finished:
+                break
+        # raise the operation errors
+        await self._task
+
+    def _onProgress(self, result):
+        # type: (reporting.OperationResult) -> None
+        # called from the operation threads
+        self._loop.call_soon_threadsafe(self._updates.put_nowait, result)
+
+    def _onDone(self, task):
+        # type: (asyncio.Future) -> None
+        if task.cancelled():
+            # the executor thread can't be interrupted, only asked to stop
+            self.result.cancel()
+
+    def done(self):
+        # type: () -> bool
+        return self._task.done()
+
+    def cancel(self):
+        # type: () -> None
+        self.result.cancel()
+        self._task.cancel()
+
+
+class AsyncPathing:
+    """
+    Run pathing operations without blocking the event loop.
+
+    At most ``max_workers`` operations run at the same time (robocopy processes
+    included), the others waiting for their turn. Each operation still uses its
+    own pool of threads to process the files in parallel.
+
+    The methods returning an AsyncOperation MUST be called with a running loop.
+
+    Example::
+
+        async with AsyncPathing() as paths:
+            await asyncio.gather(
+                paths.copyDir("/src/a", "/dst/a"),
+                paths.clearDir("/tmp/old"),
+            )
+
+    Args:
+        executor:
+            executor to run the blocking calls on. If None, a private
+            ThreadPoolExecutor of ``max_workers`` threads is created and owned
+            by this instance.
+        max_workers: maximum number of operations running at the same time.
+        interval: minimum duration in seconds between two progress updates.
+    """
+
+    def __init__(
+        self,
+        executor=None,
+        max_workers=4,
+        interval=reporting.DEFAULT_INTERVAL,
+    ):
+        # type: (Executor | None, int, float) -> None
+        self.max_workers = max_workers
+        self.interval = interval
+
+        self._owns_executor = executor is None  # type: bool
+        self._executor = executor or ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix="{}.asyncing".format(c.abr),
+        )  # type: Executor
+        self._semaphore = None  # type: asyncio.Semaphore | None
+        return
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        self.close()
+
+    def _getSemaphore(self):
+        # type: () -> asyncio.Semaphore
+        # created lazily so it is bound to the running loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_workers)
+        return self._semaphore
+
+    async def _run(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        async with self._getSemaphore():
+            return await loop.run_in_executor(
+                self._executor, lambda: func(*args, **kwargs)
+            )
+
+    async def _runRobocopy(
+        self,
+        result,  # type: reporting.OperationResult
+        source,  # type: str | Path
+        target,  # type: str | Path
+        mirror,  # type: bool
+        debug,  # type: bool
+    ):
+        # type: (...) -> reporting.OperationResult
+        args = pythonningcore.pathing._getRobocopyArgs(source, target, mirror, debug)
+        async with self._getSemaphore():
+            logger.info("[copyDir] copying <{}> to <{}> ...".format(source, target))
+            with result.timePhase("copy"):
+                process = await asyncio.create_subprocess_exec(*args)
+                try:
+                    return_code = await process.wait()
+                except asyncio.CancelledError:
+                    process.terminate()
+                    await process.wait()
+                    raise
+        pythonningcore.pathing._checkRobocopyReturnCode(result, source, return_code)
+        return result.finish()
+
+    def clearDir(self, path, **kwargs):
+        # type: (str | Path, Any) -> AsyncOperation
+        """
+        Same as ``pathing.clearDir``.
+        """
+        result = reporting.OperationResult("clearDir", interval=self.interval)
+        return AsyncOperation(
+            result,
+            self._run(pythonningcore.pathing.clearDir, path, result=result, **kwargs),
+        )
+
+    def copyDir(
+        self, source, target, mirror=False, debug=False, incremental=False, **kwargs
+    ):
+        # type: (str | Path, str | Path, bool, bool, bool, Any) -> AsyncOperation
+        """
+        Same as ``pathing.copyDir``.
+        """
+        result = reporting.OperationResult("copyDir", interval=self.interval)
+        mode = kwargs.get("mode", pythonningcore.pathing.copying.CopyModes.copy)
+        if not incremental and pythonningcore.pathing._usesRobocopy(mode):
+            coroutine = self._runRobocopy(result, source, target, mirror, debug)
+        else:
+            coroutine = self._run(
+                pythonningcore.pathing.copyDir,
+                source,
+                target,
+                mirror=mirror,
+                debug=debug,
+                incremental=incremental,
+                result=result,
+                **kwargs,
+            )
+        return AsyncOperation(result, coroutine)
+
+    def createLinks(self, pairs, **kwargs):
+        # type: (Iterable[tuple[str | Path, str | Path]], Any) -> AsyncOperation
+        """
+        Same as ``linking.createLinks``, the final result holding the failures.
+        """
+        result = reporting.OperationResult("createLinks", interval=self.interval)
+
+        def _createLinks():
+            try:
+                linking.createLinks(pairs, result=result, **kwargs)
+            finally:
+                result.finish()
+            return result
+
+        return AsyncOperation(result, self._run(_createLinks))
+
+    async def createSymLink(self, source_path, target_path, hard=False):
+        # type: (str | Path, str | Path, bool) -> str
+        """
+        Same as ``pathing.createSymLink``.
+        """
+        return await self._run(
+            pythonningcore.pathing.createSymLink, source_path, target_path, hard=hard
+        )
+
+    def close(self):
+        """
+        Release the private executor, if any.
+        """
+        if self._owns_executor:
+            self._executor.shutdown(wait=False)
+        return
@@ -0,0 +1,361 @@
+"""
+Parallel engine to delete directory trees with a lot of files.
+
+Used by ``pathing.clearDir``.
+"""
+from __future__ import annotations
+
+import concurrent.futures
+import errno
+import logging
+import os
+import stat
+import subprocess
+import sys
+import threading
+import time
+import uuid
+
+import pythonningcore.py23.helpers
+
+from . import c
+from . import copying
+from . import reporting
+
+if pythonningcore.py23.helpers.isModuleAvailable("pathlib"):
+    from pathlib import Path
+if pythonningcore.py23.helpers.isModuleAvailable("typing"):
+    from typing import Callable
+
+__all__ = (
+    "handleRemoveReadonly",
+    "moveToTrash",
+    "removeInBackground",
+    "removeTree",
+    "sweepTrash",
+    "TRASH_DIR_NAME",
+)
+
+logger = logging.getLogger("{}.clearing".format(c.abr))
+
+BATCH_SIZE = 256
+"""
+Number of files unlinked by a single thread pool task.
+"""
+
+TRASH_DIR_NAME = ".{}-trash".format(c.abr)
+"""
+Name of the directory, created next to the directories cleared in "fast" mode,
+where they are moved before being deleted in the background. It is never removed,
+so it can't disappear between its creation and a move into it.
+"""
+
+_REMOVE_ATTEMPTS = 3
+"""
+Number of times a trashed directory is walked again when entries disappear while
+it is deleted, by another process sweeping the same trash.
+"""
+
+_workers = {}  # type: dict[str, threading.Thread | subprocess.Popen]
+_workers_lock = threading.Lock()
+
+
+def handleRemoveReadonly(func, _path, exc):
+    """
+    To use as ``shutil.rmtree`` onerror callback, must be called while handling
+    the exception.
+
+    SRC: https://stackoverflow.com/a/1214935/13806195
+    """
+    excvalue = exc[1]
+    if func in (os.rmdir, os.remove, os.unlink) and excvalue.errno == errno.EACCES:
+        os.chmod(_path, stat.S_IRWXU | stat.S_IRWXG | stat.S_IRWXO)  # 0777
+        func(_path)
+    else:
+        raise
+
+
+def _remove(func, path, force):
+    # type: (Callable[[str], None], str, bool) -> None
+    try:
+        func(path)
+    except OSError:
+        if not force:
+            raise
+        handleRemoveReadonly(func, path, sys.exc_info())
+
+
+def _unlinkBatch(paths, force, result):
+    # type: (list[str], bool, reporting.OperationResult) -> int
+    start = time.monotonic()
+    try:
+        for path in paths:
+            _remove(os.unlink, path, force)
+    except Exception as excp:
+        result.addError(path, excp)
+        raise
+    finally:
+        result.addPhaseTime("delete", time.monotonic() - start)
+    result.add(files=len(paths))
+    return len(paths)
+
+
+def removeTree(path, force=True, max_workers=None, result=None):
+    # type: (str | Path, bool, int | None, reporting.OperationResult | None) -> int
+    """
+    Delete the given directory and all its content.
+
+    The tree is walked with ``os.scandir``, files are unlinked in batches by a pool
+    of threads, then the directories are removed bottom-up. Symbolic links are
+    removed, never followed.
+
+    Args:
+        path: existing directory path.
+        force: if True delete also the read only file that would fail otherwise.
+        max_workers: number of threads unlinking files. None for a CPU based default.
+        result:
+            updated with the files and directories removed and the time spent in
+            the "scan" and "delete" phases, its callback reporting the progress.
+
+    Returns:
+        number of files removed.
+    """
+    path = str(path)
+    max_workers = max_workers or copying.getDefaultMaxWorkers()
+    max_pending = max_workers * 2
+    if result is None:
+        result = reporting.OperationResult("removeTree")
+
+    removed = 0
+    pending = set()
+    directories = []  # type: list[str]
+    waited = 0.0
+
+    def _drain(return_when):
+        nonlocal pending, removed, waited
+        start = time.monotonic()
+        done, pending = concurrent.futures.wait(pending, return_when=return_when)
+        waited += time.monotonic() - start
+        for future in done:
+            removed += future.result()
+
+    scan_start = time.monotonic()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        try:
+            to_scan = [path]
+            batch = []
+            while to_scan:
+                directory = to_scan.pop()
+                directories.append(directory)
+                with os.scandir(directory) as iterator:
+                    for entry in iterator:
+                        if entry.is_dir(follow_symlinks=False):
+                            to_scan.append(entry.path)
+                            continue
+                        batch.append(entry.path)
+                        if len(batch) < BATCH_SIZE:
+                            continue
+                        pending.add(executor.submit(_unlinkBatch, batch, force, result))
+                        batch = []
+                        if len(pending) >= max_pending:
+                            _drain(concurrent.futures.FIRST_COMPLETED)
+
+            if batch:
+                pending.add(executor.submit(_unlinkBatch, batch, force, result))
+            result.addPhaseTime("scan", time.monotonic() - scan_start - waited)
+            _drain(concurrent.futures.ALL_COMPLETED)
+
+        except BaseException:
+            for future in pending:
+                future.cancel()
+            raise
+
+    # directories were listed parent first
+    with result.timePhase("delete"):
+        for directory in reversed(directories):
+            try:
+                _remove(os.rmdir, directory, force)
+            except Exception as excp:
+                result.addError(directory, excp)
+                raise
+    result.add(directories=len(directories))
+
+    return removed
+
+
+def moveToTrash(path):
+    # type: (str | Path) -> str
+    """
+    Atomically move the given directory into the trash directory of its parent, which
+    is on the same filesystem so this is a single rename whatever the size of the
+    directory.
+
+    Args:
+        path: existing directory path.
+
+    Returns:
+        new path of the directory, in the trash.
+
+    Raises:
+        OSError: if the rename failed, for example if path is a mount point.
+    """
+    path = os.path.abspath(str(path))
+    trash_dir = os.path.join(os.path.dirname(path), TRASH_DIR_NAME)
+    os.makedirs(trash_dir, exist_ok=True)
+    trash_path = os.path.join(
+        trash_dir, "{}-{}".format(os.path.basename(path), uuid.uuid4().hex)
+    )
+    os.rename(path, trash_path)
+    return trash_path
+
+
+def _removeTrashed(path, force):
+    # type: (str, bool) -> None
+    for attempt in range(_REMOVE_ATTEMPTS):
+        try:
+            removeTree(path, force=force)
+        except FileNotFoundError:
+            # deleted meanwhile by another worker, which might have given up
+            if not os.path.lexists(path):
+                break
+            if attempt + 1 == _REMOVE_ATTEMPTS:
+                logger.exception("[_removeTrashed] failed to delete {}".format(path))
+                return
+        except Exception:
+            logger.exception("[_removeTrashed] failed to delete {}".format(path))
+            return
+        else:
+            break
+    logger.debug("[_removeTrashed] Finished for {}".format(path))
+
+
+def _isAlive(worker):
+    # type: (threading.Thread | subprocess.Popen) -> bool
+    if isinstance(worker, threading.Thread):
+        return worker.is_alive()
+    return worker.poll() is None
+
+
+def _registerWorker(path, worker):
+    # type: (str, threading.Thread | subprocess.Popen) -> None
+    with _workers_lock:
+        for other_path, other_worker in list(_workers.items()):
+            if not _isAlive(other_worker):
+                del _workers[other_path]
+        _workers[os.path.abspath(path)] = worker
+
+
+def _isBeingRemoved(path):
+    # type: (str) -> bool
+    """
+    Returns:
+        True if a background deletion started by this process is still deleting
+        the given path.
+    """
+    with _workers_lock:
+        worker = _workers.get(os.path.abspath(path))
+        return worker is not None and _isAlive(worker)
+
+
+def removeInBackground(path, force=True, detached=False):
+    # type: (str | Path, bool, bool) -> threading.Thread | subprocess.Popen
+    """
+    Delete the given directory without waiting for it.
+
+    Args:
+        path: existing directory path, usually already moved to the trash.
+        force: if True delete also the read only file that would fail otherwise.
+        detached:
+            if True delete in a new python process that keeps running if the
+            current one exits, else in a daemon thread which is killed with the
+            current process (leftovers being removed by the next ``sweepTrash``).
+
+    Returns:
+        the daemon thread or the process deleting the directory.
+    """
+    path = str(path)
+
+    if not detached:
+        thread = threading.Thread(
+            target=_removeTrashed,
+            args=(path, force),
+            name="{}.removeInBackground".format(c.abr),
+            daemon=True,
+        )
+        thread.start()
+        _registerWorker(path, thread)
+        return thread
+
+    package_root = os.path.dirname(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    )
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        [package_root] + [env["PYTHONPATH"]]
+        if env.get("PYTHONPATH")
+        else [package_root]
+    )
+    code = (
+        "from pythonningcore.pathing import clearing; "
+        "clearing._removeTrashed({!r}, {!r})"
+    )
+    kwargs = {}
+    if os.name == "posix":
+        kwargs["start_new_session"] = True
+    else:
+        kwargs["creationflags"] = getattr(subprocess, "DETACHED_PROCESS", 0)
+    process = subprocess.Popen(
+        [sys.executable, "-c", code.format(path, force)],
+        env=env,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        **kwargs,
+    )
+    _registerWorker(path, process)
+    return process
+
+
+def sweepTrash(parent_dir, force=True, background=False):
+    # type: (str | Path, bool, bool) -> list[str]
+    """
+    Delete the leftovers in the trash directory of the given directory, for example
+    when the process deleting them was killed. To call at startup.
+
+    The directories still being deleted in the background by this process are
+    skipped. Those deleted by other processes are tolerated, each entry being
+    deleted by whichever worker gets to it first.
+
+    Args:
+        parent_dir: directory in which directories were cleared in "fast" mode.
+        force: if True delete also the read only file that would fail otherwise.
+        background: if True delete them in a background thread.
+
+    Returns:
+        paths of the leftovers deleted.
+    """
+    trash_dir = os.path.join(str(parent_dir), TRASH_DIR_NAME)
+    if not os.path.isdir(trash_dir):
+        return []
+
+    with os.scandir(trash_dir) as iterator:
+        leftovers = [
+            entry.path for entry in iterator if not _isBeingRemoved(entry.path)
+        ]
+
+    for leftover in leftovers:
+        if background:
+            removeInBackground(leftover, force=force)
+        elif os.path.isdir(leftover) and not os.path.islink(leftover):
+            _removeTrashed(leftover, force)
+        else:
+            try:
+                os.unlink(leftover)
+            except FileNotFoundError:
+                # deleted meanwhile by a background removal still running
+                pass
+
+    logger.info(
+        "[sweepTrash] Finished for {}: {} leftovers".format(trash_dir, len(leftovers))
+    )
+    return leftovers
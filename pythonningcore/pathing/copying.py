@@ -0,0 +1,481 @@
+"""
+Pure python engine to copy directory trees, files being copied in parallel.
+
+Used by ``pathing.copyDir`` on non-Windows platforms.
+"""
+from __future__ import annotations
+
+import concurrent.futures
+import errno
+import functools
+import logging
+import os
+import shutil
+import threading
+import time
+
+from pythonningcore import py23
+
+from . import c
+from . import hashing
+from . import reporting
+
+if py23.helpers.isModuleAvailable("fcntl"):
+    import fcntl
+else:
+    fcntl = None
+if py23.helpers.isModuleAvailable("pathlib"):
+    from pathlib import Path
+
+__all__ = (
+    "CopyModes",
+    "copyFile",
+    "copyTree",
+)
+
+logger = logging.getLogger("{}.copying".format(c.abr))
+
+CHUNK_SIZE = 8 * 1024 * 1024
+"""
+Maximum number of bytes copied by a single system call.
+"""
+
+_ZERO_COPY_ERRNOS = {
+    errno.EXDEV,
+    errno.ENOSYS,
+    errno.EINVAL,
+    errno.EOPNOTSUPP,
+    errno.ETXTBSY,
+    errno.EBADF,
+}
+"""
+Errors meaning a zero-copy system call is not supported for the given files.
+"""
+
+FICLONE = 0x40049409
+"""
+Linux ioctl request cloning a whole file (``_IOW(0x94, 9, int)``).
+"""
+
+_REFLINK_ERRNOS = _ZERO_COPY_ERRNOS | {errno.ENOTTY, errno.EPERM}
+"""
+Errors meaning the filesystem doesn't support cloning the given files.
+"""
+
+
+class CopyModes(py23.Enum):
+
+    copy = 0
+    """
+    Copy the file content, by the kernel when possible.
+    """
+
+    reflink = 1
+    """
+    Clone the file on copy-on-write filesystems (btrfs, xfs, ...): the data is
+    shared until modified. Fallback to ``copy`` when not supported.
+    """
+
+    hardlink = 2
+    """
+    Hard link the files with the same content, permissions and modification time
+    as a file already copied (or as the same file in the ``link_dest`` directory),
+    like ``rsync --link-dest``. Files linked share their metadata and modifying one
+    modify all of them.
+    """
+
+
+def getDefaultMaxWorkers():
+    # type: () -> int
+    return min(32, (os.cpu_count() or 1) + 4)
+
+
+def _checkCopied(copied, size):
+    # type: (int, int) -> bool
+    """
+    Returns:
+        False if nothing was copied, as some files (like in ``/proc``) can't be
+        copied by the kernel, but report no error.
+
+    Raises:
+        OSError: if the copy stopped in the middle, the source file being truncated.
+    """
+    if copied >= size:
+        return True
+    if copied == 0:
+        return False
+    raise OSError(errno.EIO, "Only {} bytes copied out of {}".format(copied, size))
+
+
+def _copyFileRange(source_fd, target_fd, size):
+    # type: (int, int, int) -> bool
+    """
+    Returns:
+        False if copy_file_range is not supported for those files.
+    """
+    copied = 0
+    while copied < size:
+        try:
+            sent = os.copy_file_range(source_fd, target_fd, CHUNK_SIZE)
+        except OSError as excp:
+            if copied == 0 and excp.errno in _ZERO_COPY_ERRNOS:
+                return False
+            raise
+        if sent == 0:
+            break
+        copied += sent
+    return _checkCopied(copied, size)
+
+
+def _sendFile(source_fd, target_fd, size):
+    # type: (int, int, int) -> bool
+    """
+    Returns:
+        False if sendfile is not supported for those files.
+    """
+    offset = 0
+    while offset < size:
+        try:
+            sent = os.sendfile(target_fd, source_fd, offset, CHUNK_SIZE)
+        except OSError as excp:
+            if offset == 0 and excp.errno in _ZERO_COPY_ERRNOS:
+                return False
+            raise
+        if sent == 0:
+            break
+        offset += sent
+    return _checkCopied(offset, size)
+
+
+def _reflink(source_fd, target_fd):
+    # type: (int, int) -> bool
+    """
+    Returns:
+        False if cloning is not supported for those files.
+    """
+    if fcntl is None:
+        return False
+    try:
+        fcntl.ioctl(target_fd, FICLONE, source_fd)
+    except OSError as excp:
+        if excp.errno in _REFLINK_ERRNOS:
+            return False
+        raise
+    return True
+
+
+def copyFile(source, target, mode=CopyModes.copy):
+    # type: (str | Path, str | Path, CopyModes) -> None
+    """
+    Copy the file content and its metadata (permissions, times).
+
+    The content is copied by the kernel when possible (``os.copy_file_range``
+    then ``os.sendfile``) and fallback to a buffered copy else.
+
+    An existing target file is replaced, even if read-only.
+
+    Args:
+        source: path to an existing file.
+        target: file path whose parent directory MUST exist.
+        mode:
+            ``CopyModes.reflink`` to clone the file when supported. The
+            ``hardlink`` mode only apply to ``copyTree`` and is a copy here.
+    """
+    source = str(source)
+    target = str(target)
+
+    if os.path.lexists(target):
+        os.unlink(target)
+
+    with open(source, "rb") as source_file, open(target, "wb") as target_file:
+        source_fd = source_file.fileno()
+        target_fd = target_file.fileno()
+        size = os.fstat(source_fd).st_size
+
+        done = False
+        if size and mode == CopyModes.reflink:
+            done = _reflink(source_fd, target_fd)
+        if size and not done and hasattr(os, "copy_file_range"):
+            done = _copyFileRange(source_fd, target_fd, size)
+        if size and not done and hasattr(os, "sendfile"):
+            done = _sendFile(source_fd, target_fd, size)
+        if size and not done:
+            shutil.copyfileobj(source_file, target_file, CHUNK_SIZE)
+
+    shutil.copystat(source, target)
+    return
+
+
+def _isUpToDate(source_stat, target_entry):
+    # type: (os.stat_result, os.DirEntry | None) -> bool
+    """
+    Same check as robocopy: same size and same modification time.
+    """
+    if target_entry is None or not target_entry.is_file(follow_symlinks=False):
+        return False
+    target_stat = target_entry.stat(follow_symlinks=False)
+    return (
+        target_stat.st_size == source_stat.st_size
+        and target_stat.st_mtime_ns == source_stat.st_mtime_ns
+    )
+
+
+def _removeEntry(entry):
+    # type: (os.DirEntry) -> None
+    if entry.is_dir(follow_symlinks=False):
+        shutil.rmtree(entry.path)
+    else:
+        os.unlink(entry.path)
+
+
+def _copySymlink(source, target, target_entry):
+    # type: (str, str, os.DirEntry | None) -> None
+    link = os.readlink(source)
+    if target_entry is not None:
+        if target_entry.is_symlink() and os.readlink(target) == link:
+            return
+        _removeEntry(target_entry)
+    os.symlink(link, target)
+
+
+def _getLinkKey(path):
+    # type: (str) -> tuple[int, int, int]
+    """
+    Returns:
+        the metadata files MUST share to be hard linked: linked files share their
+        inode, so their permissions and times too.
+    """
+    stat_result = os.stat(path)
+    return stat_result.st_size, stat_result.st_mode, stat_result.st_mtime_ns
+
+
+class _Deduplicator:
+    """
+    Copy files, hard linking those whose content and metadata were already copied.
+
+    Args:
+        link_dest:
+            directory whose files are also candidates to link to, when they have
+            the same relative path, content and metadata as the file to copy.
+        source: root directory of the files copied, to resolve their path in link_dest.
+    """
+
+    def __init__(self, source, link_dest=None):
+        # type: (str, str | None) -> None
+        self.source = source
+        self.link_dest = link_dest
+        self._lock = threading.Lock()
+        self._targets = {}  # type: dict[tuple[int, int, int, str], str]
+        self._pending = {}  # type: dict[tuple[int, int, int, str], threading.Event]
+
+    def _getLinkDestPath(self, source_path, key):
+        # type: (str, tuple[int, int, int, str]) -> str | None
+        if self.link_dest is None:
+            return None
+        path = os.path.join(self.link_dest, os.path.relpath(source_path, self.source))
+        try:
+            if not os.path.isfile(path) or _getLinkKey(path) != key[:-1]:
+                return None
+        except OSError:
+            return None
+        return path if hashing.hashFile(path) == key[-1] else None
+
+    @staticmethod
+    def _link(existing, target_path):
+        # type: (str, str) -> bool
+        if os.path.lexists(target_path):
+            os.unlink(target_path)
+        try:
+            os.link(existing, target_path)
+        except OSError as excp:
+            # other filesystem or too many links: copy instead
+            logger.debug("[_Deduplicator] can't link {}: {}".format(existing, excp))
+            return False
+        return True
+
+    def copy(self, source_path, target_path):
+        # type: (str, str) -> None
+        key = _getLinkKey(source_path) + (hashing.hashFile(source_path),)
+
+        # the first thread with a content copies it while the others wait for it
+        with self._lock:
+            existing = self._targets.get(key)
+            event = self._pending.get(key)
+            owner = existing is None and event is None
+            if owner:
+                self._pending[key] = threading.Event()
+
+        if event is not None:
+            event.wait()
+            with self._lock:
+                existing = self._targets.get(key)
+
+        if not owner:
+            if existing is None or not self._link(existing, target_path):
+                copyFile(source_path, target_path)
+            return
+
+        try:
+            existing = self._getLinkDestPath(source_path, key)
+            if existing is None or not self._link(existing, target_path):
+                copyFile(source_path, target_path)
+            with self._lock:
+                self._targets[key] = target_path
+        finally:
+            with self._lock:
+                self._pending.pop(key).set()
+
+
+def copyTree(
+    source,  # type: str | Path
+    target,  # type: str | Path
+    mirror=False,  # type: bool
+    max_workers=None,  # type: int | None
+    mode=CopyModes.copy,  # type: CopyModes
+    link_dest=None,  # type: str | Path | None
+    result=None,  # type: reporting.OperationResult | None
+):
+    # type: (...) -> int
+    """
+    Copy the content of the source directory to the target directory, including
+    empty directories. Directories metadata (permissions, times) are copied once
+    their content is.
+
+    Files already existing in target with the same size and modification time are
+    skipped. Symbolic links are copied as links.
+
+    Directories are walked with ``os.scandir`` while files are copied in parallel
+    by a pool of threads.
+
+    Args:
+        source: existing directory path.
+        target: directory path, MIGHT not exist.
+        mirror:
+            (destructive) if True also delete all the target content not in source.
+        max_workers: number of files copied in parallel. None for a CPU based default.
+        mode: how the file content is copied, see ``CopyModes``.
+        link_dest:
+            ``CopyModes.hardlink`` only: directory (like a previous copy of source)
+            whose files are hard linked when they have the same relative path,
+            content, permissions and modification time as the source file. MUST be
+            on the same filesystem as target.
+        result:
+            updated with the files copied and the time spent in the "scan",
+            "copy" and "delete" phases.
+
+    Returns:
+        number of files copied (or linked).
+    """
+    source = str(source)
+    target = str(target)
+    max_workers = max_workers or getDefaultMaxWorkers()
+    max_pending = max_workers * 4
+
+    if mode == CopyModes.hardlink:
+        deduplicator = _Deduplicator(
+            source, None if link_dest is None else str(link_dest)
+        )
+        copy_function = deduplicator.copy
+    elif mode == CopyModes.reflink:
+        copy_function = functools.partial(copyFile, mode=mode)
+    else:
+        copy_function = copyFile
+
+    if result is None:
+        result = reporting.OperationResult("copyTree")
+
+    copied = 0
+    pending = set()
+    waited = 0.0  # time not spent scanning by the main thread
+    copied_dirs = []
+
+    def _copy(source_path, target_path, size):
+        start = time.monotonic()
+        try:
+            copy_function(source_path, target_path)
+        except Exception as excp:
+            result.addError(source_path, excp)
+            raise
+        result.addPhaseTime("copy", time.monotonic() - start)
+        result.add(files=1, size=size)
+
+    def _remove(target_entry):
+        nonlocal waited
+        start = time.monotonic()
+        _removeEntry(target_entry)
+        duration = time.monotonic() - start
+        result.addPhaseTime("delete", duration)
+        waited += duration
+
+    def _drain(return_when):
+        nonlocal pending, copied, waited
+        start = time.monotonic()
+        done, pending = concurrent.futures.wait(pending, return_when=return_when)
+        waited += time.monotonic() - start
+        for future in done:
+            # raise the copy errors
+            future.result()
+            copied += 1
+
+    scan_start = time.monotonic()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        try:
+            directories = [(source, target)]
+            while directories:
+                source_dir, target_dir = directories.pop()
+                os.makedirs(target_dir, exist_ok=True)
+                copied_dirs.append((source_dir, target_dir))
+                result.add(directories=1)
+
+                with os.scandir(target_dir) as iterator:
+                    target_entries = {entry.name: entry for entry in iterator}
+
+                with os.scandir(source_dir) as iterator:
+                    for entry in iterator:
+                        target_path = os.path.join(target_dir, entry.name)
+                        target_entry = target_entries.pop(entry.name, None)
+
+                        if entry.is_symlink():
+                            _copySymlink(entry.path, target_path, target_entry)
+                            continue
+
+                        if entry.is_dir():
+                            if target_entry is not None and not target_entry.is_dir(
+                                follow_symlinks=False
+                            ):
+                                _remove(target_entry)
+                            directories.append((entry.path, target_path))
+                            continue
+
+                        source_stat = entry.stat()
+                        if _isUpToDate(source_stat, target_entry):
+                            continue
+                        if target_entry is not None and target_entry.is_dir(
+                            follow_symlinks=False
+                        ):
+                            _remove(target_entry)
+                        pending.add(
+                            executor.submit(
+                                _copy, entry.path, target_path, source_stat.st_size
+                            )
+                        )
+                        if len(pending) >= max_pending:
+                            _drain(concurrent.futures.FIRST_COMPLETED)
+
+                # remaining target entries doesn't exist in source
+                if mirror:
+                    for target_entry in target_entries.values():
+                        _remove(target_entry)
+
+            result.addPhaseTime("scan", time.monotonic() - scan_start - waited)
+            _drain(concurrent.futures.ALL_COMPLETED)
+
+        except BaseException:
+            for future in pending:
+                future.cancel()
+            raise
+
+    # last, as copying their content changes their times, and might need write access
+    for source_dir, target_dir in reversed(copied_dirs):
+        shutil.copystat(source_dir, target_dir)
+    return copied
@@ -0,0 +1,280 @@
+"""
+Fingerprint directory trees by hashing their files in parallel.
+
+The digest of each file is cached in an index, keyed by its inode, size and
+modification time, so next runs only hash the files that changed. Indexes are
+stored outside of the hashed trees, which are never modified (and might be
+read-only).
+"""
+from __future__ import annotations
+
+import concurrent.futures
+import hashlib
+import json
+import logging
+import os
+import time
+
+import pythonningcore.py23.helpers
+from pythonningcore.datastructuring import dicting
+
+from . import c
+from . import walking
+
+if pythonningcore.py23.helpers.isModuleAvailable("pathlib"):
+    from pathlib import Path
+
+__all__ = (
+    "buildManifest",
+    "DirectoryManifest",
+    "getDefaultIndexPath",
+    "getIndexDir",
+    "hashFile",
+    "INDEX_DIR_ENV",
+)
+
+logger = logging.getLogger("{}.hashing".format(c.abr))
+
+BUFFER_SIZE = 1024 * 1024
+"""
+Number of bytes read at once when hashing a file.
+"""
+
+INDEX_DIR_ENV = "PYTNCORE_HASHES_DIR"
+"""
+Name of the environment variable that can be used to override the directory
+storing the default indexes, see ``getIndexDir``.
+"""
+
+INDEX_VERSION = 1
+
+
+def hashFile(path, algorithm="sha256"):
+    # type: (str | Path, str) -> str
+    """
+    The file is read by large blocks into a single reused buffer.
+
+    Returns:
+        hexadecimal digest of the file content.
+    """
+    digest = hashlib.new(algorithm)
+    buffer = bytearray(BUFFER_SIZE)
+    view = memoryview(buffer)
+    with open(str(path), "rb", buffering=0) as file:
+        while True:
+            size = file.readinto(buffer)
+            if not size:
+                break
+            digest.update(view[:size])
+    return digest.hexdigest()
+
+
+class DirectoryManifest:
+    """
+    Digest of every file of a directory, paths being relative to it.
+    """
+
+    def __init__(self, root, algorithm):
+        # type: (str, str) -> None
+        self.root = root  # type: str
+        self.algorithm = algorithm  # type: str
+        self.files = {}  # type: dict[str, str]
+        self.hashed = 0  # type: int
+        """
+        Number of files whose content was hashed, the others being in the index.
+        """
+        self.duration = 0.0  # type: float
+
+    def __str__(self):
+        return "{} files, {} hashed in {:.2f}s".format(
+            len(self.files), self.hashed, self.duration
+        )
+
+    def __eq__(self, other):
+        if not isinstance(other, DirectoryManifest):
+            return NotImplemented
+        return self.algorithm == other.algorithm and self.files == other.files
+
+    @property
+    def fingerprint(self):
+        # type: () -> str
+        """
+        Single digest of the whole tree (paths and contents), to use as cache key.
+        """
+        digest = hashlib.new(self.algorithm)
+        for relative_path in sorted(self.files):
+            digest.update(relative_path.replace(os.sep, "/").encode("utf-8"))
+            digest.update(b"\0")
+            digest.update(self.files[relative_path].encode("ascii"))
+            digest.update(b"\n")
+        return digest.hexdigest()
+
+    def diff(self, other):
+        # type: (DirectoryManifest) -> tuple[list[str], list[str], list[str]]
+        """
+        Returns:
+            relative paths (added, removed, modified) in this manifest compared to
+            the other one.
+        """
+        added = sorted(set(self.files).difference(other.files))
+        removed = sorted(set(other.files).difference(self.files))
+        modified = sorted(
+            relative_path
+            for relative_path, digest in self.files.items()
+            if relative_path in other.files and other.files[relative_path] != digest
+        )
+        return added, removed, modified
+
+
+def getIndexDir():
+    # type: () -> str
+    """
+    Returns:
+        directory storing the default indexes: ``INDEX_DIR_ENV`` if set, else a
+        directory in the user cache (``XDG_CACHE_HOME`` or ``LOCALAPPDATA``).
+    """
+    index_dir = os.environ.get(INDEX_DIR_ENV)
+    if index_dir:
+        return index_dir
+
+    if os.name == "nt":
+        cache_dir = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+    else:
+        cache_dir = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+            os.path.expanduser("~"), ".cache"
+        )
+    return os.path.join(cache_dir, c.abr, "hashes")
+
+
+def getDefaultIndexPath(root, algorithm="sha256"):
+    # type: (str | Path, str) -> str
+    """
+    Returns:
+        path of the index used by ``buildManifest`` for the given directory when
+        none is specified, unique per directory and algorithm.
+    """
+    key = hashlib.sha1(os.path.realpath(str(root)).encode("utf-8")).hexdigest()
+    return os.path.join(getIndexDir(), "{}-{}.json".format(key, algorithm))
+
+
+def _readIndex(path, algorithm):
+    # type: (str, str) -> dict[str, list]
+    try:
+        with open(path, "r") as file:
+            index = json.load(file)
+    except (OSError, ValueError):
+        return {}
+    if index.get("version") != INDEX_VERSION or index.get("algorithm") != algorithm:
+        return {}
+    return index["files"]
+
+
+def _writeIndex(path, algorithm, files):
+    # type: (str, str, dict[str, list]) -> None
+    """
+    Best effort: the index being a cache, failing to write it is only logged.
+    """
+    index = {"version": INDEX_VERSION, "algorithm": algorithm, "files": files}
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        dicting.writeFileAtomic(path, json.dumps(index, separators=(",", ":")))
+    except OSError as excp:
+        logger.warning("[buildManifest] can't write index {}: {}".format(path, excp))
+
+
+def buildManifest(
+    root,  # type: str | Path
+    algorithm="sha256",  # type: str
+    max_workers=None,  # type: int | None
+    index_path=None,  # type: str | Path | None
+    use_index=True,  # type: bool
+    path_filter=None,  # type: walking.PathFilter | None
+):
+    # type: (...) -> DirectoryManifest
+    """
+    Hash all the files of the given directory, in parallel. Symbolic links are
+    followed.
+
+    A file whose (inode, size, modification time) is the same as recorded in the
+    index is not hashed again. The index is updated with the current files, if it
+    can be written.
+
+    Args:
+        root: existing directory path.
+        algorithm: name of a ``hashlib`` algorithm.
+        max_workers: number of files hashed in parallel. None for a CPU based default.
+        index_path:
+            path of the json file caching the digests, excluded from the manifest
+            if inside root. None to use ``getDefaultIndexPath``.
+        use_index: False to hash all the files without reading or writing an index.
+        path_filter: files to hash, see ``walking.PathFilter``. None for all files.
+
+    Returns:
+        digests of all the files, by path relative to root.
+    """
+    start_time = time.time()
+    root = str(root)
+    if max_workers is None:
+        max_workers = min(32, (os.cpu_count() or 1) + 4)
+    max_pending = max_workers * 4
+    manifest = DirectoryManifest(root, algorithm)
+
+    if index_path is None:
+        index_path = getDefaultIndexPath(root, algorithm)
+    index_path = str(index_path)
+    old_index = _readIndex(index_path, algorithm) if use_index else {}
+    new_index = {}  # type: dict[str, list]
+
+    pending = set()
+
+    def _hash(relative_path, path, key):
+        return relative_path, key, hashFile(path, algorithm)
+
+    def _drain(return_when):
+        nonlocal pending
+        done, pending = concurrent.futures.wait(pending, return_when=return_when)
+        for future in done:
+            relative_path, key, digest = future.result()
+            manifest.files[relative_path] = digest
+            new_index[relative_path] = key + [digest]
+            manifest.hashed += 1
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        try:
+            ignored = set()
+            if os.path.dirname(os.path.abspath(index_path)) == os.path.abspath(root):
+                ignored.add(os.path.basename(index_path))
+            for relative_path, entry in walking.walk(
+                root,
+                path_filter=path_filter,
+                follow_symlinks=True,
+                onerror=walking.raiseError,
+            ):
+                if relative_path in ignored or not entry.is_file():
+                    continue
+                stat_result = entry.stat()
+                key = [stat_result.st_ino, stat_result.st_size, stat_result.st_mtime_ns]
+
+                record = old_index.get(relative_path)
+                if record is not None and record[:3] == key:
+                    manifest.files[relative_path] = record[3]
+                    new_index[relative_path] = record
+                    continue
+
+                pending.add(executor.submit(_hash, relative_path, entry.path, key))
+                if len(pending) >= max_pending:
+                    _drain(concurrent.futures.FIRST_COMPLETED)
+
+            _drain(concurrent.futures.ALL_COMPLETED)
+
+        except BaseException:
+            for future in pending:
+                future.cancel()
+            raise
+
+    if use_index and new_index != old_index:
+        _writeIndex(index_path, algorithm, new_index)
+
+    manifest.duration = time.time() - start_time
+    logger.debug("[buildManifest] {}: {}".format(root, manifest))
+    return manifest
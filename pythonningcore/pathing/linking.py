@@ -0,0 +1,183 @@
+"""
+Create symbolic and hard links, one at a time or by batches ("link farms").
+
+Used by ``pathing.createSymLink``.
+"""
+from __future__ import annotations
+
+import concurrent.futures
+import logging
+import os
+import platform
+import subprocess
+import time
+
+import pythonningcore.py23.helpers
+
+from . import c
+from . import copying
+from . import reporting
+
+if pythonningcore.py23.helpers.isModuleAvailable("pathlib"):
+    from pathlib import Path
+if pythonningcore.py23.helpers.isModuleAvailable("typing"):
+    from typing import Iterable
+
+__all__ = (
+    "createLink",
+    "createLinks",
+    "LinksCreationError",
+)
+
+logger = logging.getLogger("{}.linking".format(c.abr))
+
+
+class LinksCreationError(OSError):
+    """
+    Raised when some links of a batch couldn't be created.
+
+    Args:
+        errors: list of (source_path, target_path, exception) for each link that failed.
+    """
+
+    def __init__(self, errors):
+        # type: (list[tuple[str, str, Exception]]) -> None
+        self.errors = errors
+        message = "{} link(s) couldn't be created:".format(len(errors))
+        for source_path, target_path, excp in errors:
+            message += "\n    {} --> {}: {}".format(source_path, target_path, excp)
+        super(LinksCreationError, self).__init__(message)
+
+
+def _createWindowsLink(source_path, target_path, hard):
+    # type: (str, str, bool) -> None
+    if os.path.isdir(source_path):
+        command_option = "/J" if hard else "/D"
+    else:
+        command_option = "/H" if hard else ""
+
+    command = ["mklink", command_option, target_path, source_path]
+    subprocess.call(command)
+
+    if not os.path.lexists(target_path):
+        raise OSError("Link not created for {} --> {}".format(source_path, target_path))
+
+
+def createLink(source_path, target_path, hard=False):
+    # type: (str | Path, str | Path, bool) -> str
+    """
+    Create target_path as a link pointing to source_path.
+
+    On Windows ``mklink`` is used, else ``os.symlink``/``os.link``. Directories
+    can't be hard linked on POSIX, so a symbolic link is created instead, which
+    behaves like the junction created on Windows.
+
+    Args:
+        source_path: file or directory path, MUST exist
+        target_path: file or directory path, MUST not exist, its parent MUST exist.
+        hard: True to create a hard link instead of a soft link.
+
+    Returns:
+        path to the created link (target_path)
+
+    Raises:
+        OSError: if the link couldn't be created.
+    """
+    source_path = str(source_path)
+    target_path = str(target_path)
+
+    if platform.system() == "Windows":
+        _createWindowsLink(source_path, target_path, hard)
+    elif hard and not os.path.isdir(source_path):
+        os.link(source_path, target_path)
+    else:
+        os.symlink(
+            source_path, target_path, target_is_directory=os.path.isdir(source_path)
+        )
+    return target_path
+
+
+def createLinks(
+    pairs,  # type: Iterable[tuple[str | Path, str | Path]]
+    hard=False,  # type: bool
+    max_workers=None,  # type: int | None
+    raise_errors=True,  # type: bool
+    result=None,  # type: reporting.OperationResult | None
+):
+    # type: (...) -> list[tuple[str, str, Exception]]
+    """
+    Create many links at once, in parallel.
+
+    The parent directories of all the targets are created first, each only once.
+    A failing link doesn't stop the others from being created.
+
+    Args:
+        pairs: (source_path, target_path) of each link, see ``createLink``.
+        hard: True to create hard links instead of soft links.
+        max_workers: number of links created in parallel. None for a CPU based default.
+        raise_errors:
+            if True raise a single LinksCreationError for all the failures, else
+            return them.
+        result:
+            updated with the links created, the failures and the time spent in
+            the "mkdir" and "link" phases.
+
+    Returns:
+        list of (source_path, target_path, exception) for each link that failed.
+
+    Raises:
+        LinksCreationError: if any link failed and raise_errors is True.
+    """
+    pairs = [(str(source), str(target)) for source, target in pairs]
+    max_workers = max_workers or copying.getDefaultMaxWorkers()
+    if result is None:
+        result = reporting.OperationResult("createLinks")
+
+    errors = []  # type: list[tuple[str, str, Exception]]
+    failed_parents = {}  # type: dict[str, Exception]
+
+    with result.timePhase("mkdir"):
+        for parent in {os.path.dirname(target) for _, target in pairs}:
+            if not parent:
+                continue
+            try:
+                os.makedirs(parent, exist_ok=True)
+            except OSError as excp:
+                failed_parents[parent] = excp
+                continue
+            result.add(directories=1)
+
+    def _create(source_path, target_path):
+        start = time.monotonic()
+        try:
+            createLink(source_path, target_path, hard=hard)
+        except OSError as excp:
+            result.addError(target_path, excp)
+            return source_path, target_path, excp
+        finally:
+            result.addPhaseTime("link", time.monotonic() - start)
+        result.add(files=1)
+        return None
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = []
+        for source_path, target_path in pairs:
+            parent_error = failed_parents.get(os.path.dirname(target_path))
+            if parent_error is not None:
+                result.addError(target_path, parent_error)
+                errors.append((source_path, target_path, parent_error))
+                continue
+            futures.append(executor.submit(_create, source_path, target_path))
+
+        for future in futures:
+            error = future.result()
+            if error is not None:
+                errors.append(error)
+
+    logger.info(
+        "[createLinks] Finished. {} link(s) created, {} failed."
+        "".format(len(pairs) - len(errors), len(errors))
+    )
+    if errors and raise_errors:
+        raise LinksCreationError(errors)
+    return errors
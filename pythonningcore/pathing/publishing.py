@@ -0,0 +1,270 @@
+"""
+Publish directories atomically: each publish is copied to its own version directory
+then made visible at once by replacing a ``current`` symbolic link::
+
+    publish_root/
+        current -> versions/20240101-120000-1a2b3c
+        versions/
+            20231231-090000-4d5e6f/
+            20240101-120000-1a2b3c/
+
+Readers MUST access the content through ``publish_root/current``. Published
+versions share their identical files (hard links) so they MUST never be modified
+in place.
+
+Not supported on Windows, where a directory symbolic link can't be atomically
+replaced.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import platform
+import time
+import uuid
+
+import pythonningcore.py23.helpers
+
+from . import c
+from . import clearing
+from . import copying
+from . import reporting
+
+if pythonningcore.py23.helpers.isModuleAvailable("pathlib"):
+    from pathlib import Path
+
+__all__ = (
+    "collectGarbage",
+    "CURRENT_NAME",
+    "getCurrentVersion",
+    "listVersions",
+    "publishDir",
+    "switchVersion",
+    "VERSIONS_DIR_NAME",
+)
+
+logger = logging.getLogger("{}.publishing".format(c.abr))
+
+CURRENT_NAME = "current"
+"""
+Name of the symbolic link pointing to the published version.
+"""
+
+VERSIONS_DIR_NAME = "versions"
+"""
+Name of the directory storing all the versions.
+"""
+
+STAGING_PREFIX = ".staging-"
+"""
+Prefix of the directories a version is copied into, before being published.
+"""
+
+
+def _checkPlatform():
+    if platform.system() == "Windows":
+        raise NotImplementedError(
+            "Publishing is not supported on Windows: the current link can't be "
+            "atomically replaced"
+        )
+
+
+def _getVersionsDir(publish_root):
+    # type: (str | Path) -> str
+    return os.path.join(str(publish_root), VERSIONS_DIR_NAME)
+
+
+def getCurrentVersion(publish_root):
+    # type: (str | Path) -> str | None
+    """
+    Returns:
+        name of the published version, None if nothing was published yet.
+    """
+    try:
+        link = os.readlink(os.path.join(str(publish_root), CURRENT_NAME))
+    except FileNotFoundError:
+        return None
+    return os.path.basename(os.path.normpath(link))
+
+
+def listVersions(publish_root):
+    # type: (str | Path) -> list[str]
+    """
+    Returns:
+        names of all the versions, from the oldest to the most recent.
+    """
+    versions_dir = _getVersionsDir(publish_root)
+    if not os.path.isdir(versions_dir):
+        return []
+    with os.scandir(versions_dir) as iterator:
+        entries = [
+            entry
+            for entry in iterator
+            if entry.is_dir(follow_symlinks=False)
+            and not entry.name.startswith(STAGING_PREFIX)
+        ]
+    entries.sort(key=lambda entry: (entry.stat().st_mtime_ns, entry.name))
+    return [entry.name for entry in entries]
+
+
+def switchVersion(publish_root, version):
+    # type: (str | Path, str) -> None
+    """
+    Atomically make the given version the published one, also to roll back.
+
+    A new symbolic link is created then renamed over the current one, so readers
+    always see either the previous or the new version.
+
+    Args:
+        publish_root: directory containing the versions.
+        version: name of an existing version.
+
+    Raises:
+        NotImplementedError: on Windows.
+    """
+    _checkPlatform()
+    publish_root = str(publish_root)
+    if not os.path.isdir(os.path.join(_getVersionsDir(publish_root), version)):
+        raise FileNotFoundError(
+            "Version <{}> doesn't exist in {}".format(version, publish_root)
+        )
+
+    current_path = os.path.join(publish_root, CURRENT_NAME)
+    tmp_path = "{}.{}.tmp".format(current_path, uuid.uuid4().hex)
+    # relative so the publish root can be moved
+    os.symlink(
+        os.path.join(VERSIONS_DIR_NAME, version), tmp_path, target_is_directory=True
+    )
+    try:
+        os.replace(tmp_path, current_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    logger.info("[switchVersion] {} now points to {}".format(current_path, version))
+    return
+
+
+def collectGarbage(publish_root, keep=3, clear_staging=False):
+    # type: (str | Path, int, bool) -> list[str]
+    """
+    Delete the oldest versions, never the published one.
+
+    Args:
+        publish_root: directory containing the versions.
+        keep: number of most recent versions to keep, including the published one.
+        clear_staging:
+            if True also delete the staging directories, left by interrupted
+            publishes. MUST not be used while another publish is running.
+
+    Returns:
+        names of the versions deleted.
+    """
+    versions_dir = _getVersionsDir(publish_root)
+    current = getCurrentVersion(publish_root)
+    versions = listVersions(publish_root)
+
+    kept = set(versions[-keep:] if keep > 0 else [])
+    kept.add(current)
+    deleted = [version for version in versions if version not in kept]
+
+    if clear_staging and os.path.isdir(versions_dir):
+        with os.scandir(versions_dir) as iterator:
+            deleted.extend(
+                entry.name
+                for entry in iterator
+                if entry.name.startswith(STAGING_PREFIX)
+            )
+
+    for version in deleted:
+        clearing.removeTree(os.path.join(versions_dir, version))
+
+    if deleted:
+        logger.info("[collectGarbage] deleted {}".format(deleted))
+    return deleted
+
+
+def publishDir(
+    source,  # type: str | Path
+    publish_root,  # type: str | Path
+    version=None,  # type: str | None
+    keep=3,  # type: int | None
+    mode=copying.CopyModes.hardlink,  # type: copying.CopyModes
+    max_workers=None,  # type: int | None
+    result=None,  # type: reporting.OperationResult | None
+):
+    # type: (...) -> str
+    """
+    Publish a copy of the source directory, without readers ever seeing a partial
+    copy.
+
+    The source is copied into a staging directory next to the versions, which is
+    then renamed as a new version, and the ``current`` link switched to it. With
+    the default ``CopyModes.hardlink`` mode, files identical to the previous
+    version (content, permissions and modification time) are hard linked instead
+    of copied.
+
+    Args:
+        source: existing directory path.
+        publish_root: directory containing the versions, MIGHT not exist.
+        version:
+            name of the new version, MUST not exist. None to generate a name based
+            on the current time.
+        keep:
+            number of versions kept once published, see ``collectGarbage``. None
+            to keep all of them.
+        mode: how the files are copied, see ``copying.CopyModes``.
+        max_workers: number of files copied in parallel. None for a CPU based default.
+        result:
+            updated with the files copied and the time spent in each phase, the
+            copy ones plus "switch" and "gc".
+
+    Returns:
+        path of the new version directory.
+
+    Raises:
+        NotImplementedError: on Windows.
+    """
+    _checkPlatform()
+    publish_root = str(publish_root)
+    versions_dir = _getVersionsDir(publish_root)
+    os.makedirs(versions_dir, exist_ok=True)
+
+    if version is None:
+        version = "{}-{}".format(time.strftime("%Y%m%d-%H%M%S"), uuid.uuid4().hex[:6])
+    version_path = os.path.join(versions_dir, version)
+    if os.path.lexists(version_path):
+        raise FileExistsError("Version <{}> already exists".format(version_path))
+
+    if result is None:
+        result = reporting.OperationResult("publishDir")
+    previous = getCurrentVersion(publish_root)
+    link_dest = None if previous is None else os.path.join(versions_dir, previous)
+    staging_path = os.path.join(versions_dir, STAGING_PREFIX + version)
+
+    start_time = time.time()
+    try:
+        copying.copyTree(
+            source,
+            staging_path,
+            max_workers=max_workers,
+            mode=mode,
+            link_dest=link_dest,
+            result=result,
+        )
+        os.rename(staging_path, version_path)
+    except BaseException:
+        if os.path.exists(staging_path):
+            clearing.removeTree(staging_path)
+        raise
+
+    with result.timePhase("switch"):
+        switchVersion(publish_root, version)
+    logger.info(
+        "[publishDir] Finished. Published {} as {} in {:.2f}s"
+        "".format(source, version, time.time() - start_time)
+    )
+
+    if keep is not None:
+        with result.timePhase("gc"):
+            collectGarbage(publish_root, keep=keep)
+    return version_path
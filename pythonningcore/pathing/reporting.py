@@ -0,0 +1,220 @@
+"""
+Metrics collected while running a pathing operation, reported through a
+throttled callback and returned once finished.
+"""
+from __future__ import annotations
+
+import contextlib
+import logging
+import threading
+import time
+
+import pythonningcore.py23.helpers
+
+from . import c
+
+if pythonningcore.py23.helpers.isModuleAvailable("typing"):
+    from typing import Callable, Iterator
+
+__all__ = (
+    "OperationCancelledError",
+    "OperationResult",
+    "DEFAULT_INTERVAL",
+)
+
+logger = logging.getLogger("{}.reporting".format(c.abr))
+
+DEFAULT_INTERVAL = 0.5
+"""
+Default minimum duration in seconds between two progress callback calls.
+"""
+
+
+class OperationCancelledError(RuntimeError):
+    """
+    Raised in the threads of an operation that was cancelled, to stop it.
+    """
+
+    pass
+
+
+class OperationResult:
+    """
+    Metrics of a pathing operation, updated by the engines while it runs.
+
+    Updates are thread-safe. Each update may call the callback, at most once every
+    ``interval`` seconds, and it is always called once the operation finished.
+
+    Phases timings are the sum of the time spent in each phase by all the threads,
+    so the phases run in parallel (like ``copy`` or ``delete``) can last longer
+    than the wall time. Comparing them tells if an operation is bound by the
+    directory scan (metadata), the data copy (I/O) or the external processes.
+
+    An operation can be stopped from another thread with ``cancel()``: its next
+    update raises OperationCancelledError.
+
+    Args:
+        operation: name of the operation, for display.
+        callback:
+            called with this instance as the operation progress, from any thread.
+            MUST be fast, as it slows down the operation.
+        interval:
+            minimum duration in seconds between two callback calls, 0 to call it
+            on every update.
+    """
+
+    def __init__(self, operation, callback=None, interval=DEFAULT_INTERVAL):
+        # type: (str, Callable[[OperationResult], None] | None, float) -> None
+        self.operation = operation  # type: str
+        self.files = 0  # type: int
+        """
+        Number of files (or links) processed.
+        """
+        self.bytes = 0  # type: int
+        """
+        Number of bytes processed, not measured for deletions.
+        """
+        self.directories = 0  # type: int
+        self.errors = []  # type: list[tuple[str, Exception]]
+        """
+        (path, exception) of each failure.
+        """
+        self.phases = {}  # type: dict[str, float]
+        """
+        Seconds spent in each phase, by name ("scan", "copy", "delete", ...).
+        """
+        self.start_time = time.time()  # type: float
+        self.duration = None  # type: float | None
+        """
+        Wall time in seconds, None until finished.
+        """
+
+        self.callback = callback
+        self.interval = interval
+        self.cancelled = False  # type: bool
+        self._lock = threading.Lock()
+        self._notify_lock = threading.Lock()
+        self._last_notify = time.monotonic()
+        self._start = time.monotonic()
+
+    def __str__(self):
+        message = "{}: {} file(s), {} dir(s), {:.1f} MB, {} error(s) in {:.2f}s".format(
+            self.operation,
+            self.files,
+            self.directories,
+            self.bytes / (1024 * 1024),
+            len(self.errors),
+            self.elapsed,
+        )
+        if self.phases:
+            message += " ({})".format(
+                ", ".join(
+                    "{} {:.2f}s".format(name, duration)
+                    for name, duration in self.phases.items()
+                )
+            )
+        return message
+
+    @property
+    def ok(self):
+        # type: () -> bool
+        return not self.errors
+
+    @property
+    def finished(self):
+        # type: () -> bool
+        return self.duration is not None
+
+    @property
+    def elapsed(self):
+        # type: () -> float
+        """
+        Wall time in seconds since the operation started.
+        """
+        if self.duration is not None:
+            return self.duration
+        return time.monotonic() - self._start
+
+    @property
+    def throughput(self):
+        # type: () -> float
+        """
+        Number of bytes processed per second.
+        """
+        elapsed = self.elapsed
+        return self.bytes / elapsed if elapsed else 0.0
+
+    def _notify(self, force=False):
+        # type: (bool) -> None
+        if self.callback is None:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_notify < self.interval:
+            return
+        # a thread already notifying is enough
+        if not self._notify_lock.acquire(blocking=force):
+            return
+        try:
+            self._last_notify = now
+            self.callback(self)
+        finally:
+            self._notify_lock.release()
+
+    def cancel(self):
+        # type: () -> None
+        """
+        Ask the operation to stop as soon as possible.
+        """
+        self.cancelled = True
+
+    def add(self, files=0, size=0, directories=0):
+        # type: (int, int, int) -> None
+        """
+        Args:
+            files: number of files processed.
+            size: number of bytes processed.
+            directories: number of directories processed.
+
+        Raises:
+            OperationCancelledError: if the operation was cancelled.
+        """
+        if self.cancelled:
+            raise OperationCancelledError("{} was cancelled".format(self.operation))
+        with self._lock:
+            self.files += files
+            self.bytes += size
+            self.directories += directories
+        self._notify()
+
+    def addError(self, path, error):
+        # type: (str, Exception) -> None
+        with self._lock:
+            self.errors.append((path, error))
+        self._notify()
+
+    def addPhaseTime(self, phase, duration):
+        # type: (str, float) -> None
+        with self._lock:
+            self.phases[phase] = self.phases.get(phase, 0.0) + duration
+
+    @contextlib.contextmanager
+    def timePhase(self, phase):
+        # type: (str) -> Iterator[None]
+        """
+        Context manager adding the time spent in its block to the given phase.
+        """
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.addPhaseTime(phase, time.monotonic() - start)
+
+    def finish(self):
+        # type: () -> OperationResult
+        """
+        Set the final duration and call the callback, to call once at the end.
+        """
+        self.duration = time.monotonic() - self._start
+        self._notify(force=True)
+        logger.debug("[{}] {}".format(self.__class__.__name__, self))
+        return self
@@ -0,0 +1,386 @@
+"""
+Incremental directory synchronisation based on a manifest cached in the target.
+
+The manifest stores the size and modification time (and optionally the content
+hash) of every source file at the time it was copied. Next syncs only need to stat
+the source files to know which ones changed, without re-examining the target.
+"""
+from __future__ import annotations
+
+import concurrent.futures
+import json
+import logging
+import os
+import shutil
+import time
+
+import pythonningcore.py23.helpers
+from pythonningcore.datastructuring import dicting
+
+from . import c
+from . import copying
+from . import hashing
+from . import reporting
+from . import walking
+
+if pythonningcore.py23.helpers.isModuleAvailable("pathlib"):
+    from pathlib import Path
+
+__all__ = (
+    "MANIFEST_NAME",
+    "SyncReport",
+    "syncDir",
+)
+
+logger = logging.getLogger("{}.syncing".format(c.abr))
+
+MANIFEST_NAME = ".{}-manifest.json".format(c.abr)
+"""
+Name of the manifest file stored at the root of the target directory.
+"""
+
+MANIFEST_VERSION = 1
+
+
+class SyncReport:
+    """
+    What a ``syncDir`` call did, paths are relative to the target directory.
+    """
+
+    def __init__(self):
+        self.copied = []  # type: list[str]
+        self.deleted = []  # type: list[str]
+        self.touched = []  # type: list[str]
+        """
+        Files whose modification time changed but not their content hash.
+        """
+        self.skipped = 0  # type: int
+        self.duration = 0.0  # type: float
+
+    def __str__(self):
+        return "{} copied, {} deleted, {} touched, {} unchanged in {:.2f}s" "".format(
+            len(self.copied),
+            len(self.deleted),
+            len(self.touched),
+            self.skipped,
+            self.duration,
+        )
+
+
+def _readManifest(path):
+    # type: (str) -> dict | None
+    """
+    Returns:
+        manifest content, None if it doesn't exist or is not valid.
+    """
+    try:
+        with open(path, "r") as file:
+            manifest = json.load(file)
+    except (FileNotFoundError, ValueError):
+        return None
+    if manifest.get("version") != MANIFEST_VERSION:
+        return None
+    return manifest
+
+
+def _writeManifest(path, manifest):
+    # type: (str, dict) -> None
+    dicting.writeFileAtomic(path, json.dumps(manifest, separators=(",", ":")))
+
+
+def _scanSource(source):
+    """
+    Returns:
+        generator of (relative path, DirEntry) for every entry of the source, with
+        directories yielded before their content. Symbolic links are not followed.
+    """
+    for relative_path, entry in walking.walk(
+        source,
+        follow_symlinks=False,
+        yield_dirs=True,
+        onerror=walking.raiseError,
+    ):
+        if relative_path != MANIFEST_NAME:
+            yield relative_path, entry
+
+
+def _syncSymlink(source_path, target_path):
+    # type: (str, str) -> bool
+    """
+    Returns:
+        True if the target link was created, False if it was already the same.
+    """
+    link = os.readlink(source_path)
+    if os.path.islink(target_path):
+        if os.readlink(target_path) == link:
+            return False
+        os.unlink(target_path)
+    elif os.path.isdir(target_path):
+        shutil.rmtree(target_path)
+    elif os.path.lexists(target_path):
+        os.unlink(target_path)
+    os.symlink(link, target_path)
+    return True
+
+
+def _isInSymlink(target, relative_path):
+    # type: (str, str) -> bool
+    """
+    Returns:
+        True if a parent directory of the path in target is a symbolic link, so
+        deleting the path would delete outside of target.
+    """
+    parent = os.path.dirname(relative_path)
+    while parent:
+        if os.path.islink(os.path.join(target, parent)):
+            return True
+        parent = os.path.dirname(parent)
+    return False
+
+
+def _deleteUntracked(target, files, dirs):
+    # type: (str, dict[str, list], set[str]) -> list[str]
+    """
+    Delete from target all the entries that are neither in files nor dirs.
+
+    Returns:
+        relative paths of the entries deleted.
+    """
+    deleted = []
+    directories = [""]
+    while directories:
+        relative_dir = directories.pop()
+        with os.scandir(os.path.join(target, relative_dir)) as iterator:
+            entries = list(iterator)
+
+        for entry in entries:
+            relative_path = os.path.join(relative_dir, entry.name)
+            if relative_path == MANIFEST_NAME:
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                if relative_path in dirs:
+                    directories.append(relative_path)
+                    continue
+                shutil.rmtree(entry.path)
+            elif relative_path in files:
+                continue
+            else:
+                os.unlink(entry.path)
+            deleted.append(relative_path)
+    return deleted
+
+
+def syncDir(
+    source,  # type: str | Path
+    target,  # type: str | Path
+    mirror=True,  # type: bool
+    use_hash=False,  # type: bool
+    max_workers=None,  # type: int | None
+    trust_manifest=True,  # type: bool
+    result=None,  # type: reporting.OperationResult | None
+):
+    # type: (...) -> SyncReport
+    """
+    Make the target directory a copy of source, only copying new or modified files.
+
+    A file is considered unchanged if its size and modification time are the same as
+    recorded in the target manifest. When no manifest exists yet, the files already
+    in target with the same size and modification time are considered up-to-date.
+
+    The target content is trusted to not be modified by anything else than this
+    function: a target file deleted by hand will not be restored as long as its
+    source is unchanged. When mirroring, only the files recorded in the manifest
+    are deleted, unless there is no manifest (or it is not trusted) in which case
+    the target is scanned to delete everything not in source.
+
+    Symbolic links in source are copied as links, like ``copying.copyTree`` does.
+
+    Args:
+        source: existing directory path.
+        target: directory path, MIGHT not exist.
+        mirror:
+            (destructive) if True delete from target the files and directories that
+            were removed from source since last sync, or that are not in source
+            at all on the first sync.
+        use_hash:
+            if True, files whose size/mtime changed are hashed and not copied if
+            their content hash is the same as recorded.
+        max_workers: number of files copied in parallel. None for a CPU based default.
+        trust_manifest:
+            False to ignore the manifest, comparing the source to the target
+            content instead, for example when the target might have been modified.
+        result:
+            updated with the files copied and the time spent in the "scan",
+            "hash", "copy" and "delete" phases.
+
+    Returns:
+        report of the operations performed.
+    """
+    start_time = time.time()
+    source = str(source)
+    target = str(target)
+    max_workers = max_workers or copying.getDefaultMaxWorkers()
+    max_pending = max_workers * 4
+    report = SyncReport()
+    if result is None:
+        result = reporting.OperationResult("syncDir")
+
+    os.makedirs(target, exist_ok=True)
+    manifest_path = os.path.join(target, MANIFEST_NAME)
+    manifest = _readManifest(manifest_path) if trust_manifest else None
+    trusted = manifest is not None
+    if manifest is None:
+        manifest = {"dirs": [], "files": {}}
+    old_files = manifest["files"]  # type: dict[str, list]
+    old_dirs = set(manifest["dirs"])
+    new_files = {}  # type: dict[str, list]
+    new_dirs = []  # type: list[str]
+
+    def _copy(relative_path, entry, record):
+        start = time.monotonic()
+        target_path = os.path.join(target, relative_path)
+        try:
+            if os.path.isdir(target_path) and not os.path.islink(target_path):
+                shutil.rmtree(target_path)
+            copying.copyFile(entry.path, target_path)
+        except Exception as excp:
+            result.addError(entry.path, excp)
+            raise
+        result.addPhaseTime("copy", time.monotonic() - start)
+        result.add(files=1, size=record[0])
+        return relative_path, record
+
+    pending = set()
+    waited = 0.0  # time not spent scanning by the main thread
+
+    def _drain(return_when):
+        nonlocal pending, waited
+        start = time.monotonic()
+        done, pending = concurrent.futures.wait(pending, return_when=return_when)
+        waited += time.monotonic() - start
+        for future in done:
+            relative_path, record = future.result()
+            new_files[relative_path] = record
+            report.copied.append(relative_path)
+
+    hashed = 0.0
+    scan_start = time.monotonic()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        try:
+            for relative_path, entry in _scanSource(source):
+                target_path = os.path.join(target, relative_path)
+
+                if entry.is_symlink():
+                    link_stat = entry.stat(follow_symlinks=False)
+                    new_files[relative_path] = [
+                        link_stat.st_size,
+                        link_stat.st_mtime_ns,
+                        None,
+                    ]
+                    if _syncSymlink(entry.path, target_path):
+                        report.copied.append(relative_path)
+                        result.add(files=1)
+                    else:
+                        report.skipped += 1
+                    continue
+
+                if entry.is_dir(follow_symlinks=False):
+                    new_dirs.append(relative_path)
+                    if relative_path not in old_dirs:
+                        if os.path.islink(target_path) or (
+                            os.path.lexists(target_path)
+                            and not os.path.isdir(target_path)
+                        ):
+                            os.unlink(target_path)
+                        os.makedirs(target_path, exist_ok=True)
+                    result.add(directories=1)
+                    continue
+
+                source_stat = entry.stat()
+                record = [source_stat.st_size, source_stat.st_mtime_ns, None]
+                previous = old_files.get(relative_path)
+
+                if previous is None:
+                    try:
+                        target_stat = os.lstat(target_path)
+                    except FileNotFoundError:
+                        target_stat = None
+                    if (
+                        target_stat is not None
+                        and target_stat.st_size == source_stat.st_size
+                        and target_stat.st_mtime_ns == source_stat.st_mtime_ns
+                    ):
+                        previous = record
+
+                if previous is not None and previous[:2] == record[:2]:
+                    record[2] = previous[2]
+                    new_files[relative_path] = record
+                    report.skipped += 1
+                    continue
+
+                if use_hash:
+                    hash_start = time.monotonic()
+                    record[2] = hashing.hashFile(entry.path)
+                    hashed += time.monotonic() - hash_start
+                    if (
+                        previous is not None
+                        and previous[2] == record[2]
+                        and os.path.exists(target_path)
+                    ):
+                        shutil.copystat(entry.path, target_path)
+                        new_files[relative_path] = record
+                        report.touched.append(relative_path)
+                        continue
+
+                pending.add(executor.submit(_copy, relative_path, entry, record))
+                if len(pending) >= max_pending:
+                    _drain(concurrent.futures.FIRST_COMPLETED)
+
+            result.addPhaseTime("scan", time.monotonic() - scan_start - hashed - waited)
+            if use_hash:
+                result.addPhaseTime("hash", hashed)
+            _drain(concurrent.futures.ALL_COMPLETED)
+
+        except BaseException:
+            for future in pending:
+                future.cancel()
+            raise
+
+    if mirror:
+        delete_start = time.monotonic()
+        for relative_path in old_files:
+            if relative_path in new_files or _isInSymlink(target, relative_path):
+                continue
+            target_path = os.path.join(target, relative_path)
+            if os.path.islink(target_path) or (
+                os.path.lexists(target_path) and not os.path.isdir(target_path)
+            ):
+                os.unlink(target_path)
+            report.deleted.append(relative_path)
+
+        # deepest first so parents are empty when reached
+        for relative_path in sorted(old_dirs.difference(new_dirs), reverse=True):
+            if _isInSymlink(target, relative_path):
+                continue
+            target_path = os.path.join(target, relative_path)
+            if os.path.isdir(target_path) and not os.path.islink(target_path):
+                shutil.rmtree(target_path)
+            report.deleted.append(relative_path)
+
+        if not trusted:
+            # nothing tells what was copied before, so compare with the target
+            new_dirs_set = set(new_dirs)
+            report.deleted.extend(_deleteUntracked(target, new_files, new_dirs_set))
+        result.addPhaseTime("delete", time.monotonic() - delete_start)
+
+    manifest = {"version": MANIFEST_VERSION, "dirs": new_dirs, "files": new_files}
+    if not mirror:
+        # keep tracking the files not deleted
+        for relative_path, record in old_files.items():
+            new_files.setdefault(relative_path, record)
+        manifest["dirs"] = sorted(old_dirs.union(new_dirs))
+    _writeManifest(manifest_path, manifest)
+
+    report.duration = time.time() - start_time
+    logger.debug("[syncDir] {} -> {}: {}".format(source, target, report))
+    return report
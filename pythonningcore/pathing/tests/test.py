@@ -1,16 +1,23 @@
 """
 
 """
+import asyncio
 import filecmp
 import logging
 import os.path
+import platform
+import shutil
+import stat
+import threading
 import unittest
 import uuid
+from unittest import mock
 
 import pythonningcore
 import pythonningcore.pathing
 import pythonningcore.loggering
 
+
 logger = logging.getLogger("{}.tests.test".format(pythonningcore.pathing.c.abr))
 pythonningcore.loggering.setupLoggingFor(
     loggers=[pythonningcore.c.abr], level=logging.DEBUG
@@ -60,6 +67,10 @@ class B_clearDirTest(unittest.TestCase):
         pythonningcore.pathing.clearDir(self.test_dir)
         self.assertFalse(os.path.exists(self.test_dir))
 
+    @unittest.skipUnless(
+        platform.system() == "Windows",
+        "read-only files in a writable directory can be deleted on POSIX",
+    )
     def test_readonly_fail(self):
         initTestDir(SRC_BETA, target=self.test_dir)
 
@@ -70,6 +81,98 @@ class B_clearDirTest(unittest.TestCase):
 
         pythonningcore.pathing.clearDir(self.test_dir, force=True)
 
+    def test_parallel(self):
+        for index in range(20):
+            directory = os.path.join(self.test_dir, "dir{}".format(index % 4), "sub")
+            os.makedirs(directory, exist_ok=True)
+            with open(os.path.join(directory, "file{}.txt".format(index)), "w") as file:
+                file.write("content")
+        os.symlink(SRC_ALPHA, os.path.join(self.test_dir, "link"))
+
+        calls = []
+        pythonningcore.pathing.clearDir(
+            self.test_dir,
+            max_workers=2,
+            callback=lambda result: calls.append((result.files, result.directories)),
+        )
+        self.assertFalse(os.path.exists(self.test_dir))
+        self.assertTrue(os.path.exists(SRC_ALPHA))
+        self.assertEqual(calls[-1], (21, 9))
+
+
+class D_trashTest(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = os.path.join(DIR_DATA, "test{}".format(uuid.uuid4().hex))
+        self.trash_dir = os.path.join(
+            DIR_DATA, pythonningcore.pathing.clearing.TRASH_DIR_NAME
+        )
+        initTestDir(SRC_ALPHA, target=self.test_dir)
+
+    def tearDown(self):
+        clearing = pythonningcore.pathing.clearing
+        for worker in list(clearing._workers.values()):
+            if isinstance(worker, threading.Thread):
+                worker.join()
+            else:
+                worker.wait()
+        clearing.sweepTrash(DIR_DATA)
+        # the trash directory is kept once created
+        os.rmdir(self.trash_dir)
+
+    def test_fast(self):
+        pythonningcore.pathing.clearDir(self.test_dir, fast=True)
+        self.assertFalse(os.path.exists(self.test_dir))
+        os.makedirs(self.test_dir)
+        os.rmdir(self.test_dir)
+
+    def test_background(self):
+        trash_path = pythonningcore.pathing.clearing.moveToTrash(self.test_dir)
+        self.assertFalse(os.path.exists(self.test_dir))
+        self.assertTrue(os.path.exists(trash_path))
+        pythonningcore.pathing.clearing.removeInBackground(trash_path).join()
+        self.assertFalse(os.path.exists(trash_path))
+        self.assertEqual(os.listdir(self.trash_dir), [])
+
+    def test_detached(self):
+        trash_path = pythonningcore.pathing.clearing.moveToTrash(self.test_dir)
+        process = pythonningcore.pathing.clearing.removeInBackground(
+            trash_path, detached=True
+        )
+        self.assertEqual(process.wait(timeout=30), 0)
+        self.assertFalse(os.path.exists(trash_path))
+
+    def test_sweep(self):
+        trash_path = pythonningcore.pathing.clearing.moveToTrash(self.test_dir)
+        leftovers = pythonningcore.pathing.clearing.sweepTrash(DIR_DATA)
+        self.assertEqual(leftovers, [trash_path])
+        self.assertEqual(os.listdir(self.trash_dir), [])
+
+    def test_sweep_running(self):
+        clearing = pythonningcore.pathing.clearing
+        trash_path = clearing.moveToTrash(self.test_dir)
+        # stand-in for a background deletion still running
+        release = threading.Event()
+        worker = threading.Thread(target=release.wait, daemon=True)
+        worker.start()
+        clearing._registerWorker(trash_path, worker)
+        try:
+            self.assertEqual(clearing.sweepTrash(DIR_DATA), [])
+            self.assertTrue(os.path.exists(trash_path))
+        finally:
+            release.set()
+            worker.join()
+        self.assertEqual(clearing.sweepTrash(DIR_DATA), [trash_path])
+
+    def test_concurrent_removal(self):
+        clearing = pythonningcore.pathing.clearing
+        trash_path = clearing.moveToTrash(self.test_dir)
+        # another worker deleted part of the tree meanwhile
+        with mock.patch.object(
+            clearing, "removeTree", side_effect=[FileNotFoundError, None]
+        ) as removeTree:
+            clearing._removeTrashed(trash_path, True)
+        self.assertEqual(removeTree.call_count, 2)
+
 
 class A_copyDir(unittest.TestCase):
     def setUp(self):
@@ -99,6 +202,649 @@ class A_copyDir(unittest.TestCase):
         self.assertFalse(result.left_only)
         self.assertFalse(result.right_only)
 
+    def test_update(self):
+
+        src_dir = self.test_dir + "src"
+        shutil.copytree(SRC_ALPHA, src_dir)
+        try:
+            file_count = sum([len(files) for _, _, files in os.walk(src_dir)])
+            copied = pythonningcore.pathing.copying.copyTree(src_dir, self.test_dir)
+            self.assertEqual(copied, file_count)
+            copied = pythonningcore.pathing.copying.copyTree(src_dir, self.test_dir)
+            self.assertEqual(copied, 0)
+
+            with open(os.path.join(src_dir, "README.md"), "a") as file:
+                file.write("modified")
+            copied = pythonningcore.pathing.copying.copyTree(
+                src_dir, self.test_dir, max_workers=1
+            )
+            self.assertEqual(copied, 1)
+            self.assertTrue(
+                filecmp.cmp(
+                    os.path.join(src_dir, "README.md"),
+                    os.path.join(self.test_dir, "README.md"),
+                    shallow=False,
+                )
+            )
+        finally:
+            shutil.rmtree(src_dir)
+
+    def test_directory_metadata(self):
+
+        src_dir = self.test_dir + "src"
+        shutil.copytree(SRC_ALPHA, src_dir)
+        try:
+            sub_dir = os.path.join(src_dir, "sub")
+            os.makedirs(sub_dir)
+            with open(os.path.join(sub_dir, "file.txt"), "w") as file:
+                file.write("content")
+            os.chmod(sub_dir, 0o750)
+            os.utime(sub_dir, (0, 60))
+
+            pythonningcore.pathing.copying.copyTree(src_dir, self.test_dir)
+            target_stat = os.stat(os.path.join(self.test_dir, "sub"))
+            self.assertEqual(stat.S_IMODE(target_stat.st_mode), 0o750)
+            self.assertEqual(target_stat.st_mtime, 60)
+        finally:
+            shutil.rmtree(src_dir)
+
+    def test_zero_copy_fallback(self):
+
+        copying = pythonningcore.pathing.copying
+        source = self.test_dir + "src.txt"
+        target = self.test_dir + ".txt"
+        with open(source, "w") as file:
+            file.write("content")
+        try:
+            # like files of /proc, the kernel copies nothing but reports no error
+            with mock.patch.object(
+                copying.os, "copy_file_range", return_value=0, create=True
+            ), mock.patch.object(copying.os, "sendfile", return_value=0, create=True):
+                copying.copyFile(source, target)
+            self.assertTrue(filecmp.cmp(source, target, shallow=False))
+
+            # truncated while copied
+            with mock.patch.object(
+                copying.os, "copy_file_range", side_effect=[1, 0], create=True
+            ):
+                with self.assertRaises(OSError):
+                    copying.copyFile(source, target)
+        finally:
+            os.unlink(source)
+            os.unlink(target)
+
+    def test_reflink(self):
+
+        pythonningcore.pathing.copyDir(
+            SRC_ALPHA,
+            self.test_dir,
+            mode=pythonningcore.pathing.copying.CopyModes.reflink,
+        )
+        result = filecmp.dircmp(SRC_ALPHA, self.test_dir)
+        self.assertFalse(result.left_only)
+        self.assertFalse(result.diff_files)
+
+    @unittest.skipIf(platform.system() == "Windows", "requires os.link")
+    def test_hardlink(self):
+
+        copying = pythonningcore.pathing.copying
+        src_dir = self.test_dir + "src"
+        shutil.copytree(SRC_ALPHA, src_dir)
+        try:
+            for name in ("a.txt", "b.txt"):
+                with open(os.path.join(src_dir, name), "w") as file:
+                    file.write("same content")
+                os.utime(os.path.join(src_dir, name), (0, 0))
+
+            copying.copyTree(src_dir, self.test_dir, mode=copying.CopyModes.hardlink)
+            self.assertTrue(
+                os.path.samefile(
+                    os.path.join(self.test_dir, "a.txt"),
+                    os.path.join(self.test_dir, "b.txt"),
+                )
+            )
+
+            new_dir = self.test_dir + "new"
+            copying.copyTree(
+                src_dir,
+                new_dir,
+                mode=copying.CopyModes.hardlink,
+                link_dest=self.test_dir,
+            )
+            try:
+                self.assertTrue(
+                    os.path.samefile(
+                        os.path.join(self.test_dir, "README.md"),
+                        os.path.join(new_dir, "README.md"),
+                    )
+                )
+            finally:
+                shutil.rmtree(new_dir)
+        finally:
+            shutil.rmtree(src_dir)
+
+    @unittest.skipIf(platform.system() == "Windows", "requires os.link")
+    def test_hardlink_metadata(self):
+
+        copying = pythonningcore.pathing.copying
+        src_dir = self.test_dir + "src"
+        os.makedirs(src_dir)
+        try:
+            for name, mode, mtime in (
+                ("a.sh", 0o644, 0),
+                ("b.sh", 0o755, 0),
+                ("c.sh", 0o644, 60),
+            ):
+                path = os.path.join(src_dir, name)
+                with open(path, "w") as file:
+                    file.write("same content")
+                os.chmod(path, mode)
+                os.utime(path, (mtime, mtime))
+
+            copying.copyTree(src_dir, self.test_dir, mode=copying.CopyModes.hardlink)
+            stats = {
+                name: os.stat(os.path.join(self.test_dir, name))
+                for name in ("a.sh", "b.sh", "c.sh")
+            }
+            self.assertEqual(stat.S_IMODE(stats["a.sh"].st_mode), 0o644)
+            self.assertEqual(stat.S_IMODE(stats["b.sh"].st_mode), 0o755)
+            self.assertEqual(stats["c.sh"].st_mtime, 60)
+            inodes = {stat_result.st_ino for stat_result in stats.values()}
+            self.assertEqual(len(inodes), 3)
+
+            # a permission only change isn't linked to the previous copy
+            os.chmod(os.path.join(src_dir, "a.sh"), 0o755)
+            new_dir = self.test_dir + "new"
+            copying.copyTree(
+                src_dir,
+                new_dir,
+                mode=copying.CopyModes.hardlink,
+                link_dest=self.test_dir,
+            )
+            try:
+                new_stat = os.stat(os.path.join(new_dir, "a.sh"))
+                self.assertEqual(stat.S_IMODE(new_stat.st_mode), 0o755)
+                self.assertNotEqual(new_stat.st_ino, stats["a.sh"].st_ino)
+                old_stat = os.stat(os.path.join(self.test_dir, "a.sh"))
+                self.assertEqual(stat.S_IMODE(old_stat.st_mode), 0o644)
+                self.assertTrue(
+                    os.path.samefile(
+                        os.path.join(self.test_dir, "c.sh"),
+                        os.path.join(new_dir, "c.sh"),
+                    )
+                )
+            finally:
+                shutil.rmtree(new_dir)
+        finally:
+            shutil.rmtree(src_dir)
+
+    def test_result(self):
+
+        calls = []
+        result = pythonningcore.pathing.copyDir(
+            SRC_ALPHA, self.test_dir, callback=calls.append, interval=0
+        )
+        file_count = sum([len(files) for _, _, files in os.walk(SRC_ALPHA)])
+        self.assertTrue(result.ok)
+        self.assertTrue(result.finished)
+        if platform.system() != "Windows":
+            self.assertEqual(result.files, file_count)
+            self.assertGreater(result.bytes, 0)
+            self.assertIn("copy", result.phases)
+            self.assertIn("scan", result.phases)
+        self.assertIs(calls[-1], result)
+
+        calls = []
+        result = pythonningcore.pathing.clearDir(self.test_dir, callback=calls.append)
+        self.assertEqual(result.files, file_count)
+        self.assertIn("delete", result.phases)
+        self.assertEqual(calls, [result])
+
+
+class C_syncDir(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = os.path.join(DIR_DATA, "test{}".format(uuid.uuid4().hex))
+        self.src_dir = self.test_dir + "src"
+        shutil.copytree(SRC_ALPHA, self.src_dir)
+
+    def tearDown(self):
+        pythonningcore.pathing.clearDir(self.test_dir, force=True)
+        pythonningcore.pathing.clearDir(self.src_dir, force=True)
+        self.test_dir = None
+
+    def test_incremental(self):
+
+        report = pythonningcore.pathing.syncing.syncDir(self.src_dir, self.test_dir)
+        self.assertTrue(report.copied)
+        self.assertFalse(report.deleted)
+        result = filecmp.dircmp(self.src_dir, self.test_dir)
+        self.assertFalse(result.left_only)
+        self.assertEqual(
+            result.right_only, [pythonningcore.pathing.syncing.MANIFEST_NAME]
+        )
+
+        report = pythonningcore.pathing.syncing.syncDir(self.src_dir, self.test_dir)
+        self.assertFalse(report.copied)
+
+        with open(os.path.join(self.src_dir, "README.md"), "a") as file:
+            file.write("modified")
+        os.remove(os.path.join(self.src_dir, "randomer.py"))
+        shutil.rmtree(os.path.join(self.src_dir, "myDir", "subdir"))
+
+        report = pythonningcore.pathing.syncing.syncDir(self.src_dir, self.test_dir)
+        self.assertEqual(report.copied, ["README.md"])
+        self.assertIn("randomer.py", report.deleted)
+        self.assertFalse(os.path.exists(os.path.join(self.test_dir, "randomer.py")))
+        self.assertFalse(os.path.exists(os.path.join(self.test_dir, "myDir", "subdir")))
+
+    def test_untracked(self):
+        syncing = pythonningcore.pathing.syncing
+        os.makedirs(os.path.join(self.test_dir, "extra_dir"))
+        with open(os.path.join(self.test_dir, "extra"), "w") as file:
+            file.write("extra")
+
+        # no manifest yet: everything not in source is deleted
+        pythonningcore.pathing.copyDir(
+            self.src_dir, self.test_dir, incremental=True, mirror=True
+        )
+        result = filecmp.dircmp(self.src_dir, self.test_dir)
+        self.assertEqual(result.right_only, [syncing.MANIFEST_NAME])
+
+        with open(os.path.join(self.test_dir, "extra"), "w") as file:
+            file.write("extra")
+        report = syncing.syncDir(self.src_dir, self.test_dir)
+        self.assertFalse(report.deleted)
+        report = syncing.syncDir(self.src_dir, self.test_dir, trust_manifest=False)
+        self.assertEqual(report.deleted, ["extra"])
+        self.assertFalse(report.copied)
+
+    def test_unsupported(self):
+        copying = pythonningcore.pathing.copying
+        for kwargs in (
+            {"mode": copying.CopyModes.hardlink},
+            {"mode": copying.CopyModes.reflink},
+            {"link_dest": self.src_dir},
+        ):
+            with self.assertRaises(ValueError):
+                pythonningcore.pathing.copyDir(
+                    self.src_dir, self.test_dir, incremental=True, **kwargs
+                )
+        self.assertFalse(os.path.exists(self.test_dir))
+
+    @unittest.skipIf(platform.system() == "Windows", "requires os.symlink")
+    def test_symlinks(self):
+        syncing = pythonningcore.pathing.syncing
+        os.symlink("README.md", os.path.join(self.src_dir, "file_link"))
+        os.symlink("myDir", os.path.join(self.src_dir, "dir_link"))
+
+        report = syncing.syncDir(self.src_dir, self.test_dir)
+        self.assertIn("file_link", report.copied)
+        self.assertIn("dir_link", report.copied)
+        for name, link in (("file_link", "README.md"), ("dir_link", "myDir")):
+            self.assertEqual(os.readlink(os.path.join(self.test_dir, name)), link)
+        report = syncing.syncDir(self.src_dir, self.test_dir)
+        self.assertFalse(report.copied)
+
+        # a directory replaced by a link: its old content is never deleted through it
+        my_dir = os.path.join(self.src_dir, "myDir")
+        moved_dir = self.src_dir + "myDir"
+        shutil.move(my_dir, moved_dir)
+        try:
+            os.symlink(moved_dir, my_dir)
+            report = syncing.syncDir(self.src_dir, self.test_dir)
+            self.assertEqual(
+                os.readlink(os.path.join(self.test_dir, "myDir")), moved_dir
+            )
+            result = filecmp.dircmp(os.path.join(SRC_ALPHA, "myDir"), moved_dir)
+            self.assertFalse(result.left_only)
+        finally:
+            os.unlink(my_dir)
+            shutil.move(moved_dir, my_dir)
+
+    def test_hash(self):
+
+        pythonningcore.pathing.syncing.syncDir(
+            self.src_dir, self.test_dir, use_hash=True
+        )
+        os.utime(os.path.join(self.src_dir, "README.md"), (0, 0))
+        report = pythonningcore.pathing.syncing.syncDir(
+            self.src_dir, self.test_dir, use_hash=True
+        )
+        self.assertFalse(report.copied)
+        self.assertEqual(report.touched, ["README.md"])
+
+
+class F_hashingTest(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = os.path.join(DIR_DATA, "test{}".format(uuid.uuid4().hex))
+        self.index_dir = os.path.join(DIR_DATA, "index{}".format(uuid.uuid4().hex))
+        shutil.copytree(SRC_ALPHA, self.test_dir)
+        os.environ[pythonningcore.pathing.hashing.INDEX_DIR_ENV] = self.index_dir
+
+    def tearDown(self):
+        del os.environ[pythonningcore.pathing.hashing.INDEX_DIR_ENV]
+        pythonningcore.pathing.clearDir(self.test_dir, force=True)
+        if os.path.exists(self.index_dir):
+            pythonningcore.pathing.clearDir(self.index_dir, force=True)
+        self.test_dir = None
+
+    def test_manifest(self):
+        hashing = pythonningcore.pathing.hashing
+        file_count = sum([len(files) for _, _, files in os.walk(self.test_dir)])
+
+        manifest = hashing.buildManifest(self.test_dir)
+        self.assertEqual(len(manifest.files), file_count)
+        self.assertEqual(manifest.hashed, file_count)
+        self.assertTrue(os.path.exists(hashing.getDefaultIndexPath(self.test_dir)))
+        # the hashed tree is never modified
+        self.assertEqual(
+            sum([len(files) for _, _, files in os.walk(self.test_dir)]), file_count
+        )
+        self.assertEqual(
+            manifest.files["README.md"],
+            hashing.hashFile(os.path.join(self.test_dir, "README.md")),
+        )
+
+        cached = hashing.buildManifest(self.test_dir)
+        self.assertEqual(cached.hashed, 0)
+        self.assertEqual(cached, manifest)
+        self.assertEqual(cached.fingerprint, manifest.fingerprint)
+
+        with open(os.path.join(self.test_dir, "README.md"), "a") as file:
+            file.write("modified")
+        modified = hashing.buildManifest(self.test_dir, max_workers=1)
+        self.assertEqual(modified.hashed, 1)
+        self.assertNotEqual(modified.fingerprint, manifest.fingerprint)
+        self.assertEqual(modified.diff(manifest), ([], [], ["README.md"]))
+
+    def test_no_index(self):
+        hashing = pythonningcore.pathing.hashing
+        manifest = hashing.buildManifest(self.test_dir, use_index=False)
+        self.assertTrue(manifest.files)
+        self.assertFalse(os.path.exists(self.index_dir))
+
+    def test_unwritable_index(self):
+        hashing = pythonningcore.pathing.hashing
+        index_path = os.path.join(self.test_dir, "README.md", "index.json")
+        manifest = hashing.buildManifest(self.test_dir, index_path=index_path)
+        self.assertEqual(manifest.hashed, len(manifest.files))
+
+
+class G_walkTest(unittest.TestCase):
+    def setUp(self):
+        self.expected = set()
+        for dir_path, _, file_names in os.walk(SRC_ALPHA):
+            for file_name in file_names:
+                path = os.path.join(dir_path, file_name)
+                self.expected.add(os.path.relpath(path, SRC_ALPHA))
+
+    def test_walk(self):
+        walking = pythonningcore.pathing.walking
+        found = [relative_path for relative_path, _ in walking.walk(SRC_ALPHA)]
+        self.assertEqual(len(found), len(self.expected))
+        self.assertEqual(set(found), self.expected)
+
+        found = {
+            relative_path for relative_path, _ in walking.walk(SRC_ALPHA, parallel=True)
+        }
+        self.assertEqual(found, self.expected)
+
+        found = {
+            relative_path for relative_path, _ in walking.walk(SRC_ALPHA, max_depth=0)
+        }
+        self.assertEqual(found, {path for path in self.expected if os.sep not in path})
+
+    def test_filter(self):
+        walking = pythonningcore.pathing.walking
+        path_filter = walking.PathFilter(include=["*.py"], exclude=["subdir"])
+        for parallel in (False, True):
+            found = {
+                relative_path
+                for relative_path, _ in walking.walk(
+                    SRC_ALPHA, path_filter=path_filter, parallel=parallel
+                )
+            }
+            self.assertEqual(
+                found,
+                {
+                    path
+                    for path in self.expected
+                    if path.endswith(".py") and "subdir" not in path
+                },
+            )
+
+        path_filter = walking.PathFilter(exclude_regex=[r"\.md$"])
+        found = {
+            relative_path
+            for relative_path, _ in walking.walk(SRC_ALPHA, path_filter=path_filter)
+        }
+        self.assertNotIn("README.md", found)
+        self.assertIn("randomer.py", found)
+
+    def test_filter_patterns(self):
+        PathFilter = pythonningcore.pathing.walking.PathFilter
+
+        path_filter = PathFilter(include=["src/*.py", "**/test_*.py", "doc/**"])
+        for path, included in (
+            ("src/a.py", True),
+            ("src/sub/a.py", False),
+            ("test_a.py", True),
+            ("src/sub/test_a.py", True),
+            ("doc/a/b.md", True),
+            ("doc", False),
+        ):
+            name = path.rsplit("/", 1)[-1]
+            self.assertEqual(path_filter.isIncluded(name, path), included, path)
+
+        path_filter = PathFilter(
+            exclude=["/build", "*.tm[!p]"], exclude_regex=[r"(?i)\.MD$", r"^tmp/"]
+        )
+        for path, excluded in (
+            ("build", True),
+            ("src/build", False),
+            ("a.tmx", True),
+            ("a.tmp", False),
+            ("README.md", True),
+            ("tmp/a.py", True),
+            ("src/tmp/a.py", False),
+        ):
+            name = path.rsplit("/", 1)[-1]
+            self.assertEqual(path_filter.isExcluded(name, path), excluded, path)
+
+    @unittest.skipIf(platform.system() == "Windows", "requires os.symlink")
+    def test_symlink_loop(self):
+        walking = pythonningcore.pathing.walking
+        test_dir = os.path.join(DIR_DATA, "test{}".format(uuid.uuid4().hex))
+        os.makedirs(os.path.join(test_dir, "a"))
+        self.addCleanup(pythonningcore.pathing.clearDir, test_dir, force=True)
+        with open(os.path.join(test_dir, "a", "file.txt"), "w") as file:
+            file.write("content")
+        os.symlink("..", os.path.join(test_dir, "a", "loop"))
+        os.symlink("a", os.path.join(test_dir, "b"))
+
+        for parallel in (False, True):
+            found = {
+                relative_path
+                for relative_path, _ in walking.walk(
+                    test_dir, follow_symlinks=True, parallel=parallel
+                )
+            }
+            # the link to a sibling is walked, the link to a parent is not
+            self.assertEqual(
+                found, {os.path.join("a", "file.txt"), os.path.join("b", "file.txt")}
+            )
+
+    def test_stop(self):
+        walking = pythonningcore.pathing.walking
+        iterator = walking.walk(SRC_ALPHA, yield_dirs=True, parallel=True)
+        next(iterator)
+        iterator.close()
+
+
+@unittest.skipIf(platform.system() == "Windows", "requires os.symlink")
+@unittest.skipIf(platform.system() == "Windows", "not supported on Windows")
+class H_publishTest(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = os.path.join(DIR_DATA, "test{}".format(uuid.uuid4().hex))
+
+    def tearDown(self):
+        pythonningcore.pathing.clearDir(self.test_dir, force=True)
+        self.test_dir = None
+
+    def test_publish(self):
+        publishing = pythonningcore.pathing.publishing
+        current = os.path.join(self.test_dir, publishing.CURRENT_NAME)
+
+        first = publishing.publishDir(SRC_ALPHA, self.test_dir, version="v1")
+        self.assertEqual(publishing.getCurrentVersion(self.test_dir), "v1")
+        result = filecmp.dircmp(SRC_ALPHA, current)
+        self.assertFalse(result.left_only)
+        self.assertFalse(result.right_only)
+
+        second = publishing.publishDir(SRC_ALPHA, self.test_dir, version="v2")
+        self.assertEqual(publishing.getCurrentVersion(self.test_dir), "v2")
+        self.assertTrue(
+            os.path.samefile(
+                os.path.join(first, "README.md"), os.path.join(second, "README.md")
+            )
+        )
+
+        publishing.publishDir(SRC_BETA, self.test_dir, version="v3", keep=2)
+        self.assertEqual(publishing.listVersions(self.test_dir), ["v2", "v3"])
+        result = filecmp.dircmp(SRC_BETA, current)
+        self.assertFalse(result.left_only)
+        self.assertFalse(result.right_only)
+
+        publishing.switchVersion(self.test_dir, "v2")
+        self.assertEqual(publishing.getCurrentVersion(self.test_dir), "v2")
+        self.assertEqual(publishing.collectGarbage(self.test_dir, keep=0), ["v3"])
+
+        with self.assertRaises(FileExistsError):
+            publishing.publishDir(SRC_ALPHA, self.test_dir, version="v2")
+
+    def test_permissions(self):
+        publishing = pythonningcore.pathing.publishing
+        src_dir = self.test_dir + "src"
+        os.makedirs(src_dir)
+        try:
+            path = os.path.join(src_dir, "run.sh")
+            with open(path, "w") as file:
+                file.write("echo")
+            os.chmod(path, 0o644)
+            first = publishing.publishDir(src_dir, self.test_dir, version="v1")
+
+            os.chmod(path, 0o755)
+            second = publishing.publishDir(src_dir, self.test_dir, version="v2")
+        finally:
+            shutil.rmtree(src_dir)
+
+        current = os.path.join(self.test_dir, publishing.CURRENT_NAME, "run.sh")
+        self.assertEqual(stat.S_IMODE(os.stat(current).st_mode), 0o755)
+        self.assertFalse(
+            os.path.samefile(
+                os.path.join(first, "run.sh"), os.path.join(second, "run.sh")
+            )
+        )
+        # the previous version is left untouched
+        first_mode = os.stat(os.path.join(first, "run.sh")).st_mode
+        self.assertEqual(stat.S_IMODE(first_mode), 0o644)
+
+
+class I_asyncTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.test_dir = os.path.join(DIR_DATA, "test{}".format(uuid.uuid4().hex))
+
+    def tearDown(self):
+        pythonningcore.pathing.clearDir(self.test_dir, force=True)
+        self.test_dir = None
+
+    async def test_copy_clear(self):
+        async with pythonningcore.pathing.asyncing.AsyncPathing(interval=0) as paths:
+            operation = paths.copyDir(SRC_ALPHA, self.test_dir)
+            updates = [update async for update in operation]
+            result = await operation
+            self.assertTrue(result.finished)
+            self.assertIs(updates[-1], result)
+            result = filecmp.dircmp(SRC_ALPHA, self.test_dir)
+            self.assertFalse(result.left_only)
+
+            copies = [
+                paths.copyDir(SRC_BETA, self.test_dir + str(index))
+                for index in range(3)
+            ]
+            results = await asyncio.gather(*copies)
+            self.assertTrue(all(result.ok for result in results))
+            await asyncio.gather(
+                *[paths.clearDir(self.test_dir + str(index)) for index in range(3)]
+            )
+            for index in range(3):
+                self.assertFalse(os.path.exists(self.test_dir + str(index)))
+
+    async def test_cancel(self):
+        async with pythonningcore.pathing.asyncing.AsyncPathing() as paths:
+            operation = paths.copyDir(SRC_ALPHA, self.test_dir)
+            operation.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await operation
+            self.assertTrue(operation.result.cancelled)
+
+
+class E_linkTest(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = os.path.join(DIR_DATA, "test{}".format(uuid.uuid4().hex))
+
+    def tearDown(self):
+        pythonningcore.pathing.clearDir(self.test_dir, force=True)
+        self.test_dir = None
+
+    def test_createSymLink(self):
+        os.makedirs(self.test_dir)
+        source_path = os.path.join(SRC_ALPHA, "README.md")
+        target_path = os.path.join(self.test_dir, "README.md")
+
+        pythonningcore.pathing.createSymLink(source_path, target_path)
+        self.assertTrue(os.path.islink(target_path))
+        self.assertTrue(filecmp.cmp(source_path, target_path, shallow=False))
+
+        with self.assertRaises(AssertionError):
+            pythonningcore.pathing.createSymLink(source_path, target_path)
+
+    def test_createLinks(self):
+        linking = pythonningcore.pathing.linking
+        pairs = []
+        for index, name in enumerate(sorted(os.listdir(SRC_ALPHA))):
+            pairs.append(
+                (
+                    os.path.join(SRC_ALPHA, name),
+                    os.path.join(self.test_dir, str(index % 3), name),
+                )
+            )
+
+        errors = linking.createLinks(pairs)
+        self.assertEqual(errors, [])
+        for source_path, target_path in pairs:
+            self.assertEqual(os.path.realpath(target_path), source_path)
+
+        with self.assertRaises(linking.LinksCreationError) as context:
+            linking.createLinks(pairs[:2])
+        self.assertEqual(len(context.exception.errors), 2)
+        errors = linking.createLinks(pairs[:2], raise_errors=False)
+        self.assertEqual(len(errors), 2)
+
+    @unittest.skipIf(platform.system() == "Windows", "requires os.link")
+    def test_hard(self):
+        source_path = os.path.join(self.test_dir, "source.txt")
+        target_path = os.path.join(self.test_dir, "sub", "target.txt")
+        os.makedirs(self.test_dir)
+        with open(source_path, "w") as file:
+            file.write("content")
+
+        pythonningcore.pathing.linking.createLinks(
+            [(source_path, target_path)], hard=True
+        )
+        self.assertFalse(os.path.islink(target_path))
+        self.assertTrue(os.path.samefile(source_path, target_path))
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,399 @@
+"""
+Streaming directory tree walker with filters, built on ``os.scandir``.
+
+Used by ``hashing.buildManifest`` and ``syncing.syncDir``.
+"""
+from __future__ import annotations
+
+import concurrent.futures
+import logging
+import os
+import queue
+import re
+import threading
+
+import pythonningcore.py23.helpers
+
+from . import c
+
+if pythonningcore.py23.helpers.isModuleAvailable("pathlib"):
+    from pathlib import Path
+if pythonningcore.py23.helpers.isModuleAvailable("typing"):
+    from typing import Callable, Iterator, Pattern, Sequence
+
+__all__ = (
+    "PathFilter",
+    "raiseError",
+    "walk",
+)
+
+logger = logging.getLogger("{}.walking".format(c.abr))
+
+QUEUE_SIZE = 1024
+"""
+Maximum number of entries found by the parallel walk waiting to be consumed.
+"""
+
+_DONE = object()
+
+
+def raiseError(error):
+    # type: (OSError) -> None
+    """
+    To use as ``walk`` onerror callback, to stop at the first error.
+    """
+    raise error
+
+
+def _compile(patterns):
+    # type: (list[str]) -> Pattern | None
+    if not patterns:
+        return None
+    return re.compile("|".join("(?:{})".format(pattern) for pattern in patterns))
+
+
+def _translateGlob(glob):
+    # type: (str) -> str
+    """
+    Like ``fnmatch.translate`` but ``*``, ``?`` and ``[!...]`` never match ``/``,
+    while ``**`` matches across directories (``a/**/b``, ``**/b``, ``a/**``).
+    """
+    parts = []
+    index = 0
+    while index < len(glob):
+        char = glob[index]
+        index += 1
+        if glob.startswith("**/", index - 1):
+            # zero or more directories
+            parts.append("(?:.*/)?")
+            index += 2
+        elif glob.startswith("**", index - 1):
+            parts.append(".*")
+            index += 1
+        elif char == "*":
+            parts.append("[^/]*")
+        elif char == "?":
+            parts.append("[^/]")
+        elif char == "[":
+            # a "]" right after "[" or "[!" is part of the set
+            start = index + 1 if glob.startswith("!", index) else index
+            end = glob.find("]", start + 1)
+            if end == -1:
+                parts.append(re.escape(char))
+                continue
+            content = glob[index:end].replace("\\", "\\\\")
+            index = end + 1
+            if content.startswith("!"):
+                content = "^/" + content[1:]
+            elif content.startswith("^"):
+                content = "\\" + content
+            parts.append("[{}]".format(content))
+        else:
+            parts.append(re.escape(char))
+    return "(?s:{})\\Z".format("".join(parts))
+
+
+class PathFilter:
+    """
+    Select entries by their relative path, all the glob patterns being compiled
+    once into a few regular expressions.
+
+    Glob patterns follow the ``.gitignore`` conventions, without negation (``!``)
+    nor directory only (trailing ``/``) patterns:
+
+    - without ``/`` they are matched against the entry name, at any depth
+      (``*.py``, ``__pycache__``)
+    - with ``/`` they are matched against the whole relative path (``src/*.py``),
+      a leading ``/`` only anchoring the pattern to the root (``/build``)
+    - ``*``, ``?`` and ``[...]`` never match a ``/``, while ``**`` matches any
+      number of directories (``src/**/*.py``, ``**/build``).
+
+    Regular expressions are searched in the relative path, always using ``/``
+    as separator. Each is used as is, with its own flags.
+
+    Args:
+        include:
+            glob patterns of the files to keep, None to keep all the files. Not
+            applied to directories.
+        exclude:
+            glob patterns of the files and directories to skip. The content of
+            excluded directories is not walked.
+        include_regex: regular expressions of the files to keep.
+        exclude_regex: regular expressions of the files and directories to skip.
+    """
+
+    def __init__(
+        self,
+        include=None,  # type: Sequence[str] | None
+        exclude=None,  # type: Sequence[str] | None
+        include_regex=None,  # type: Sequence[str | Pattern] | None
+        exclude_regex=None,  # type: Sequence[str | Pattern] | None
+    ):
+        # type: (...) -> None
+        self._include = self._compileGlobs(include) + (
+            self._compileRegexes(include_regex),
+        )
+        self._exclude = self._compileGlobs(exclude) + (
+            self._compileRegexes(exclude_regex),
+        )
+        self.has_include = bool(include or include_regex)
+
+    @staticmethod
+    def _compileGlobs(globs):
+        # type: (Sequence[str] | None) -> tuple[Pattern | None, Pattern | None]
+        name_patterns = []
+        path_patterns = []
+        for glob in globs or ():
+            if "/" in glob:
+                path_patterns.append(_translateGlob(glob.lstrip("/")))
+            else:
+                name_patterns.append(_translateGlob(glob))
+        return _compile(name_patterns), _compile(path_patterns)
+
+    @staticmethod
+    def _compileRegexes(regexes):
+        # type: (Sequence[str | Pattern] | None) -> list[Pattern]
+        # compiled separately as global flags like "(?i)" can't be combined
+        return [re.compile(regex) for regex in regexes or ()]
+
+    @staticmethod
+    def _matches(patterns, name, path):
+        # type: (tuple[Pattern | None, Pattern | None, list[Pattern]], str, str) -> bool
+        name_regex, path_regex, regexes = patterns
+        if name_regex is not None and name_regex.match(name):
+            return True
+        if path_regex is not None and path_regex.match(path):
+            return True
+        return any(regex.search(path) is not None for regex in regexes)
+
+    def isExcluded(self, name, path):
+        # type: (str, str) -> bool
+        """
+        Args:
+            name: entry name.
+            path: entry path relative to the walked root, with ``/`` separators.
+        """
+        return self._matches(self._exclude, name, path)
+
+    def isIncluded(self, name, path):
+        # type: (str, str) -> bool
+        """
+        Args:
+            name: entry name.
+            path: entry path relative to the walked root, with ``/`` separators.
+        """
+        if not self.has_include:
+            return True
+        return self._matches(self._include, name, path)
+
+
+def _getDirectoryId(path):
+    # type: (str) -> tuple[int, int]
+    # os.stat as DirEntry.stat doesn't give the inode on Windows
+    stat_result = os.stat(path)
+    return stat_result.st_dev, stat_result.st_ino
+
+
+def _scanDirectory(
+    directory,  # type: str
+    relative_dir,  # type: str
+    path_filter,  # type: PathFilter
+    ancestors,  # type: frozenset | None
+):
+    # type: (...) -> Iterator[tuple[str, os.DirEntry, frozenset | bool | None]]
+    """
+    Args:
+        ancestors:
+            (st_dev, st_ino) of the directories from root to this one, when
+            following symbolic links. None to not follow them.
+
+    Returns:
+        generator of (relative path, DirEntry, directory) for each entry to yield or
+        directory to walk. ``directory`` is False for files, else the ancestors of
+        the directory content (None if not following symbolic links).
+    """
+    follow_symlinks = ancestors is not None
+    with os.scandir(directory) as iterator:
+        for entry in iterator:
+            relative_path = os.path.join(relative_dir, entry.name)
+            filter_path = relative_path
+            if os.sep != "/":
+                filter_path = relative_path.replace(os.sep, "/")
+            if path_filter.isExcluded(entry.name, filter_path):
+                continue
+
+            if not entry.is_dir(follow_symlinks=follow_symlinks):
+                if path_filter.isIncluded(entry.name, filter_path):
+                    yield relative_path, entry, False
+                continue
+            if not follow_symlinks:
+                yield relative_path, entry, None
+                continue
+
+            directory_id = _getDirectoryId(entry.path)
+            if directory_id in ancestors:
+                logger.warning(
+                    "[walk] skipping {}: symbolic link loop".format(entry.path)
+                )
+                continue
+            yield relative_path, entry, ancestors.union([directory_id])
+
+
+def _walkSequential(root, path_filter, max_depth, ancestors, yield_dirs, onerror):
+    directories = [("", 0, ancestors)]
+    while directories:
+        relative_dir, depth, ancestors = directories.pop()
+        try:
+            for relative_path, entry, directory in _scanDirectory(
+                os.path.join(root, relative_dir),
+                relative_dir,
+                path_filter,
+                ancestors,
+            ):
+                if directory is False:
+                    yield relative_path, entry
+                    continue
+                if yield_dirs:
+                    yield relative_path, entry
+                if max_depth is None or depth < max_depth:
+                    directories.append((relative_path, depth + 1, directory))
+        except OSError as excp:
+            if onerror is not None:
+                onerror(excp)
+
+
+def _walkParallel(
+    root,
+    path_filter,
+    max_depth,
+    ancestors,
+    yield_dirs,
+    onerror,
+    max_workers,
+):
+    results = queue.Queue(maxsize=QUEUE_SIZE)
+    stop = threading.Event()
+    lock = threading.Lock()
+    remaining = [1]  # number of directories scheduled but not fully scanned
+
+    def _put(item):
+        # type: (object) -> bool
+        while not stop.is_set():
+            try:
+                results.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _scan(relative_dir, depth, ancestors):
+        try:
+            if stop.is_set():
+                return
+            for relative_path, entry, directory in _scanDirectory(
+                os.path.join(root, relative_dir),
+                relative_dir,
+                path_filter,
+                ancestors,
+            ):
+                is_dir = directory is not False
+                # yielded before the sub-directory content is scanned
+                if (not is_dir or yield_dirs) and not _put((relative_path, entry)):
+                    return
+                if is_dir and (max_depth is None or depth < max_depth):
+                    with lock:
+                        remaining[0] += 1
+                    try:
+                        executor.submit(_scan, relative_path, depth + 1, directory)
+                    except RuntimeError:
+                        # executor shutdown: the walk was stopped
+                        return
+        except Exception as excp:
+            _put(excp)
+        finally:
+            with lock:
+                remaining[0] -= 1
+                done = remaining[0] == 0
+            if done:
+                _put(_DONE)
+
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        executor.submit(_scan, "", 0, ancestors)
+        while True:
+            item = results.get()
+            if item is _DONE:
+                break
+            if isinstance(item, OSError):
+                if onerror is not None:
+                    onerror(item)
+                continue
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        # also reached when the caller stops iterating early
+        stop.set()
+        executor.shutdown(wait=True)
+
+
+def walk(
+    root,  # type: str | Path
+    path_filter=None,  # type: PathFilter | None
+    max_depth=None,  # type: int | None
+    follow_symlinks=False,  # type: bool
+    yield_dirs=False,  # type: bool
+    parallel=False,  # type: bool
+    max_workers=None,  # type: int | None
+    onerror=None,  # type: Callable[[OSError], None] | None
+):
+    # type: (...) -> Iterator[tuple[str, os.DirEntry]]
+    """
+    Lazily walk the given directory tree.
+
+    Entries are yielded as soon as found, as ``os.DirEntry`` whose ``stat()``
+    result is cached, so memory usage doesn't depend on the size of the tree.
+    Directories are yielded before their content.
+
+    Args:
+        root: existing directory path.
+        path_filter: entries to yield, see ``PathFilter``. None to yield everything.
+        max_depth: maximum depth walked, 0 to only list root. None for no limit.
+        follow_symlinks:
+            if True walk the symbolic links to directories. A link to one of its
+            own parent directories is skipped, so loops are not walked forever.
+        yield_dirs: if True also yield the directories, not only the files.
+        parallel:
+            if True scan multiple directories at once, with a pool of threads.
+            Entries are then yielded in a non-deterministic order (but still after
+            their parent directory).
+        max_workers:
+            number of directories scanned in parallel. None for a CPU based default.
+        onerror:
+            called with the OSError raised when a directory can't be listed,
+            ignored if None (as ``os.walk``).
+
+    Returns:
+        generator of (path relative to root, DirEntry).
+    """
+    root = str(root)
+    path_filter = path_filter or PathFilter()
+    ancestors = None
+    if follow_symlinks:
+        ancestors = frozenset([_getDirectoryId(root)])
+    if not parallel:
+        return _walkSequential(
+            root, path_filter, max_depth, ancestors, yield_dirs, onerror
+        )
+
+    if max_workers is None:
+        max_workers = min(32, (os.cpu_count() or 1) + 4)
+    return _walkParallel(
+        root,
+        path_filter,
+        max_depth,
+        ancestors,
+        yield_dirs,
+        onerror,
+        max_workers,
+    )